@@ -0,0 +1,43 @@
+"""Cache of per-file audio analysis results for ReadarrM4B"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+from fingerprint import file_fingerprint
+
+
+class AnalysisCache:
+    """
+    Results of analysis passes (silences, loudness) per source file
+
+    Keyed by the audio fingerprint (tags excluded) and the analysis
+    settings, stored as one small JSON file per entry.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, source: Path, settings: Dict[str, Any]) -> str:
+        """Cache key for a source file analysed with the given settings"""
+        params = json.dumps(settings, sort_keys=True)
+        return hashlib.sha1(f"{file_fingerprint(source)}:{params}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Any:
+        """Cached result, or None on a miss"""
+        try:
+            with open(self.cache_dir / f"{key}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, result: Any) -> None:
+        """Save a result, replacing the entry atomically"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(result, f)
+        os.replace(temp_path, self.cache_dir / f"{key}.json")
@@ -0,0 +1,211 @@
+"""Encoder parallelism calibration for ReadarrM4B"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bump when trials change so old results are measured again
+CALIBRATION_VERSION = 2
+
+# Minimum sample files per simulated book
+FILES_PER_BOOK = 4
+
+
+def files_per_book(jobs: int) -> int:
+    """Sample files per simulated book, enough to keep ``jobs`` encodes busy"""
+    return max(FILES_PER_BOOK, jobs)
+
+
+def host_fingerprint() -> Dict[str, Any]:
+    """CPU model, core count and architecture of this host"""
+    cpu_model = None
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu_model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {
+        'cpu_model': cpu_model or platform.processor() or platform.machine(),
+        'cores': os.cpu_count() or 1,
+        'machine': platform.machine(),
+    }
+
+
+def fingerprint_key(fingerprint: Dict[str, Any]) -> str:
+    """Short stable key for a host fingerprint"""
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def candidate_combinations(threads: int) -> List[Tuple[int, int]]:
+    """
+    (concurrent books, jobs per book) pairs to try
+
+    Powers of two (and ``threads`` itself) whose product uses more than half
+    and at most all of the available threads.
+    """
+    threads = max(1, int(threads))
+    sizes = sorted({1 << n for n in range(threads.bit_length()) if 1 << n <= threads} | {threads})
+    return [(books, jobs) for books in sizes for jobs in sizes
+            if threads / 2 < books * jobs <= threads or books * jobs == threads == 1]
+
+
+class CalibrationCache:
+    """
+    JSON file of calibration results keyed by host fingerprint
+
+    A library on shared storage can be converted by several machines; each
+    keeps its own entry.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def get(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Calibrated settings for a host, or None if it was never calibrated"""
+        entry = self._load().get(fingerprint_key(fingerprint))
+        if not entry or entry.get('version') != CALIBRATION_VERSION:
+            return None
+        return entry.get('result')
+
+    def store(self, fingerprint: Dict[str, Any], result: Dict[str, Any], trials: List[Dict[str, Any]]) -> None:
+        """Save a host's result, replacing the file atomically"""
+        data = self._load()
+        data[fingerprint_key(fingerprint)] = {
+            'version': CALIBRATION_VERSION,
+            'host': fingerprint,
+            'calibrated_at': time.time(),
+            'result': result,
+            'trials': trials,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+async def _ffmpeg(args: list) -> None:
+    """Run ffmpeg quietly, raising RuntimeError on failure"""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+
+async def make_sample(work_dir: Path, seconds: float) -> Path:
+    """Generate a stereo 128 kbit/s MP3 of pink noise"""
+    sample = work_dir / "sample.mp3"
+    await _ffmpeg(["-f", "lavfi", "-i", f"anoisesrc=d={seconds}:c=pink:r=44100:a=0.2",
+                   "-ac", "2", "-c:a", "libmp3lame", "-b:a", "128k", str(sample)])
+    return sample
+
+
+async def run_trial(work_dir: Path, sample: Path, books: int, jobs: int, codec: str) -> float:
+    """
+    Convert ``books`` simulated books at once, each like the segment pipeline
+
+    Every book encodes files_per_book(jobs) copies of the sample, ``jobs``
+    at a time, then merges them without re-encoding.
+
+    Returns:
+        Wall time in seconds
+    """
+    async def book(n: int) -> None:
+        book_dir = work_dir / f"book{n}"
+        book_dir.mkdir()
+        semaphore = asyncio.Semaphore(jobs)
+
+        async def encode(index: int) -> Path:
+            segment = book_dir / f"{index:02d}.m4a"
+            async with semaphore:
+                await _ffmpeg(["-i", str(sample), "-vn", "-c:a", codec, str(segment)])
+            return segment
+
+        segments = await asyncio.gather(*(encode(index) for index in range(files_per_book(jobs))))
+        concat_list = book_dir / "segments.txt"
+        concat_list.write_text("".join(f"file '{segment}'\n" for segment in segments))
+        await _ffmpeg(["-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy",
+                       str(book_dir / "book.m4b")])
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(book(n) for n in range(books)))
+    finally:
+        for n in range(books):
+            shutil.rmtree(work_dir / f"book{n}", ignore_errors=True)
+    return time.monotonic() - started
+
+
+async def calibrate(config) -> Dict[str, Any]:
+    """
+    Measure conversion throughput for each combination and cache the best
+
+    Args:
+        config: Configuration
+
+    Returns:
+        Dict with the host fingerprint, the chosen result and every trial
+    """
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg not found in PATH")
+    logger = logging.getLogger(__name__)
+    codecs = config.calibration_codecs or [config.audio_codec or 'aac']
+    combinations = candidate_combinations(config.calibration_max_threads)
+    fingerprint = host_fingerprint()
+    logger.info(f"Calibrating {len(combinations) * len(codecs)} combinations on {fingerprint['cpu_model']} "
+                f"({fingerprint['cores']} cores)")
+
+    Path(config.temp_dir).mkdir(parents=True, exist_ok=True)
+    trials = []
+    with tempfile.TemporaryDirectory(prefix='calibration-', dir=config.temp_dir) as temp_dir:
+        work_dir = Path(temp_dir)
+        sample = await make_sample(work_dir, config.calibration_sample_seconds)
+        for codec in codecs:
+            for books, jobs in combinations:
+                wall_seconds = await run_trial(work_dir, sample, books, jobs, codec)
+                audio_seconds = books * files_per_book(jobs) * config.calibration_sample_seconds
+                trial = {
+                    'audio_codec': codec,
+                    'concurrent_books': books,
+                    'jobs': jobs,
+                    'wall_seconds': round(wall_seconds, 3),
+                    'realtime_factor': round(audio_seconds / max(wall_seconds, 0.001), 1),
+                }
+                logger.info(f"  {codec}: {books} books x {jobs} jobs -> {trial['realtime_factor']}x realtime")
+                trials.append(trial)
+
+    best = max(trials, key=lambda trial: trial['realtime_factor'])
+    result = {
+        'jobs': best['jobs'],
+        'concurrent_books': best['concurrent_books'],
+        'cpu_budget': best['jobs'] * best['concurrent_books'],
+        'realtime_factor': best['realtime_factor'],
+    }
+    # The codec is only chosen when the config offers alternatives
+    if len(codecs) > 1:
+        result['audio_codec'] = best['audio_codec']
+    CalibrationCache(config.calibration_cache_file).store(fingerprint, result, trials)
+    logger.info(f"Calibrated: {result['concurrent_books']} books x {result['jobs']} jobs"
+                + (f" with {result['audio_codec']}" if 'audio_codec' in result else ""))
+    return {'fingerprint': fingerprint, 'result': result, 'trials': trials}
@@ -0,0 +1,86 @@
+"""Silence-based chapter detection for ReadarrM4B"""
+
+import re
+from typing import Iterable, List, Tuple
+
+SILENCE_PATTERN = re.compile(r'silence_(start|end): (-?\d+(?:\.\d+)?)')
+
+# Gap below which two detected silences are treated as one
+MERGE_TOLERANCE = 0.05
+
+
+def detection_windows(duration: float, window_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """
+    Split a file into overlapping (start, length) windows
+
+    Consecutive windows overlap by ``overlap_seconds``, so a silence that
+    crosses a window edge is seen whole by one window or in parts by both.
+    """
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+    step = max(window_seconds - overlap_seconds, 1.0)
+    windows = []
+    start = 0.0
+    while start < duration:
+        windows.append((start, min(window_seconds, duration - start)))
+        if start + window_seconds >= duration:
+            break
+        start += step
+    return windows
+
+
+def parse_silencedetect(output: str, offset: float, window_end: float) -> List[Tuple[float, float]]:
+    """
+    Silences reported by ffmpeg's silencedetect filter
+
+    Args:
+        output: ffmpeg stderr
+        offset: Start of the window in the file
+        window_end: End of the window in the file, used for a silence that
+            runs to the end of the window
+
+    Returns:
+        (start, end) pairs in file time
+    """
+    silences = []
+    start = None
+    for kind, value in SILENCE_PATTERN.findall(output):
+        if kind == 'start':
+            start = offset + max(0.0, float(value))
+        elif start is not None:
+            silences.append((start, offset + float(value)))
+            start = None
+    if start is not None:
+        silences.append((start, window_end))
+    return silences
+
+
+def merge_silences(silences: Iterable[Tuple[float, float]], min_silence: float = 0.0) -> List[Tuple[float, float]]:
+    """Join overlapping silences (from overlapping windows) and drop short ones"""
+    merged = []
+    for start, end in sorted(silences):
+        if merged and start <= merged[-1][1] + MERGE_TOLERANCE:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [(start, end) for start, end in merged if end - start >= min_silence]
+
+
+def chapters_from_silences(silences: List[Tuple[float, float]], duration: float,
+                           min_chapter: float) -> List[Tuple[float, str]]:
+    """
+    Place chapter starts in the middle of silences
+
+    A silence only starts a chapter if the previous chapter and the rest of
+    the book are both at least ``min_chapter`` seconds long.
+
+    Returns:
+        (start, title) chapters, the first starting at 0
+    """
+    starts = [0.0]
+    for start, end in silences:
+        point = (start + end) / 2
+        if point - starts[-1] >= min_chapter and duration - point >= min_chapter:
+            starts.append(point)
+    return [(start, f"Chapter {n}") for n, start in enumerate(starts, 1)]
+
@@ -0,0 +1,187 @@
+"""Resumable conversion checkpoints for ReadarrM4B"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file
+
+    Args:
+        path: File to hash
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobCheckpoint:
+    """
+    Per-book job directory holding encoded intermediates and a manifest
+
+    The job directory lives under ``<temp_dir>/jobs/<job id>`` where the job id
+    is derived from the book directory, so a restarted or retried conversion
+    of the same book finds the work of the previous attempt.
+    """
+
+    def __init__(self, temp_dir: str, book_path: Path, encoder: Dict[str, Any]):
+        self.book_path = Path(book_path)
+        self.encoder = encoder
+        self.job_id = hashlib.sha1(str(self.book_path.resolve()).encode('utf-8')).hexdigest()[:16]
+        self.job_dir = Path(temp_dir) / "jobs" / self.job_id
+        self.segments_dir = self.job_dir / "segments"
+        self.manifest_path = self.job_dir / "manifest.json"
+        self.logger = logging.getLogger(__name__)
+        self._inputs: Dict[str, Dict[str, Any]] = {}
+        # Parallel encodes finish in worker threads and share the manifest
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the manifest of a previous attempt, discarding it if unusable"""
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        if not self.manifest_path.exists():
+            return
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint manifest {self.manifest_path}: {e}")
+            self.reset()
+            return
+
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('encoder') != self.encoder:
+            self.logger.info("Encoder settings changed since last attempt, discarding checkpoint")
+            self.reset()
+            return
+
+        self._inputs = manifest.get('inputs', {})
+
+    def reset(self) -> None:
+        """Drop all intermediates and start with an empty manifest"""
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self._inputs = {}
+        self._save()
+
+    def _key(self, source: Path) -> str:
+        """Manifest key of a source file: its path relative to the book folder"""
+        try:
+            return Path(source).relative_to(self.book_path).as_posix()
+        except ValueError:
+            return Path(source).as_posix()
+
+    def segment_path(self, source: Path) -> Path:
+        """
+        Intermediate path for a source file
+
+        Keeps the stem for chapter names; files in subfolders are prefixed
+        with their folders, so same-named files on different discs differ.
+        """
+        parts = Path(self._key(source)).with_suffix("").parts
+        return self.segments_dir / f"{' - '.join(part for part in parts if part != '/')}.m4b"
+
+    def is_done(self, source: Path) -> bool:
+        """
+        Check whether a valid intermediate exists for a source file
+
+        The source must be unchanged since it was encoded and the intermediate
+        must match the recorded size and hash, so a truncated file is never reused.
+        """
+        entry = self._inputs.get(self._key(source))
+        if not entry:
+            return False
+
+        try:
+            source_stat = source.stat()
+        except OSError:
+            return False
+        if (source_stat.st_size != entry.get('source_size')
+                or source_stat.st_mtime_ns != entry.get('source_mtime_ns')):
+            return False
+
+        segment = self.segments_dir / entry.get('segment', '')
+        try:
+            if segment.stat().st_size != entry.get('size'):
+                return False
+            return file_sha256(segment) == entry.get('sha256')
+        except OSError:
+            return False
+
+    def pending(self, sources: List[Path]) -> List[Path]:
+        """
+        Return the sources that still need encoding, dropping stale entries
+
+        Args:
+            sources: Source files of the book
+
+        Returns:
+            Sources without a valid intermediate
+        """
+        # Intermediates of files no longer part of the book must not be merged
+        expected = {self.segment_path(source).name for source in sources}
+        for segment in self.segments_dir.iterdir():
+            if segment.name not in expected:
+                segment.unlink(missing_ok=True)
+        self._inputs = {name: entry for name, entry in self._inputs.items()
+                        if entry.get('segment') in expected}
+
+        todo = []
+        for source in sources:
+            if self.is_done(source):
+                continue
+            if self._inputs.pop(self._key(source), None) is not None:
+                self.segment_path(source).unlink(missing_ok=True)
+            todo.append(source)
+        return todo
+
+    def mark_done(self, source: Path, segment: Path) -> None:
+        """Record a finished intermediate in the manifest"""
+        source_stat = source.stat()
+        entry = {
+            'source_size': source_stat.st_size,
+            'source_mtime_ns': source_stat.st_mtime_ns,
+            'segment': segment.name,
+            'size': segment.stat().st_size,
+            'sha256': file_sha256(segment),
+        }
+        with self._lock:
+            self._inputs[self._key(source)] = entry
+            self._save()
+
+    def discard(self) -> None:
+        """Remove the job directory after a successful conversion"""
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def _save(self) -> None:
+        """Write the manifest atomically"""
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'book_path': str(self.book_path),
+            'encoder': self.encoder,
+            'inputs': self._inputs,
+        }
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
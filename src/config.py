@@ -4,6 +4,25 @@ import os
 import yaml
 from pathlib import Path
 
+from calibration import CalibrationCache, host_fingerprint
+
+
+def parse_time_window(window: str) -> tuple:
+    """
+    Parse an ``HH:MM-HH:MM`` window into minutes since midnight
+
+    Windows ending before they start wrap around midnight.
+    """
+    try:
+        start, end = window.split('-')
+        start_hour, start_minute = (int(part) for part in start.strip().split(':'))
+        end_hour, end_minute = (int(part) for part in end.strip().split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid time window: {window!r}, expected HH:MM-HH:MM")
+    if not (0 <= start_hour <= 24 and 0 <= end_hour <= 24 and 0 <= start_minute < 60 and 0 <= end_minute < 60):
+        raise ValueError(f"Invalid time window: {window!r}")
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
+
 
 class Config:
     """Simple configuration class"""
@@ -23,24 +42,145 @@ class Config:
         with open(self.config_file, 'r') as f:
             config = yaml.safe_load(f)
         
-        # Paths
-        self.audiobooks_path = os.path.expandvars(config['paths']['audiobooks'])
+        # Paths (audiobooks may list several library roots)
+        audiobooks = config['paths']['audiobooks']
+        if isinstance(audiobooks, str):
+            audiobooks = [audiobooks]
+        self.audiobooks_paths = [os.path.expandvars(path) for path in audiobooks]
+        self.audiobooks_path = self.audiobooks_paths[0]
         self.temp_dir = os.path.expandvars(config['paths'].get('temp_dir', '/tmp/readarr-m4b'))
+        self.database_file = os.path.expandvars(config['paths'].get('database', './readarr-m4b.db'))
+        
+        # Calibration: measured jobs/codec for this host, used where the config sets none
+        calibration = config.get('calibration', {})
+        scheduler = config.get('scheduler', {})
+        self.calibration_enabled = calibration.get('enabled', False)
+        self.calibration_cache_file = os.path.expandvars(calibration.get(
+            'cache_file', os.path.join(os.path.dirname(self.database_file), 'calibration.json')))
+        self.calibration_codecs = calibration.get('codecs') or []
+        self.calibration_sample_seconds = float(calibration.get('sample_seconds', 30))
+        self.calibration_max_threads = scheduler.get('cpu_budget') or os.cpu_count() or 1
+        self.calibration = CalibrationCache(self.calibration_cache_file).get(host_fingerprint())
+        calibrated = self.calibration or {}
         
         # Conversion settings
         conversion = config.get('conversion', {})
-        self.audio_codec = conversion.get('audio_codec', None)  # Use m4b-tool default
-        self.jobs = conversion.get('jobs', 4)
+        # None uses the m4b-tool default
+        self.audio_codec = conversion.get('audio_codec') or calibrated.get('audio_codec')
+        self.jobs = conversion.get('jobs') or calibrated.get('jobs', 4)
         self.use_filenames_as_chapters = conversion.get('use_filenames_as_chapters', True)
         self.no_chapter_reindexing = conversion.get('no_chapter_reindexing', True)
         self.skip_cover = conversion.get('skip_cover', False)
         self.stability_wait_seconds = conversion.get('stability_wait_seconds', 30)
         self.cleanup_originals = conversion.get('cleanup_originals', True)
+        self.resume_partial = conversion.get('resume_partial', True)
+        self.duplicates = conversion.get('duplicates', 'convert')
+        
+        # Scheduler
+        self.scheduler_per_device_jobs = scheduler.get('per_device_jobs', 2)
+        self.scheduler_cpu_budget = (scheduler.get('cpu_budget') or calibrated.get('cpu_budget')
+                                     or os.cpu_count() or 1)
+        self.scheduler_device_limits = {
+            os.path.expandvars(path): limit
+            for path, limit in (scheduler.get('device_limits') or {}).items()
+        }
+        # Job classes: webhooks are interactive, library scans and watch mode are bulk
+        classes = scheduler.get('classes') or {}
+        self.scheduler_classes = {}
+        for name, defaults in (('interactive', {}), ('bulk', {'max_jobs': 1})):
+            settings = {**defaults, **(classes.get(name) or {})}
+            windows = settings.get('windows') or []
+            self.scheduler_classes[name] = {
+                'max_jobs': settings.get('max_jobs'),
+                'cpu_budget': settings.get('cpu_budget') or self.scheduler_cpu_budget,
+                'windows': [windows] if isinstance(windows, str) else list(windows),
+                'outside_window': settings.get('outside_window', 'pause'),
+                # Applied to the job's m4b-tool, ffmpeg and tone processes
+                'resources': {
+                    'nice': settings.get('nice'),
+                    'io_class': settings.get('io_class'),
+                    'io_priority': int(settings.get('io_priority', 4)),
+                    'cpu_max': settings.get('cpu_max'),
+                    'memory_max_mb': settings.get('memory_max_mb'),
+                },
+            }
+        # Delegated cgroup v2 directory for per-job CPU and memory limits
+        self.scheduler_cgroup_root = os.path.expandvars(scheduler.get('cgroup_root', '/sys/fs/cgroup/readarr-m4b'))
+        # Encoder threads bulk jobs leave free for webhook imports
+        self.scheduler_reserved_interactive_cpu = scheduler.get('reserved_interactive_cpu', self.jobs)
+        
+        # Live reload of this file (also on SIGHUP)
+        reload = config.get('reload', {})
+        self.reload_enabled = reload.get('enabled', True)
+        self.reload_poll_seconds = float(reload.get('poll_seconds', 5))
+        
+        # Watch mode
+        watch = config.get('watch', {})
+        self.watch_mode = watch.get('mode', 'auto')
+        self.watch_debounce_seconds = float(watch.get('debounce_seconds', 60))
+        self.watch_poll_interval = float(watch.get('poll_interval_seconds', 300))
+        
+        # Silence-based chapter detection for books that arrive as a few long files
+        chapters = config.get('chapters', {})
+        self.chapters_detect = chapters.get('detect', 'auto')
+        self.chapters_max_files = int(chapters.get('max_files', 2))
+        self.chapters_min_silence_seconds = float(chapters.get('min_silence_seconds', 2.0))
+        self.chapters_min_chapter_seconds = float(chapters.get('min_chapter_minutes', 5)) * 60
+        self.chapters_silence_threshold_db = float(chapters.get('silence_threshold_db', -35))
+        self.chapters_window_seconds = float(chapters.get('window_minutes', 30)) * 60
+        self.chapters_overlap_seconds = float(chapters.get('overlap_seconds', 30))
+        
+        # Loudness normalization, applied in the segment encode
+        loudness = config.get('loudness', {})
+        self.loudness_enabled = loudness.get('enabled', False)
+        self.loudness_target_lufs = float(loudness.get('target_lufs', -18))
+        self.loudness_max_true_peak_db = float(loudness.get('max_true_peak_db', -1.5))
+        self.loudness_max_gain_db = float(loudness.get('max_gain_db', 12))
+        self.loudness_min_adjust_db = float(loudness.get('min_adjust_db', 0.5))
+        
+        # Cover art
+        cover = config.get('cover', {})
+        self.cover_max_size_px = int(cover.get('max_size_px', 1400))
+        self.cover_max_kb = int(cover.get('max_kb', 500))
+        self.cover_quality = int(cover.get('quality', 3))
+        
+        # Output verification
+        verification = config.get('verification', {})
+        self.verify_output = verification.get('enabled', True)
+        self.verify_duration_tolerance_seconds = float(verification.get('duration_tolerance_seconds', 5))
+        self.verify_duration_tolerance_percent = float(verification.get('duration_tolerance_percent', 0.5))
+        self.verify_chapters = verification.get('check_chapters', True)
+        
+        # Segment cache
+        cache = config.get('cache', {})
+        self.cache_enabled = cache.get('enabled', False)
+        self.cache_dir = os.path.expandvars(cache.get('dir', os.path.join(self.temp_dir, 'segment-cache')))
+        self.cache_max_bytes = int(float(cache.get('max_size_gb', 20)) * 1024 ** 3)
+        # Silence and loudness analysis results, always kept (they are tiny)
+        self.analysis_cache_dir = os.path.expandvars(cache.get('analysis_dir',
+                                                               os.path.join(self.temp_dir, 'analysis-cache')))
+        # Resized cover images
+        self.cover_cache_dir = os.path.expandvars(cache.get('cover_dir', os.path.join(self.temp_dir, 'cover-cache')))
+        # Per-directory totals for --report
+        self.report_cache_file = os.path.expandvars(cache.get(
+            'report_file', os.path.join(os.path.dirname(self.database_file), 'report-cache.json')))
+        
+        # Tracing
+        tracing = config.get('tracing', {})
+        self.tracing_enabled = tracing.get('enabled', False)
+        self.tracing_dir = os.path.expandvars(tracing.get('dir', './traces'))
+        self.tracing_otlp = tracing.get('otlp', False)
+        self.tracing_otlp_endpoint = tracing.get('otlp_endpoint')
         
         # Logging
         logging = config.get('logging', {})
         self.log_level = logging.get('level', 'INFO')
         self.log_file = os.path.expandvars(logging.get('file', './readarr-m4b.log'))
+        self.log_json_file = logging.get('json_file')
+        if self.log_json_file:
+            self.log_json_file = os.path.expandvars(self.log_json_file)
+        self.log_max_bytes = int(float(logging.get('max_size_mb', 10)) * 1024 * 1024)
+        self.log_backup_count = logging.get('backup_count', 5)
         
         # Webhook
         webhook = config.get('webhook', {})
@@ -48,22 +188,33 @@ class Config:
         self.webhook_host = webhook.get('host', '0.0.0.0')
         self.webhook_log_file = os.path.expandvars(webhook.get('log_file', './webhook_requests.log'))
         self.webhook_json_file = os.path.expandvars(webhook.get('json_file', './webhook_received.json'))
-    
-    def validate(self):
-        """Validate configuration"""
-        errors = []
+        self.webhook_max_queue_depth = webhook.get('max_queue_depth', 1000)
+        self.webhook_max_bulk_queue_depth = webhook.get('max_bulk_queue_depth', 100000)
+        self.webhook_rate_limit_per_minute = float(webhook.get('rate_limit_per_minute', 0))
+        self.webhook_rate_limit_burst = webhook.get('rate_limit_burst', 20)
         
-        # Check audiobooks path
-        if not Path(self.audiobooks_path).exists():
-            errors.append(f"Audiobooks directory does not exist: {self.audiobooks_path}")
+        # Distributed conversion: the server leases queued jobs to --worker processes
+        coordinator = config.get('coordinator', {})
+        self.coordinator_enabled = coordinator.get('enabled', False)
+        self.coordinator_token = coordinator.get('token', '')
+        self.coordinator_lease_seconds = float(coordinator.get('lease_seconds', 60))
+        self.coordinator_run_local = coordinator.get('run_local', True)
+        worker = config.get('worker', {})
+        self.worker_jobs = worker.get('jobs', 1)
+        self.worker_poll_interval = float(worker.get('poll_interval_seconds', 5))
         
+        # Admin endpoints
+        admin = config.get('admin', {})
+        self.admin_enabled = admin.get('enabled', False)
+        self.admin_token = admin.get('token', '')
+        self.admin_max_profile_seconds = float(admin.get('max_profile_seconds', 60))
+    
+    def validate(self):
+        """Validate configuration, printing any errors"""
         # Create temp directory if needed
         Path(self.temp_dir).mkdir(parents=True, exist_ok=True)
         
-        # Check log level
-        if self.log_level not in ["DEBUG", "INFO", "WARNING", "ERROR"]:
-            errors.append(f"Invalid logging level: {self.log_level}")
-        
+        errors = self.validation_errors()
         if errors:
             for error in errors:
                 print(f"Configuration error: {error}")
@@ -72,6 +223,65 @@ class Config:
         print("✅ Configuration is valid")
         return True
     
+    def validation_errors(self) -> list:
+        """Problems with the configuration, empty if it is valid"""
+        errors = []
+        
+        # Check audiobooks paths
+        for audiobooks_path in self.audiobooks_paths:
+            if not Path(audiobooks_path).exists():
+                errors.append(f"Audiobooks directory does not exist: {audiobooks_path}")
+        
+        if self.duplicates not in ["convert", "skip", "hardlink"]:
+            errors.append(f"Invalid duplicates mode: {self.duplicates}")
+        
+        for name, settings in self.scheduler_classes.items():
+            if settings['outside_window'] not in ["pause", "hold"]:
+                errors.append(f"Invalid outside_window for {name} jobs: {settings['outside_window']}")
+            for window in settings['windows']:
+                try:
+                    parse_time_window(window)
+                except ValueError as e:
+                    errors.append(str(e))
+            resources = settings['resources']
+            if resources['nice'] is not None and not -20 <= resources['nice'] <= 19:
+                errors.append(f"Invalid nice for {name} jobs (-20 to 19): {resources['nice']}")
+            if resources['io_class'] is not None and resources['io_class'] not in ["realtime", "best-effort", "idle"]:
+                errors.append(f"Invalid io_class for {name} jobs: {resources['io_class']}")
+            if not 0 <= resources['io_priority'] <= 7:
+                errors.append(f"Invalid io_priority for {name} jobs (0-7): {resources['io_priority']}")
+            for key in ('cpu_max', 'memory_max_mb'):
+                if resources[key] is not None and resources[key] <= 0:
+                    errors.append(f"Invalid {key} for {name} jobs: {resources[key]}")
+        
+        if self.chapters_detect not in ["auto", "always", "never"]:
+            errors.append(f"Invalid chapters detect mode: {self.chapters_detect}")
+        if self.chapters_overlap_seconds < self.chapters_min_silence_seconds:
+            errors.append("chapters.overlap_seconds must be at least chapters.min_silence_seconds")
+        if self.chapters_window_seconds <= self.chapters_overlap_seconds:
+            errors.append("chapters.window_minutes must be longer than chapters.overlap_seconds")
+        
+        if self.loudness_enabled and not self.resume_partial:
+            errors.append("loudness normalization requires conversion.resume_partial")
+        
+        if not 2 <= self.cover_quality <= 31:
+            errors.append(f"Invalid cover quality (2-31): {self.cover_quality}")
+        
+        if self.calibration_sample_seconds <= 0:
+            errors.append(f"Invalid calibration sample_seconds: {self.calibration_sample_seconds}")
+        
+        if self.watch_mode not in ["auto", "events", "poll"]:
+            errors.append(f"Invalid watch mode: {self.watch_mode}")
+        
+        # Check log level
+        if self.log_level not in ["DEBUG", "INFO", "WARNING", "ERROR"]:
+            errors.append(f"Invalid logging level: {self.log_level}")
+        
+        if self.reload_poll_seconds <= 0:
+            errors.append(f"Invalid reload poll_seconds: {self.reload_poll_seconds}")
+        
+        return errors
+    
     def get_m4b_tool_args(self):
         """Get m4b-tool command arguments"""
         args = [
@@ -0,0 +1,108 @@
+"""Live configuration reload for ReadarrM4B"""
+
+import asyncio
+import logging
+import os
+import signal
+from typing import Callable, List, Optional
+
+from config import Config
+
+# Settings read once at startup; changing them still needs a restart, until
+# then the running values are kept
+RESTART_SETTINGS = (
+    'webhook_host', 'webhook_port', 'database_file', 'audiobooks_paths', 'admin_enabled',
+    'coordinator_enabled', 'log_file', 'log_json_file', 'webhook_log_file', 'watch_mode',
+)
+
+
+def changed_settings(old: Config, new: Config) -> List[str]:
+    """Names of the settings that differ between two configs"""
+    return sorted(name for name in set(vars(old)) | set(vars(new))
+                  if getattr(old, name, None) != getattr(new, name, None))
+
+
+class ConfigReloader:
+    """
+    Reload the config file when it changes or on SIGHUP
+
+    The file's mtime is polled every ``reload.poll_seconds`` unless
+    ``reload.enabled`` is off. A new config is only applied if it loads and
+    validates; otherwise the running one is kept and the problems are
+    logged. ``apply`` receives the new Config and swaps it in; jobs already
+    running keep the settings they started with.
+    """
+
+    def __init__(self, config: Config, apply: Callable[[Config], None]):
+        self.config = config
+        self.apply = apply
+        self.logger = logging.getLogger(__name__)
+        self._mtime = self._file_mtime()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.config.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        Load, validate and apply the config file
+
+        Returns:
+            True if a changed config was applied
+        """
+        try:
+            new = Config(self.config.config_file)
+        except Exception as e:
+            self.logger.error(f"Config reload failed, keeping the previous settings: {e}")
+            return False
+        errors = new.validation_errors()
+        if errors:
+            self.logger.error(f"Config reload rejected, keeping the previous settings: {'; '.join(errors)}")
+            return False
+
+        changed = changed_settings(self.config, new)
+        if not changed:
+            return False
+        restart = [name for name in changed if name in RESTART_SETTINGS]
+        if restart:
+            self.logger.warning(f"Changed settings that only take effect after a restart: {', '.join(restart)}")
+            # Request handlers read the live config, so these must not change underneath them
+            for name in restart:
+                setattr(new, name, getattr(self.config, name, None))
+            changed = [name for name in changed if name not in restart]
+            if not changed:
+                return False
+        self.apply(new)
+        self.config = new
+        self.logger.info(f"Reloaded {new.config_file}: {', '.join(changed)}")
+        return True
+
+    async def run(self) -> None:
+        """Reload on SIGHUP or when the file's mtime changes, until cancelled"""
+        requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, requested.set)
+        except (NotImplementedError, RuntimeError, AttributeError):
+            # No SIGHUP (Windows) or not the main thread: polling only
+            pass
+        try:
+            while True:
+                # With reload.enabled off only SIGHUP reloads
+                poll = self.config.reload_poll_seconds if self.config.reload_enabled else None
+                try:
+                    await asyncio.wait_for(requested.wait(), poll)
+                except asyncio.TimeoutError:
+                    pass
+                mtime = self._file_mtime()
+                if requested.is_set() or (self.config.reload_enabled and mtime != self._mtime):
+                    requested.clear()
+                    self._mtime = mtime
+                    await asyncio.to_thread(self.reload)
+        finally:
+            try:
+                loop.remove_signal_handler(signal.SIGHUP)
+            except (NotImplementedError, RuntimeError, AttributeError):
+                pass
@@ -0,0 +1,150 @@
+"""Index of converted books for ReadarrM4B"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Loudness columns, added to databases created before normalization existed
+LOUDNESS_COLUMNS = ('measured_lufs', 'true_peak_db', 'gain_db', 'output_lufs')
+
+
+class ConversionIndex:
+    """
+    SQLite record of every converted book
+
+    One row per book directory holds the output file, the content signature
+    of the source audio and the Readarr identity of the book, so later jobs
+    can detect duplicates and find existing outputs. Normalized books also
+    keep their measured and applied loudness.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS books (
+                    book_directory TEXT PRIMARY KEY,
+                    output_path TEXT NOT NULL,
+                    signature TEXT,
+                    book_id INTEGER,
+                    author TEXT,
+                    title TEXT,
+                    converted_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS books_signature ON books (signature)")
+            columns = {row['name'] for row in db.execute("PRAGMA table_info(books)")}
+            for column in LOUDNESS_COLUMNS:
+                if column not in columns:
+                    db.execute(f"ALTER TABLE books ADD COLUMN {column} REAL")
+
+    @contextmanager
+    def connect(self):
+        """Open a connection that commits on success and is always closed"""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record(self, book_directory: Path, output_path: Path, signature: Optional[str],
+               metadata: Optional[Dict[str, Any]] = None, loudness: Optional[Dict[str, float]] = None) -> None:
+        """
+        Record a converted book, replacing any previous entry for its directory
+
+        Args:
+            book_directory: Audiobook directory
+            output_path: Converted M4B file
+            signature: Content signature of the source audio
+            metadata: Optional metadata from Readarr
+            loudness: Optional loudness record of a normalized conversion
+        """
+        metadata = metadata or {}
+        loudness = loudness or {}
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO books (book_directory, output_path, signature, book_id, author, title, "
+                f"converted_at, {', '.join(LOUDNESS_COLUMNS)}) VALUES ({', '.join('?' * (7 + len(LOUDNESS_COLUMNS)))})",
+                (str(book_directory), str(output_path), signature, metadata.get('book_id'),
+                 metadata.get('author_name'), metadata.get('book_title'), time.time(),
+                 *(loudness.get(column) for column in LOUDNESS_COLUMNS))
+            )
+
+    @staticmethod
+    def loudness(entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+        """Loudness record of an entry, or None if the book was not normalized"""
+        if not entry or entry.get('gain_db') is None:
+            return None
+        return {column: entry[column] for column in LOUDNESS_COLUMNS}
+
+    def get(self, book_directory: Path) -> Optional[Dict[str, Any]]:
+        """Return the entry for a book directory, if any"""
+        with self.connect() as db:
+            row = db.execute("SELECT * FROM books WHERE book_directory = ?",
+                             (str(book_directory),)).fetchone()
+        return dict(row) if row else None
+
+    def outputs(self) -> Dict[str, str]:
+        """Output file of every recorded book directory"""
+        with self.connect() as db:
+            return dict(db.execute("SELECT book_directory, output_path FROM books").fetchall())
+
+    def find_by_book_id(self, book_id: int) -> Optional[Dict[str, Any]]:
+        """Return the most recent entry for a Readarr book id, if any"""
+        with self.connect() as db:
+            row = db.execute("SELECT * FROM books WHERE book_id = ? ORDER BY converted_at DESC",
+                             (book_id,)).fetchone()
+        return dict(row) if row else None
+
+    def move(self, old_directory: Path, new_directory: Path, output_path: Path,
+             metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Point an entry at a renamed or moved book directory
+
+        The signature, book id and conversion time are kept; author and title
+        are updated when given.
+
+        Args:
+            old_directory: Directory the book was converted in
+            new_directory: Directory the book lives in now
+            output_path: Current M4B file
+            metadata: Optional metadata from Readarr
+        """
+        metadata = metadata or {}
+        with self.connect() as db:
+            if str(old_directory) != str(new_directory):
+                db.execute("DELETE FROM books WHERE book_directory = ?", (str(new_directory),))
+            db.execute(
+                "UPDATE books SET book_directory = ?, output_path = ?, author = COALESCE(?, author), "
+                "title = COALESCE(?, title) WHERE book_directory = ?",
+                (str(new_directory), str(output_path), metadata.get('author_name'),
+                 metadata.get('book_title'), str(old_directory))
+            )
+
+    def find_by_signature(self, signature: str, exclude: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find another converted book with the same content signature
+
+        Only entries whose output file still exists are returned.
+
+        Args:
+            signature: Content signature to look up
+            exclude: Book directory to ignore (the one being converted)
+
+        Returns:
+            Matching entry or None
+        """
+        with self.connect() as db:
+            rows = db.execute("SELECT * FROM books WHERE signature = ? ORDER BY converted_at DESC",
+                              (signature,)).fetchall()
+        for row in rows:
+            if exclude is not None and row['book_directory'] == str(exclude):
+                continue
+            if Path(row['output_path']).exists():
+                return dict(row)
+        return None
@@ -2,12 +2,80 @@
 
 import asyncio
 import logging
+import os
+import resource
 import shutil
+import tempfile
 import time
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+from analysis_cache import AnalysisCache
+from chapters import chapters_from_silences, detection_windows, merge_silences, parse_silencedetect
+from checkpoint import JobCheckpoint
 from config import Config
+from conversion_index import ConversionIndex
+from cover import CoverCache, best_cover, copy_image, find_covers
+from fingerprint import book_signature
+from loudness import combine_loudness, loudness_record, normalization_gain, parse_ebur128
+from mp3info import mp3_duration
+from mp4info import MP4FormatError, inspect_m4b, verify_m4b
+from resources import ResourceControl
+from scheduler import current_job, track_process
+from segment_cache import SegmentCache
+from stats import StatsStore, conversion_settings
+import tracing
+from utils import link_or_copy, natural_sort_key
+
+
+# Keywords in m4b-tool's verbose output that mark the start of a phase
+M4B_TOOL_PHASES = [
+    ('cover', 'cover'),
+    ('convert', 'encode'),
+    ('encod', 'encode'),
+    ('merg', 'merge'),
+    ('chapter', 'chapters'),
+    ('tag', 'tag'),
+]
+
+# ffmpeg JPEG quality scale (2 is best, 31 worst) and the step used when a
+# resized cover is still over the size limit
+MAX_COVER_QSCALE = 31
+COVER_QSCALE_STEP = 4
+
+
+def _m4b_tool_phase(line: str) -> Optional[str]:
+    """Map an m4b-tool output line to the phase it announces, if any"""
+    lowered = line.lower()
+    for keyword, phase in M4B_TOOL_PHASES:
+        if keyword in lowered:
+            return phase
+    return None
+
+
+def rename_chapters(chapters: list, old_title: Optional[str], new_title: Optional[str]) -> Optional[list]:
+    """
+    Replace a book's previous title in its chapter names
+    
+    Returns:
+        Renamed (start, title) chapters, or None if no name changes
+    """
+    if not chapters or not old_title or not new_title or old_title == new_title:
+        return None
+    renamed = [(start, title.replace(old_title, new_title)) for start, title in chapters]
+    return renamed if renamed != list(chapters) else None
+
+
+def format_chapters(chapters: list) -> str:
+    """Chapters in the ``HH:MM:SS.mmm title`` format read by tone"""
+    lines = []
+    for start, title in chapters:
+        millis = int(round(start * 1000))
+        hours, millis = divmod(millis, 3_600_000)
+        minutes, millis = divmod(millis, 60_000)
+        seconds, millis = divmod(millis, 1000)
+        lines.append(f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d} {title}")
+    return "\n".join(lines) + "\n"
 
 
 class M4BConverter:
@@ -16,6 +84,27 @@ class M4BConverter:
     def __init__(self, config: Config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.index = ConversionIndex(config.database_file)
+        self.stats = StatsStore(config.database_file)
+        self.analysis_cache = AnalysisCache(config.analysis_cache_dir)
+        self.cover_cache = CoverCache(config.cover_cache_dir)
+        self.resources = ResourceControl(config)
+        self.segment_cache = None
+        if config.cache_enabled:
+            self.segment_cache = SegmentCache(config.cache_dir, config.cache_max_bytes)
+    
+    def with_config(self, config: Config) -> 'M4BConverter':
+        """
+        A converter for a reloaded config that shares this one's segment cache
+        
+        Jobs running on this converter keep their settings; the segment cache
+        index is shared so its size accounting stays correct.
+        """
+        converter = M4BConverter(config)
+        if self.segment_cache and converter.segment_cache and config.cache_dir == self.config.cache_dir:
+            self.segment_cache.max_bytes = config.cache_max_bytes
+            converter.segment_cache = self.segment_cache
+        return converter
     
     async def convert_audiobook(self, book_path: Path, metadata: Optional[Dict[str, Any]] = None) -> bool:
         """
@@ -28,6 +117,179 @@ class M4BConverter:
         Returns:
             True if conversion successful, False otherwise
         """
+        async with tracing.job_trace(self.config, book_path.name):
+            with tracing.span("convert_audiobook", book=str(book_path)):
+                return await self._convert_audiobook(book_path, metadata)
+    
+    async def retag_audiobook(self, book_path: Path, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Rewrite the tags and chapter names of an existing M4B without re-encoding
+        
+        Args:
+            book_path: Path to the audiobook directory
+            metadata: Metadata from Readarr with the new author and title
+            
+        Returns:
+            True if the M4B was retagged, False otherwise
+        """
+        async with tracing.job_trace(self.config, f"retag-{book_path.name}"):
+            with tracing.span("retag_audiobook", book=str(book_path)):
+                return await self._retag_audiobook(book_path, metadata)
+    
+    async def _retag_audiobook(self, book_path: Path, metadata: Optional[Dict[str, Any]]) -> bool:
+        """Steps of retag_audiobook"""
+        if not shutil.which("tone"):
+            self.logger.error("tone not found in PATH")
+            return False
+        
+        record = await asyncio.to_thread(self.index.get, book_path)
+        output_path = self._find_output(book_path, record, metadata)
+        if not output_path:
+            self.logger.warning(f"No M4B file to retag in {book_path}")
+            return False
+        
+        try:
+            info = await asyncio.to_thread(inspect_m4b, output_path)
+        except (OSError, MP4FormatError) as e:
+            self.logger.error(f"Cannot read {output_path.name} for retagging: {e}")
+            return False
+        
+        self.logger.info(f"Retagging {output_path.name}")
+        metadata = metadata or {}
+        Path(self.config.temp_dir).mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="retag-", dir=self.config.temp_dir))
+        # Tag a copy next to the original so the swap is a rename on the same filesystem
+        staged = output_path.with_name(output_path.name + ".retag")
+        try:
+            with tracing.span("copy", bytes=output_path.stat().st_size):
+                await asyncio.to_thread(shutil.copyfile, output_path, staged)
+            
+            cmd = ["tone", "tag", str(staged)]
+            title = metadata.get('book_title')
+            author = metadata.get('author_name')
+            if title:
+                cmd.extend(["--meta-title", title, "--meta-album", title])
+            if author:
+                cmd.extend(["--meta-artist", author, "--meta-album-artist", author])
+            if not self.config.skip_cover:
+                cover = await self._find_cover(book_path, [])
+                if cover:
+                    cmd.extend(["--meta-cover-file", str(cover)])
+            chapters = rename_chapters(info['chapters'], record and record.get('title'), title)
+            if chapters:
+                chapters_file = work_dir / "chapters.txt"
+                chapters_file.write_text(format_chapters(chapters), encoding='utf-8')
+                cmd.extend(["--meta-chapters-file", str(chapters_file)])
+            
+            with tracing.span("tone"):
+                returncode, output = await self._run_process(cmd)
+            if returncode != 0:
+                self.logger.error(f"tone failed with return code {returncode}: {output.strip()}")
+                return False
+            
+            # Tagging must leave the audio and the chapter count untouched
+            problems = await asyncio.to_thread(verify_m4b, staged, info['duration'], 0.1,
+                                               info['chapter_count'] or None)
+            if problems:
+                self.logger.error(f"Retagged file failed verification: {'; '.join(problems)}")
+                return False
+            
+            new_path = book_path / self._generate_output_filename(book_path, metadata)
+            os.replace(staged, new_path)
+            if new_path != output_path:
+                output_path.unlink(missing_ok=True)
+                self.logger.info(f"Renamed {output_path.name} to {new_path.name}")
+        finally:
+            staged.unlink(missing_ok=True)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        signature = record.get('signature') if record else None
+        await self._record_conversion(book_path, new_path, signature, metadata, ConversionIndex.loudness(record))
+        self.logger.info(f"Retag completed: {new_path.name}")
+        return True
+    
+    async def move_audiobook(self, book_path: Path, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Follow a renamed or moved book directory without touching the audio
+        
+        The existing M4B is moved into the new directory under the name
+        generated from the current metadata, and the index entry is updated.
+        
+        Args:
+            book_path: New audiobook directory
+            metadata: Metadata from Readarr, optionally with ``previous_directory``
+            
+        Returns:
+            True if the output was relocated, False otherwise
+        """
+        async with tracing.job_trace(self.config, f"move-{book_path.name}"):
+            with tracing.span("move_audiobook", book=str(book_path)):
+                metadata = metadata or {}
+                record = await asyncio.to_thread(self._find_moved_record, book_path, metadata)
+                if not record:
+                    self.logger.warning(f"No converted book found for {book_path}")
+                    return False
+                return await asyncio.to_thread(self._relocate_output, book_path, record, metadata)
+    
+    def _find_moved_record(self, book_path: Path, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Index entry of a book by its previous directory, Readarr id or current directory"""
+        record = None
+        if metadata.get('previous_directory'):
+            record = self.index.get(Path(metadata['previous_directory']))
+        if not record and metadata.get('book_id') is not None:
+            record = self.index.find_by_book_id(metadata['book_id'])
+        return record or self.index.get(book_path)
+    
+    def _relocated_record(self, book_path: Path, metadata: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Index entry of the same Readarr book converted in another directory"""
+        if not metadata or metadata.get('book_id') is None:
+            return None
+        record = self.index.find_by_book_id(metadata['book_id'])
+        if record and Path(record['book_directory']) != book_path:
+            return record
+        return None
+    
+    def _relocate_output(self, book_path: Path, record: Dict[str, Any], metadata: Dict[str, Any]) -> bool:
+        """Move a converted M4B into book_path and update its index entry"""
+        old_output = Path(record['output_path'])
+        # Readarr may have moved the whole folder, M4B included
+        current = next((path for path in (old_output, book_path / old_output.name) if path.exists()), None)
+        if current is None:
+            self.logger.error(f"Converted file not found: {old_output}")
+            return False
+        
+        names = {
+            'author_name': metadata.get('author_name') or record['author'],
+            'book_title': metadata.get('book_title') or record['title'],
+        }
+        new_output = book_path / self._generate_output_filename(book_path, names)
+        if current != new_output:
+            if new_output.exists():
+                self.logger.error(f"Cannot move {current.name}, {new_output} already exists")
+                return False
+            book_path.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(current), str(new_output))
+            self.logger.info(f"Moved {current} to {new_output}")
+        
+        try:
+            self.index.move(Path(record['book_directory']), book_path, new_output, names)
+        except Exception as e:
+            self.logger.warning(f"Could not update conversion index: {e}")
+        return True
+    
+    def _find_output(self, book_path: Path, record: Optional[Dict[str, Any]],
+                     metadata: Optional[Dict[str, Any]]) -> Optional[Path]:
+        """The existing M4B of a book directory, preferring the indexed one"""
+        if record and Path(record['output_path']).exists():
+            return Path(record['output_path'])
+        candidates = sorted(book_path.glob("*.m4b"))
+        if len(candidates) == 1:
+            return candidates[0]
+        expected = book_path / self._generate_output_filename(book_path, metadata)
+        return expected if expected in candidates else None
+    
+    async def _convert_audiobook(self, book_path: Path, metadata: Optional[Dict[str, Any]]) -> bool:
+        """Conversion steps of convert_audiobook"""
         if not book_path.exists():
             self.logger.error(f"Audiobook path does not exist: {book_path}")
             return False
@@ -35,19 +297,32 @@ class M4BConverter:
         self.logger.info(f"Starting conversion for: {book_path}")
         
         # Check if already converted
-        if self._has_m4b_files(book_path):
-            self.logger.info("M4B file already exists, skipping conversion")
-            return True
-        
-        # Check if we have MP3 files to convert
-        mp3_files = list(book_path.glob("*.mp3"))
+        with tracing.span("scan_inputs") as span:
+            # A book imported into a new directory after a rename is moved, not converted
+            moved_from = await asyncio.to_thread(self._relocated_record, book_path, metadata)
+            
+            if self._has_m4b_files(book_path):
+                self.logger.info("M4B file already exists, skipping conversion")
+                # Only follow a folder that moved with its M4B, never take another copy's file
+                if moved_from and not Path(moved_from['output_path']).exists():
+                    await asyncio.to_thread(self._relocate_output, book_path, moved_from, metadata)
+                return True
+            
+            # Check if we have MP3 files to convert
+            mp3_files, expected_sizes = self._resolve_input_files(book_path, metadata)
+            span.set(files=len(mp3_files), from_webhook=expected_sizes is not None)
         if not mp3_files:
+            if moved_from:
+                self.logger.info(f"Book was converted in {moved_from['book_directory']}, moving its M4B")
+                return await asyncio.to_thread(self._relocate_output, book_path, moved_from, metadata)
             self.logger.warning(f"No MP3 files found in {book_path}")
             return False
         
         # Wait for file stability (ensure download is complete)
         self.logger.info(f"Checking file stability for {len(mp3_files)} MP3 files...")
-        if not await self._wait_for_stability(book_path):
+        with tracing.span("wait_for_stability"):
+            stable = await self._wait_for_stability(mp3_files, expected_sizes)
+        if not stable:
             self.logger.error("Files not stable, conversion aborted")
             return False
         
@@ -55,14 +330,64 @@ class M4BConverter:
         output_filename = self._generate_output_filename(book_path, metadata)
         output_path = book_path / output_filename
         
+        # Same audio may already be converted under another author or edition
+        with tracing.span("fingerprint"):
+            signature = await asyncio.to_thread(book_signature, mp3_files)
+        if self.config.duplicates != 'convert':
+            duplicate = await asyncio.to_thread(self.index.find_by_signature, signature, book_path)
+            if duplicate:
+                return await self._handle_duplicate(book_path, mp3_files, output_path, duplicate,
+                                                    signature, metadata)
+        
+        # Books made of a few long files get chapters from silences
+        with tracing.span("detect_chapters"):
+            chapters = await self._detect_chapters(mp3_files)
+        
         # Run conversion
         self.logger.info(f"Starting m4b-tool conversion: {output_filename}")
-        success = await self._run_m4b_tool(book_path, output_path)
+        started = time.monotonic()
+        cpu_started = self._children_cpu_seconds()
+        run_stats = {}
+        if self.config.resume_partial:
+            success = await self._convert_with_checkpoint(book_path, mp3_files, output_path, metadata,
+                                                          run_stats)
+        else:
+            if self.config.loudness_enabled:
+                self.logger.warning("Loudness normalization needs conversion.resume_partial, skipping it")
+            extra_args = []
+            if not self.config.skip_cover:
+                cover = await self._find_cover(book_path, mp3_files)
+                if cover:
+                    extra_args.extend(["--cover", str(cover)])
+            success = await self._run_m4b_tool(book_path, output_path, extra_args,
+                                               inputs=sorted(mp3_files, key=natural_sort_key))
+        
+        if success and chapters:
+            with tracing.span("apply_chapters", chapters=len(chapters)):
+                if not await self._apply_chapters(output_path, chapters):
+                    chapters = None
         
         if success:
+            # Never delete originals on the strength of an unverified output
+            with tracing.span("verify_output"):
+                verified = await self._verify_output(output_path, mp3_files,
+                                                     len(chapters) if chapters else None)
+            if not verified:
+                return False
+            
+            loudness = run_stats.get('loudness')
+            job = current_job.get()
+            if job is not None:
+                job.loudness = loudness
+            await self._record_conversion(book_path, output_path, signature, metadata, loudness)
+            if not run_stats.get('reused') and not run_stats.get('hits'):
+                await self._record_stats(book_path, mp3_files, output_path, time.monotonic() - started,
+                                         self._children_cpu_seconds() - cpu_started)
+            
             # Cleanup original files if configured
             if self.config.cleanup_originals:
-                self._cleanup_originals(book_path, mp3_files)
+                with tracing.span("cleanup_originals", files=len(mp3_files)):
+                    self._cleanup_originals(book_path, mp3_files)
             
             self.logger.info(f"Conversion completed successfully: {output_filename}")
             return True
@@ -70,53 +395,319 @@ class M4BConverter:
             self.logger.error("Conversion failed")
             return False
     
+    async def _handle_duplicate(self, book_path: Path, mp3_files: list, output_path: Path,
+                                duplicate: Dict[str, Any], signature: str,
+                                metadata: Optional[Dict[str, Any]]) -> bool:
+        """
+        Skip or link a book whose audio was already converted elsewhere
+        
+        Returns:
+            True if handled, False otherwise
+        """
+        existing = Path(duplicate['output_path'])
+        self.logger.info(f"Same audio already converted in {duplicate['book_directory']}: {existing.name}")
+        
+        if self.config.duplicates == 'skip':
+            self.logger.info("Duplicate book, skipping conversion")
+            return True
+        
+        try:
+            await asyncio.to_thread(link_or_copy, existing, output_path)
+        except OSError as e:
+            self.logger.error(f"Could not link existing output {existing}: {e}")
+            return False
+        
+        self.logger.info(f"Linked existing output to {output_path}")
+        # The existing output may have detected chapters; its chapter count
+        # was verified when it was converted
+        if not await self._verify_output(output_path, mp3_files, check_chapters=False):
+            return False
+        await self._record_conversion(book_path, output_path, signature, metadata)
+        if self.config.cleanup_originals:
+            self._cleanup_originals(book_path, mp3_files)
+        return True
+    
+    async def _verify_output(self, output_path: Path, mp3_files: list,
+                             expected_chapters: Optional[int] = None, check_chapters: bool = True) -> bool:
+        """
+        Verify the output box structure, duration and chapters
+        
+        A failed output is moved aside with a ``.failed`` suffix so the book is
+        retried on the next import and the originals are kept.
+        
+        Args:
+            output_path: Converted M4B file
+            mp3_files: Source files
+            expected_chapters: Chapter count when chapters were not taken from
+                the file names (detected chapters)
+            check_chapters: False to check only the structure and duration
+        
+        Returns:
+            True if the output passed verification (or verification is disabled)
+        """
+        if not self.config.verify_output:
+            return True
+        
+        def check() -> list:
+            expected_duration = sum(mp3_duration(mp3_file) for mp3_file in mp3_files)
+            tolerance = max(self.config.verify_duration_tolerance_seconds,
+                            expected_duration * self.config.verify_duration_tolerance_percent / 100)
+            chapters = None
+            if self.config.verify_chapters and check_chapters:
+                if expected_chapters:
+                    chapters = expected_chapters
+                elif self.config.use_filenames_as_chapters:
+                    chapters = len(mp3_files)
+            return verify_m4b(output_path, expected_duration, tolerance, chapters)
+        
+        problems = await asyncio.to_thread(check)
+        if not problems:
+            self.logger.info(f"Output verified: {output_path.name}")
+            return True
+        
+        for problem in problems:
+            self.logger.error(f"Output verification failed: {problem}")
+        failed_path = output_path.with_name(output_path.name + ".failed")
+        try:
+            output_path.replace(failed_path)
+            self.logger.error(f"Originals kept, invalid output moved to {failed_path}")
+        except OSError as e:
+            self.logger.error(f"Originals kept, could not move invalid output aside: {e}")
+        return False
+    
+    async def _detect_chapters(self, mp3_files: list) -> Optional[list]:
+        """
+        Find chapter starts from silences in the source audio
+        
+        Runs for books of at most ``chapters.max_files`` files (or always,
+        if configured), where file names make poor chapters. Each file is
+        split into overlapping windows analysed by parallel ffmpeg
+        silencedetect runs, and the silences of each file are cached by its
+        audio fingerprint.
+        
+        Returns:
+            (start, title) chapters, or None to keep the file name chapters
+        """
+        mode = self.config.chapters_detect
+        if mode == 'never' or (mode == 'auto' and len(mp3_files) > self.config.chapters_max_files):
+            return None
+        if not shutil.which("tone"):
+            self.logger.warning("tone not found in PATH, keeping file name chapters")
+            return None
+        
+        sources = sorted(mp3_files, key=natural_sort_key)
+        durations = await asyncio.to_thread(lambda: [mp3_duration(source) for source in sources])
+        silences = []
+        offset = 0.0
+        for source, duration in zip(sources, durations):
+            try:
+                file_silences = await self._file_silences(source, duration)
+            except RuntimeError as e:
+                self.logger.warning(f"Silence detection failed, keeping file name chapters: {e}")
+                return None
+            silences.extend((start + offset, end + offset) for start, end in file_silences)
+            offset += duration
+        
+        silences = merge_silences(silences, self.config.chapters_min_silence_seconds)
+        chapters = chapters_from_silences(silences, offset, self.config.chapters_min_chapter_seconds)
+        if len(chapters) < 2:
+            self.logger.info("No chapter breaks found in silences, keeping file name chapters")
+            return None
+        self.logger.info(f"Detected {len(chapters)} chapters from {len(silences)} silences")
+        return chapters
+    
+    async def _file_silences(self, source: Path, duration: float) -> list:
+        """Silences of one file, from the cache or detected window by window"""
+        settings = {
+            'analysis': 'silencedetect',
+            'noise_db': self.config.chapters_silence_threshold_db,
+            'min_silence': self.config.chapters_min_silence_seconds,
+        }
+        key = await asyncio.to_thread(self.analysis_cache.key, source, settings)
+        cached = await asyncio.to_thread(self.analysis_cache.get, key)
+        if cached is not None:
+            self.logger.debug(f"Silence cache hit: {source.name}")
+            return [tuple(silence) for silence in cached]
+        
+        windows = detection_windows(duration, self.config.chapters_window_seconds,
+                                    self.config.chapters_overlap_seconds)
+        semaphore = asyncio.Semaphore(self._parallel_jobs())
+        self.logger.info(f"Detecting silences in {source.name} over {len(windows)} windows")
+        
+        async def detect(start: float, length: float) -> list:
+            cmd = [
+                "ffmpeg", "-nostdin", "-hide_banner", "-nostats",
+                "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", str(source),
+                "-vn", "-af", f"silencedetect=noise={settings['noise_db']}dB:d={settings['min_silence']}",
+                "-f", "null", "-"
+            ]
+            async with semaphore:
+                returncode, output = await self._run_process(cmd)
+            if returncode != 0:
+                raise RuntimeError(f"ffmpeg silencedetect failed on {source.name}: {output.strip()[-200:]}")
+            return parse_silencedetect(output, start, start + length)
+        
+        results = await asyncio.gather(*(detect(start, length) for start, length in windows))
+        silences = merge_silences(silence for window in results for silence in window)
+        await asyncio.to_thread(self.analysis_cache.store, key, silences)
+        return silences
+    
+    async def _apply_chapters(self, output_path: Path, chapters: list) -> bool:
+        """
+        Replace the chapters of a merged M4B with tone
+        
+        Returns:
+            True if the chapters were written, False to keep the merged ones
+        """
+        chapters_file = output_path.with_name(output_path.name + ".chapters.txt")
+        try:
+            chapters_file.write_text(format_chapters(chapters), encoding='utf-8')
+            returncode, output = await self._run_process(
+                ["tone", "tag", str(output_path), "--meta-chapters-file", str(chapters_file)])
+        finally:
+            chapters_file.unlink(missing_ok=True)
+        if returncode != 0:
+            self.logger.warning(f"tone could not write chapters (return code {returncode}): {output.strip()}")
+            return False
+        return True
+    
+    async def _record_conversion(self, book_path: Path, output_path: Path, signature: Optional[str],
+                                 metadata: Optional[Dict[str, Any]],
+                                 loudness: Optional[Dict[str, float]] = None) -> None:
+        """Add a finished conversion to the index"""
+        try:
+            await asyncio.to_thread(self.index.record, book_path, output_path, signature, metadata, loudness)
+        except Exception as e:
+            self.logger.warning(f"Could not update conversion index: {e}")
+    
+    async def _record_stats(self, book_path: Path, mp3_files: list, output_path: Path,
+                            wall_seconds: float, cpu_seconds: float) -> None:
+        """
+        Add a fully encoded conversion to the throughput statistics
+        
+        Conversions that reused intermediates are skipped, they would make
+        the host look faster than it is. CPU time is counted over all child
+        processes, so it includes other jobs that overlapped this one.
+        """
+        def measure() -> tuple:
+            input_seconds = sum(mp3_duration(mp3_file) for mp3_file in mp3_files)
+            input_bytes = sum(mp3_file.stat().st_size for mp3_file in mp3_files)
+            return input_seconds, input_bytes, output_path.stat().st_size
+        
+        try:
+            input_seconds, input_bytes, output_bytes = await asyncio.to_thread(measure)
+            settings = conversion_settings(self.config, self._parallel_jobs())
+            await asyncio.to_thread(self.stats.record, settings, input_seconds, input_bytes, output_bytes,
+                                    wall_seconds, cpu_seconds, book_path)
+            self.logger.info(f"Converted {input_seconds / 60:.0f} min of audio in {wall_seconds:.0f}s "
+                             f"({input_seconds / max(wall_seconds, 0.001):.1f}x realtime)")
+        except Exception as e:
+            self.logger.warning(f"Could not record conversion statistics: {e}")
+    
+    @staticmethod
+    def _children_cpu_seconds() -> float:
+        """User and system time of finished child processes"""
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    
+    def _parallel_jobs(self) -> int:
+        """Encoder threads for the current conversion"""
+        # Scheduled jobs encode with the CPU tokens they were granted
+        job = current_job.get()
+        if job and self.config.resume_partial:
+            return job.cpu_tokens
+        return max(1, int(self.config.jobs))
+    
     def _has_m4b_files(self, book_path: Path) -> bool:
         """Check if directory already contains M4B files"""
         return len(list(book_path.glob("*.m4b"))) > 0
     
-    async def _wait_for_stability(self, book_path: Path) -> bool:
+    def _resolve_input_files(self, book_path: Path, metadata: Optional[Dict[str, Any]]) -> tuple:
+        """
+        Determine the MP3 files to convert
+        
+        Webhook jobs carry Readarr's exact list of imported files (and usually
+        their sizes), which is used as the authoritative input set. CLI and
+        backfill jobs without that list fall back to scanning the directory.
+        
+        Returns:
+            Tuple of (MP3 file list, expected sizes by path or None)
+        """
+        book_files = (metadata or {}).get('book_files')
+        if not book_files:
+            return list(book_path.glob("*.mp3")), None
+        
+        mp3_files = []
+        expected_sizes = {}
+        for book_file in book_files:
+            file_path = Path(book_file['path'])
+            if file_path.suffix.lower() != '.mp3':
+                continue
+            mp3_files.append(file_path)
+            if book_file.get('size'):
+                expected_sizes[file_path] = book_file['size']
+        
+        if len(expected_sizes) != len(mp3_files):
+            expected_sizes = None
+        return mp3_files, expected_sizes
+    
+    async def _wait_for_stability(self, mp3_files: list, expected_sizes: Optional[Dict[Path, int]] = None) -> bool:
         """
         Wait for file stability to ensure download is complete
         
+        Args:
+            mp3_files: Files to watch
+            expected_sizes: Sizes reported by Readarr; when every file already
+                has its reported size no waiting is needed
+        
         Returns:
             True if files are stable, False if timeout
         """
+        # Get initial file info
+        with tracing.span("stat_files"):
+            initial_files = self._get_file_info(mp3_files)
+        
+        if expected_sizes and all(initial_files.get(path) == size
+                                  for path, size in expected_sizes.items()):
+            self.logger.info("All files match the sizes reported by Readarr, proceeding with conversion")
+            return True
+        
         wait_time = self.config.stability_wait_seconds
         self.logger.info(f"Waiting {wait_time} seconds for file stability...")
         
-        # Get initial file info
-        initial_files = self._get_file_info(book_path)
-        
         await asyncio.sleep(wait_time)
         
         # Check if files changed
-        final_files = self._get_file_info(book_path)
+        with tracing.span("stat_files"):
+            final_files = self._get_file_info(mp3_files)
         
-        if initial_files == final_files:
+        if initial_files == final_files and -1 not in final_files.values():
             self.logger.info("Files are stable, proceeding with conversion")
             return True
         else:
             self.logger.warning("Files still changing, may be incomplete download")
             # Wait a bit more and check again
             await asyncio.sleep(wait_time)
-            retry_files = self._get_file_info(book_path)
+            with tracing.span("stat_files"):
+                retry_files = self._get_file_info(mp3_files)
             
-            if final_files == retry_files:
+            if final_files == retry_files and -1 not in retry_files.values():
                 self.logger.info("Files stable after retry")
                 return True
             else:
                 self.logger.error("Files still changing after retry")
                 return False
     
-    def _get_file_info(self, book_path: Path) -> Dict[str, int]:
-        """Get file sizes for stability checking"""
+    def _get_file_info(self, mp3_files: list) -> Dict[Path, int]:
+        """Get file sizes for stability checking (by full path, names repeat across folders)"""
         file_info = {}
-        for file_path in book_path.glob("*.mp3"):
+        for file_path in mp3_files:
+            file_path = Path(file_path)
             try:
-                file_info[file_path.name] = file_path.stat().st_size
+                file_info[file_path] = file_path.stat().st_size
             except OSError:
                 # File might be being written to
-                file_info[file_path.name] = -1
+                file_info[file_path] = -1
         return file_info
     
     def _generate_output_filename(self, book_path: Path, metadata: Optional[Dict[str, Any]]) -> str:
@@ -132,13 +723,324 @@ class M4BConverter:
         # Fallback to directory name
         return f"{book_path.name}.m4b"
     
-    async def _run_m4b_tool(self, source_path: Path, output_path: Path) -> bool:
+    def _encoder_settings(self, gain_db: float = 0.0) -> Dict[str, Any]:
+        """Settings that determine the content of an encoded intermediate"""
+        settings = {
+            'audio_codec': self.config.audio_codec or 'aac',
+        }
+        # Only normalized encodes carry a gain, so other cache entries stay valid
+        if gain_db:
+            settings['gain_db'] = gain_db
+        return settings
+    
+    async def _analyze_loudness(self, sources: list) -> Optional[Dict[str, float]]:
+        """
+        Measure a book's loudness and choose its normalization gain
+        
+        Each file is measured by a decode-only ebur128 pass, files in
+        parallel, and the result is cached by the file's audio fingerprint.
+        
+        Returns:
+            Loudness record (see loudness.loudness_record), or None if the
+            book could not be measured
+        """
+        settings = {'analysis': 'ebur128'}
+        semaphore = asyncio.Semaphore(self._parallel_jobs())
+        
+        async def measure(source: Path) -> tuple:
+            key = await asyncio.to_thread(self.analysis_cache.key, source, settings)
+            cached = await asyncio.to_thread(self.analysis_cache.get, key)
+            if cached is not None:
+                return tuple(cached)
+            cmd = [
+                "ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-i", str(source),
+                "-vn", "-af", "ebur128=peak=true:framelog=quiet", "-f", "null", "-"
+            ]
+            async with semaphore:
+                returncode, output = await self._run_process(cmd)
+            if returncode != 0:
+                raise RuntimeError(f"ffmpeg ebur128 failed on {source.name}: {output.strip()[-200:]}")
+            result = (await asyncio.to_thread(mp3_duration, source), *parse_ebur128(output))
+            await asyncio.to_thread(self.analysis_cache.store, key, result)
+            return result
+        
+        try:
+            measurements = await asyncio.gather(*(measure(source) for source in sources))
+        except (RuntimeError, ValueError) as e:
+            self.logger.warning(f"Loudness analysis failed, converting without normalization: {e}")
+            return None
+        combined = combine_loudness(measurements)
+        if combined is None:
+            self.logger.warning("Book is silent, converting without normalization")
+            return None
+        lufs, true_peak = combined
+        gain = normalization_gain(lufs, true_peak, self.config.loudness_target_lufs,
+                                  self.config.loudness_max_true_peak_db, self.config.loudness_max_gain_db,
+                                  self.config.loudness_min_adjust_db)
+        self.logger.info(f"Loudness {lufs:.1f} LUFS (true peak {true_peak:.1f} dBTP), applying {gain:+.1f} dB")
+        return loudness_record(lufs, true_peak, gain)
+    
+    async def _convert_with_checkpoint(self, book_path: Path, mp3_files: list, output_path: Path,
+                                       metadata: Optional[Dict[str, Any]] = None,
+                                       run_stats: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Encode each MP3 into a job directory, then merge without re-encoding
+        
+        Finished intermediates are recorded in a manifest, so a restarted or
+        retried job only encodes the files that are still missing.
+        
+        Args:
+            book_path: Audiobook directory
+            mp3_files: Source MP3 files
+            output_path: Output M4B file path
+            metadata: Optional metadata from Readarr
+            run_stats: Optional dict that receives reused and cache hit counts
+                and the loudness record
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if run_stats is None:
+            run_stats = {}
+        if not shutil.which("ffmpeg"):
+            self.logger.error("ffmpeg not found in PATH")
+            return False
+        
+        sources = sorted(mp3_files, key=natural_sort_key)
+        gain = 0.0
+        if self.config.loudness_enabled:
+            with tracing.span("analyze_loudness", files=len(sources)):
+                run_stats['loudness'] = await self._analyze_loudness(sources)
+            if run_stats['loudness']:
+                gain = run_stats['loudness']['gain_db']
+        
+        # The gain is applied by the segment encode itself, not by a second pass
+        encoder = self._encoder_settings(gain)
+        checkpoint = JobCheckpoint(self.config.temp_dir, book_path, encoder)
+        await asyncio.to_thread(checkpoint.load)
+        pending = await asyncio.to_thread(checkpoint.pending, sources)
+        
+        reused = len(sources) - len(pending)
+        run_stats['reused'] = reused
+        if reused:
+            self.logger.info(f"Resuming conversion: reusing {reused} of {len(sources)} encoded files")
+        
+        with tracing.span("encode_segments", files=len(pending), reused=reused):
+            encoded = await self._encode_segments(pending, checkpoint, run_stats, encoder)
+        if not encoded:
+            self.logger.error(f"Encoding incomplete, intermediates kept in {checkpoint.job_dir}")
+            return False
+        
+        extra_args = ["--no-conversion"] + self._metadata_args(metadata)
+        if not self.config.skip_cover:
+            cover = await self._find_cover(book_path, sources)
+            if cover:
+                extra_args.extend(["--cover", str(cover)])
+        
+        # Explicit inputs keep the source order, which segment names may not
+        segments = [checkpoint.segment_path(source) for source in sources]
+        success = await self._run_m4b_tool(checkpoint.segments_dir, output_path, extra_args, inputs=segments)
+        if success:
+            checkpoint.discard()
+        return success
+    
+    async def _encode_segments(self, sources: list, checkpoint: JobCheckpoint,
+                               cache_stats: Optional[Dict[str, Any]] = None,
+                               encoder: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Encode source files to intermediates, up to ``jobs`` at a time
+        
+        Args:
+            sources: Source files still to encode
+            checkpoint: Checkpoint of the job
+            cache_stats: Optional dict that receives segment cache hits and misses
+            encoder: Encoder settings (the configured ones by default)
+        
+        Returns:
+            True if every source was encoded, False otherwise
+        """
+        if not sources:
+            return True
+        
+        parallel = self._parallel_jobs()
+        self.logger.info(f"Encoding {len(sources)} files with {parallel} parallel jobs...")
+        semaphore = asyncio.Semaphore(parallel)
+        partial_dir = checkpoint.job_dir / "partial"
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        encoder = encoder or self._encoder_settings()
+        volume_args = ["-af", f"volume={encoder['gain_db']}dB"] if encoder.get('gain_db') else []
+        if cache_stats is None:
+            cache_stats = {}
+        cache_stats.update(hits=0, misses=0)
+        
+        async def encode(source: Path) -> bool:
+            async with semaphore:
+                segment = checkpoint.segment_path(source)
+                cache_key = None
+                if self.segment_cache:
+                    cache_key = await asyncio.to_thread(self.segment_cache.key, source, encoder)
+                    if await asyncio.to_thread(self.segment_cache.fetch, cache_key, segment):
+                        cache_stats['hits'] += 1
+                        await asyncio.to_thread(checkpoint.mark_done, source, segment)
+                        self.logger.debug(f"Segment cache hit: {source.name}")
+                        return True
+                    cache_stats['misses'] += 1
+                
+                partial = partial_dir / segment.name
+                cmd = [
+                    "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                    "-i", str(source),
+                    "-vn", *volume_args, "-c:a", encoder['audio_codec'],
+                    str(partial)
+                ]
+                returncode, output = await self._run_process(cmd)
+                if returncode != 0 or not partial.exists():
+                    self.logger.error(f"Encoding failed for {source.name}: {output.strip()}")
+                    partial.unlink(missing_ok=True)
+                    return False
+                
+                partial.replace(segment)
+                await asyncio.to_thread(checkpoint.mark_done, source, segment)
+                if cache_key:
+                    await asyncio.to_thread(self.segment_cache.store, cache_key, segment)
+                self.logger.info(f"Encoded: {source.name}")
+                return True
+        
+        results = await asyncio.gather(*(encode(source) for source in sources))
+        if self.segment_cache:
+            self.logger.info(f"Segment cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        return all(results)
+    
+    def _metadata_args(self, metadata: Optional[Dict[str, Any]]) -> list:
+        """
+        Tag arguments from Readarr metadata
+        
+        Intermediates may come from the segment cache and carry the tags of an
+        earlier import, so the merge sets the current values explicitly.
+        """
+        if not metadata:
+            return []
+        
+        args = []
+        author = metadata.get('author_name')
+        title = metadata.get('book_title')
+        if title:
+            args.extend(["--name", title, "--album", title])
+        if author:
+            args.extend(["--artist", author, "--albumartist", author])
+        return args
+    
+    async def _find_cover(self, book_path: Path, sources: list) -> Optional[Path]:
+        """
+        Pick the best cover image and shrink it to the configured limits
+        
+        Folder images and the embedded pictures of the sources are compared
+        (see cover.find_covers). The processed image is cached by the hash of
+        the source image, so each distinct artwork is only resized once.
+        
+        Args:
+            book_path: Book directory
+            sources: MP3 files of the book (may be empty)
+        
+        Returns:
+            Path of the image to embed, or None if the book has no artwork
+        """
+        with tracing.span("find_cover", files=len(sources)):
+            candidate = best_cover(await asyncio.to_thread(find_covers, book_path, sorted(sources)))
+        if not candidate:
+            return None
+        
+        settings = {
+            'max_size_px': self.config.cover_max_size_px,
+            'max_kb': self.config.cover_max_kb,
+            'quality': self.config.cover_quality,
+        }
+        key = await asyncio.to_thread(self.cover_cache.key, candidate, settings)
+        cached = self.cover_cache.get(key)
+        if cached:
+            return cached
+        
+        self.cover_cache.cache_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="cover-", dir=self.cover_cache.cache_dir))
+        try:
+            source = work_dir / ("source.png" if candidate['mime'] == 'image/png' else "source.jpg")
+            await asyncio.to_thread(copy_image, candidate, source)
+            
+            max_px = self.config.cover_max_size_px
+            max_bytes = self.config.cover_max_kb * 1024
+            if max(candidate['width'], candidate['height']) <= max_px and candidate['size'] <= max_bytes:
+                return await asyncio.to_thread(self.cover_cache.store, key, source)
+            
+            resized = await self._resize_cover(source, work_dir / "cover.jpg", max_px, max_bytes)
+            if not resized:
+                self.logger.warning(f"Could not resize {candidate['width']}x{candidate['height']} cover "
+                                    f"from {candidate['path'].name}, embedding it unchanged")
+                resized = source
+            else:
+                self.logger.info(f"Cover from {candidate['path'].name} resized from "
+                                 f"{candidate['size'] // 1024} KB to {resized.stat().st_size // 1024} KB")
+            return await asyncio.to_thread(self.cover_cache.store, key, resized)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _resize_cover(self, source: Path, output: Path, max_px: int, max_bytes: int) -> Optional[Path]:
+        """
+        Downscale an image to fit ``max_px`` and recompress it as JPEG
+        
+        The JPEG quality is lowered step by step until the image fits in
+        ``max_bytes`` or the lowest quality is reached.
+        
+        Returns:
+            The output path, or None if ffmpeg is unavailable or failed
+        """
+        if not shutil.which("ffmpeg"):
+            return None
+        scale = f"scale='min(iw,{max_px})':'min(ih,{max_px})':force_original_aspect_ratio=decrease"
+        quality = self.config.cover_quality
+        while True:
+            cmd = [
+                "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", str(source), "-vf", scale, "-frames:v", "1", "-q:v", str(quality), str(output)
+            ]
+            with tracing.span("resize_cover", quality=quality):
+                returncode, output_text = await self._run_process(cmd)
+            if returncode != 0 or not output.exists():
+                self.logger.debug(f"ffmpeg failed to resize cover: {output_text.strip()}")
+                return None
+            if output.stat().st_size <= max_bytes or quality >= MAX_COVER_QSCALE:
+                return output
+            quality = min(quality + COVER_QSCALE_STEP, MAX_COVER_QSCALE)
+    
+    async def _run_process(self, cmd: list, cwd: Optional[Path] = None) -> tuple:
+        """
+        Run a helper process to completion
+        
+        Returns:
+            Tuple of (return code, combined output)
+        """
+        try:
+            process = await self.resources.spawn(
+                cmd, current_job.get(),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=cwd
+            )
+            with track_process(process):
+                stdout, _ = await process.communicate()
+            return process.returncode, stdout.decode(errors='replace')
+        except Exception as e:
+            return -1, str(e)
+    
+    async def _run_m4b_tool(self, source_path: Path, output_path: Path, extra_args: Optional[list] = None,
+                            inputs: Optional[list] = None) -> bool:
         """
         Run m4b-tool to convert the audiobook
         
         Args:
-            source_path: Directory containing MP3 files
+            source_path: Directory containing the input files
             output_path: Output M4B file path
+            extra_args: Additional m4b-tool arguments for this run
+            inputs: Explicit input files (defaults to the whole directory)
             
         Returns:
             True if successful, False otherwise
@@ -149,62 +1051,72 @@ class M4BConverter:
             return False
         
         # Build command with proper path handling
-        cmd = [
-            "m4b-tool",
-            "merge",
-            str(source_path),
-            "--output-file", str(output_path)
-        ]
+        cmd = ["m4b-tool", "merge"]
+        cmd.extend(str(path) for path in inputs or [source_path])
+        cmd.extend(["--output-file", str(output_path)])
         
         # Add configuration options
         cmd.extend(self.config.get_m4b_tool_args())
+        if extra_args:
+            cmd.extend(extra_args)
         
         self.logger.info(f"Running: {' '.join(cmd)}")
         
-        try:
-            # Run the command with real-time output
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,  # Merge stderr into stdout
-                cwd=source_path
-            )
+        trace = tracing.current_trace()
+        with tracing.span("m4b_tool", inputs=len(inputs or [source_path])):
+            try:
+                # Run the command with real-time output
+                # Own process group, so pausing a job stops ffmpeg too; the job's
+                # resource profile is inherited by the whole tree
+                process = await self.resources.spawn(
+                    cmd, current_job.get(),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,  # Merge stderr into stdout
+                    cwd=source_path
+                )
+            
+                # Stream output in real-time
+                stdout_lines = []
+                with track_process(process):
+                    while True:
+                        line = await process.stdout.readline()
+                        if not line:
+                            break
+                        
+                        line_text = line.decode().strip()
+                        if line_text:
+                            stdout_lines.append(line_text)
+                            if trace:
+                                phase = _m4b_tool_phase(line_text)
+                                if phase:
+                                    trace.set_phase("m4b-tool", phase)
+                            # Log progress lines that show actual progress
+                            if any(keyword in line_text.lower() for keyword in ['progress', '%', 'encoding', 'merging', 'chapter', 'processing']):
+                                self.logger.info(f"m4b-tool: {line_text}")
+                
+                    await process.wait()
+                if trace:
+                    trace.end_phase("m4b-tool")
             
-            # Stream output in real-time
-            stdout_lines = []
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
-                    
-                line_text = line.decode().strip()
-                if line_text:
-                    stdout_lines.append(line_text)
-                    # Log progress lines that show actual progress
-                    if any(keyword in line_text.lower() for keyword in ['progress', '%', 'encoding', 'merging', 'chapter', 'processing']):
-                        self.logger.info(f"m4b-tool: {line_text}")
-            
-            await process.wait()
-            
-            # Log full output for debugging
-            if stdout_lines:
-                self.logger.debug(f"m4b-tool full output: {chr(10).join(stdout_lines)}")
-            
-            # Check if output file was actually created
-            if process.returncode == 0:
-                if output_path.exists():
-                    self.logger.info(f"m4b-tool completed successfully - output file created: {output_path}")
-                    return True
+                # Log full output for debugging
+                if stdout_lines:
+                    self.logger.debug(f"m4b-tool full output: {chr(10).join(stdout_lines)}")
+            
+                # Check if output file was actually created
+                if process.returncode == 0:
+                    if output_path.exists():
+                        self.logger.info(f"m4b-tool completed successfully - output file created: {output_path}")
+                        return True
+                    else:
+                        self.logger.error(f"m4b-tool reported success but output file not found: {output_path}")
+                        return False
                 else:
-                    self.logger.error(f"m4b-tool reported success but output file not found: {output_path}")
+                    self.logger.error(f"m4b-tool failed with return code {process.returncode}")
                     return False
-            else:
-                self.logger.error(f"m4b-tool failed with return code {process.returncode}")
-                return False
                 
-        except Exception as e:
-            self.logger.error(f"Error running m4b-tool: {e}")
-            return False
+            except Exception as e:
+                self.logger.error(f"Error running m4b-tool: {e}")
+                return False
     
     def _cleanup_originals(self, book_path: Path, mp3_files: list) -> None:
         """Remove original MP3 files after successful conversion"""
@@ -0,0 +1,185 @@
+"""Cover art discovery and caching for ReadarrM4B"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from mp3info import id3_pictures
+
+IMAGE_SUFFIXES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
+
+# Folder image names that are meant as the cover, best first
+COVER_NAMES = ("cover", "folder", "front")
+
+# ID3 picture type of the front cover
+FRONT_COVER = 3
+
+# Bytes hashed to tell embedded copies of the same picture apart
+DEDUPE_BYTES = 4096
+
+READ_CHUNK = 1024 * 1024
+
+JPEG_SOF_MARKERS = set(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+
+
+def image_dimensions(path: Path, offset: int = 0, size: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """
+    Width and height of a JPEG or PNG image from its header
+
+    The image may be embedded in a larger file (an ID3 picture frame) at
+    ``offset``. JPEG segments are skipped with seeks up to the frame header.
+
+    Returns:
+        (width, height), or None if the image is not a readable JPEG or PNG
+    """
+    end = offset + size if size is not None else None
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            head = f.read(24)
+            if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if not head.startswith(b'\xff\xd8'):
+                return None
+            pos = offset + 2
+            while end is None or pos + 4 <= end:
+                f.seek(pos)
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xff:
+                    return None
+                if marker[1] == 0xff:  # Fill byte
+                    pos += 1
+                    continue
+                if marker[1] == 0x01 or 0xd0 <= marker[1] <= 0xd8:  # No length field
+                    pos += 2
+                    continue
+                segment = f.read(7)
+                if len(segment) < 2:
+                    return None
+                if marker[1] in JPEG_SOF_MARKERS:
+                    if len(segment) < 7:
+                        return None
+                    height, width = struct.unpack('>HH', segment[3:7])
+                    return width, height
+                pos += 2 + struct.unpack('>H', segment[:2])[0]
+    except OSError:
+        pass
+    return None
+
+
+def find_covers(book_path: Optional[Path], sources: List[Path]) -> List[Dict[str, Any]]:
+    """
+    Cover candidates among folder images and embedded ID3 pictures
+
+    Args:
+        book_path: Book directory, or None to only look at the sources
+        sources: MP3 files of the book
+
+    Returns:
+        Candidate dicts with path, offset and size of the image bytes, mime,
+        width, height and priority (lower is better). Embedded pictures that
+        appear in several files are listed once.
+    """
+    candidates = []
+    if book_path and book_path.is_dir():
+        for path in sorted(book_path.iterdir()):
+            mime = IMAGE_SUFFIXES.get(path.suffix.lower())
+            if not mime or not path.is_file():
+                continue
+            named = path.stem.lower() in COVER_NAMES
+            candidates.append({'path': path, 'offset': 0, 'size': path.stat().st_size, 'mime': mime,
+                               'priority': 0 if named else 2})
+
+    seen = set()
+    for source in sources:
+        try:
+            pictures = id3_pictures(source)
+        except OSError:
+            continue
+        for picture in pictures:
+            if picture['mime'] not in IMAGE_SUFFIXES.values():
+                continue
+            with open(source, 'rb') as f:
+                f.seek(picture['offset'])
+                digest = hashlib.sha1(f.read(DEDUPE_BYTES)).hexdigest()
+            if (picture['size'], digest) in seen:
+                continue
+            seen.add((picture['size'], digest))
+            candidates.append({'path': source, 'offset': picture['offset'], 'size': picture['size'],
+                               'mime': picture['mime'],
+                               'priority': 1 if picture['picture_type'] == FRONT_COVER else 3})
+
+    for candidate in candidates:
+        dimensions = image_dimensions(candidate['path'], candidate['offset'], candidate['size'])
+        candidate['width'], candidate['height'] = dimensions or (0, 0)
+    return [candidate for candidate in candidates if candidate['width'] and candidate['height']]
+
+
+def best_cover(candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The candidate with the best priority, then the most pixels"""
+    if not candidates:
+        return None
+    return min(candidates, key=lambda c: (c['priority'], -c['width'] * c['height']))
+
+
+def copy_image(candidate: Dict[str, Any], destination: Path) -> None:
+    """Write the image bytes of a candidate to ``destination``"""
+    with open(candidate['path'], 'rb') as src, open(destination, 'wb') as dst:
+        src.seek(candidate['offset'])
+        remaining = candidate['size']
+        while remaining > 0:
+            chunk = src.read(min(READ_CHUNK, remaining))
+            if not chunk:
+                break
+            dst.write(chunk)
+            remaining -= len(chunk)
+
+
+class CoverCache:
+    """
+    Processed cover images keyed by source image hash and settings
+
+    A book's cover is downscaled once; re-conversions and retags of books
+    sharing the same artwork reuse the result.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, candidate: Dict[str, Any], settings: Dict[str, Any]) -> str:
+        """Cache key from the image bytes and the processing settings"""
+        digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        with open(candidate['path'], 'rb') as f:
+            f.seek(candidate['offset'])
+            remaining = candidate['size']
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        """Cached image, or None on a miss"""
+        for suffix in ('.jpg', '.png'):
+            path = self.cache_dir / f"{key}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def store(self, key: str, image: Path) -> Path:
+        """Copy a processed image into the cache atomically"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        suffix = '.png' if image.suffix.lower() == '.png' else '.jpg'
+        destination = self.cache_dir / f"{key}{suffix}"
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(image, temp_path)
+        os.replace(temp_path, destination)
+        return destination
@@ -0,0 +1,182 @@
+"""Live diagnostics for the running ReadarrM4B daemon"""
+
+import asyncio
+import concurrent.futures
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+# Seconds the loop has to answer before a report is returned without it
+LOOP_RESPONSE_TIMEOUT = 5
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up from short sleeps
+
+    Only started when the admin endpoints are enabled.
+    """
+
+    def __init__(self, interval: float = 0.5, history: int = 600):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+
+    async def run(self) -> None:
+        """Sample loop lag until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def stats(self) -> Dict[str, Any]:
+        """Lag statistics in milliseconds over the recorded history"""
+        if not self.samples:
+            return {'samples': 0}
+        ordered = sorted(self.samples)
+        return {
+            'samples': len(ordered),
+            'last_ms': round(self.samples[-1] * 1000, 3),
+            'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+            'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3),
+        }
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sampling CPU profile of every thread in collapsed-stack format
+
+    The output (``frame;frame;frame count`` per line) can be fed to
+    flamegraph.pl or speedscope.
+
+    Args:
+        seconds: How long to sample
+        interval: Time between samples
+
+    Returns:
+        Collapsed stacks, most frequent first
+    """
+    own_thread = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def profile_loop(loop: asyncio.AbstractEventLoop, seconds: float, limit: int = 50) -> str:
+    """
+    Deterministic cProfile of the event loop thread for a number of seconds
+
+    Args:
+        loop: Running event loop (called from another thread)
+        seconds: How long to profile
+        limit: Number of functions to report
+
+    Returns:
+        pstats report sorted by cumulative time
+    """
+    profiler = cProfile.Profile()
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def enable():
+        profiler.enable()
+        started.set()
+
+    def disable():
+        profiler.disable()
+        stopped.set()
+
+    loop.call_soon_threadsafe(enable)
+    started.wait(timeout=5)
+    time.sleep(seconds)
+    loop.call_soon_threadsafe(disable)
+    stopped.wait(timeout=5)
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue()
+
+
+class MemorySnapshots:
+    """tracemalloc top allocations and the difference since the last call"""
+
+    def __init__(self):
+        self._last: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def report(self, limit: int = 25) -> Dict[str, Any]:
+        """
+        Take a snapshot and compare it with the previous one
+
+        tracemalloc is started on the first call, so allocations made before
+        then are not attributed.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._last = tracemalloc.take_snapshot()
+                return {'status': 'tracemalloc started, request again for allocations'}
+
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            report = {
+                'traced_bytes': current,
+                'peak_bytes': peak,
+                'top': [
+                    {'location': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:limit]
+                ],
+                'diff': [],
+            }
+            if self._last is not None:
+                report['diff'] = [
+                    {'location': str(stat.traceback), 'size_diff': stat.size_diff,
+                     'count_diff': stat.count_diff}
+                    for stat in snapshot.compare_to(self._last, 'lineno')[:limit]
+                ]
+            self._last = snapshot
+            return report
+
+
+async def _count_tasks() -> int:
+    return len(asyncio.all_tasks())
+
+
+def loop_report(loop: asyncio.AbstractEventLoop, monitor: Optional[LoopLagMonitor]) -> Dict[str, Any]:
+    """
+    Loop lag and pending task count (called from a server thread)
+
+    A blocked loop cannot count its tasks; the report then has
+    ``pending_tasks`` None and an ``error``, but still the lag samples.
+    """
+    report = {'lag': monitor.stats() if monitor else {'samples': 0}}
+    future = asyncio.run_coroutine_threadsafe(_count_tasks(), loop)
+    try:
+        # The counting coroutine itself is excluded
+        report['pending_tasks'] = future.result(timeout=LOOP_RESPONSE_TIMEOUT) - 1
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        report['pending_tasks'] = None
+        report['error'] = f"Event loop did not respond within {LOOP_RESPONSE_TIMEOUT}s"
+    return report
@@ -0,0 +1,159 @@
+"""Worker side of the coordinator/worker job-lease protocol"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import Config
+from converter import M4BConverter
+from resources import release_cgroup
+from scheduler import ACTIONS, Job, current_job
+
+
+class LeaseClient:
+    """
+    JSON client for a coordinator's lease endpoints
+
+    POST /lease                      take a job (``{"lease": null}`` when idle)
+    POST /lease/<id>/heartbeat       extend the lease (410 once it is lost)
+    POST /lease/<id>/complete        report the result
+    """
+
+    def __init__(self, url: str, token: str = '', timeout: float = 30):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> tuple:
+        """POST JSON and return (status, parsed body)"""
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        if self.token:
+            request.add_header('X-Worker-Token', self.token)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            return e.code, {}
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lease the next job, or None if the queue is empty"""
+        status, body = self._post('/lease', {'worker': worker_id})
+        if status != 200:
+            raise ConnectionError(f"Coordinator refused lease request with status {status}")
+        return body.get('lease')
+
+    def heartbeat(self, lease_id: str) -> bool:
+        """Extend a lease; False if the coordinator no longer holds it for us"""
+        status, _ = self._post(f'/lease/{lease_id}/heartbeat', {})
+        return status == 200
+
+    def complete(self, lease_id: str, success: bool, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Report a finished job; False if the lease had already expired"""
+        status, _ = self._post(f'/lease/{lease_id}/complete', {'success': success, **(result or {})})
+        return status == 200
+
+
+class Worker:
+    """
+    Convert books leased from a coordinator
+
+    Runs ``worker.jobs`` leases at a time. While a job runs its lease is
+    renewed every third of the lease period; if the coordinator reports the
+    lease lost (it expired and was requeued) the local job is stopped.
+    """
+
+    def __init__(self, config: Config, url: str, converter=None, worker_id: Optional[str] = None):
+        self.config = config
+        self.converter = converter or M4BConverter(config)
+        self.client = LeaseClient(url, config.coordinator_token)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.logger = logging.getLogger(__name__)
+
+    async def run(self) -> None:
+        """Lease and run jobs until cancelled"""
+        self.logger.info(f"Worker {self.worker_id} polling {self.client.url}")
+        await asyncio.gather(*(self._work_loop() for _ in range(max(1, int(self.config.worker_jobs)))))
+
+    async def _work_loop(self) -> None:
+        """Take one lease at a time"""
+        while True:
+            try:
+                lease = await asyncio.to_thread(self.client.lease, self.worker_id)
+            except (OSError, ConnectionError) as e:
+                self.logger.warning(f"Could not reach coordinator: {e}")
+                lease = None
+            if lease is None:
+                await asyncio.sleep(self.config.worker_poll_interval)
+                continue
+            await self._run_lease(lease)
+
+    async def _run_lease(self, lease: Dict[str, Any]) -> None:
+        """Run a leased job, heartbeating until it finishes, and report the result"""
+        spec = lease['job']
+        lease_id = lease['id']
+        book_path = Path(spec['book_path'])
+        job = Job(book_path, spec.get('metadata'), source='lease', action=spec['action'],
+                  job_class=spec.get('class'))
+        job.cpu_tokens = max(1, int(self.config.jobs))
+        method = getattr(self.converter, ACTIONS[job.action][0])
+        self.logger.info(f"Leased job {spec['id']}: {book_path}")
+
+        async def run_job():
+            current_job.set(job)
+            try:
+                return await method(book_path, job.metadata)
+            finally:
+                release_cgroup(job)
+
+        task = asyncio.create_task(run_job())
+        interval = max(1.0, lease['lease_seconds'] / 3)
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                break
+            try:
+                held = await asyncio.to_thread(self.client.heartbeat, lease_id)
+            except OSError as e:
+                # Keep working; the coordinator requeues the job if we stay unreachable
+                self.logger.warning(f"Heartbeat failed: {e}")
+                continue
+            if not held:
+                self.logger.warning(f"Lease for {book_path} lost, stopping job")
+                job.signal(signal.SIGTERM)
+                task.cancel()
+                return
+
+        success = False
+        try:
+            success = task.result()
+        except Exception as e:
+            self.logger.error(f"Job {spec['id']} failed: {e}")
+
+        result = {}
+        if success:
+            record = await asyncio.to_thread(self.converter.index.get, book_path)
+            if record:
+                result = {'output_path': record['output_path'], 'signature': record['signature'],
+                          'loudness': self.converter.index.loudness(record)}
+        try:
+            accepted = await asyncio.to_thread(self.client.complete, lease_id, success, result)
+        except OSError as e:
+            self.logger.error(f"Could not report result for {book_path}: {e}")
+            return
+        if not accepted:
+            self.logger.warning(f"Coordinator discarded the result for {book_path} (lease expired)")
+        else:
+            self.logger.info(f"{'✅' if success else '❌'} Reported job {spec['id']}: {book_path}")
+
+
+async def run_worker(config: Config, url: str) -> None:
+    """Run worker mode against a coordinator"""
+    await Worker(config, url).run()
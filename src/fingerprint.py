@@ -0,0 +1,112 @@
+"""Fast sampled content fingerprints for ReadarrM4B"""
+
+import hashlib
+import mmap
+from pathlib import Path
+from typing import Iterable
+
+SAMPLE_SIZE = 64 * 1024
+
+
+def audio_payload_range(data, size: int) -> tuple:
+    """
+    Locate the audio data of an MP3, excluding ID3v2 and ID3v1 tags
+
+    Args:
+        data: Buffer supporting slicing (bytes or mmap)
+        size: Total size of the buffer
+
+    Returns:
+        Tuple of (start, end) offsets
+    """
+    start, end = 0, size
+    header = data[:10]
+    if len(header) == 10 and header[:3] == b'ID3':
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    return min(start, end), end
+
+
+def file_fingerprint(path: Path, sample_size: int = SAMPLE_SIZE) -> str:
+    """
+    Fingerprint a file from its size and head, middle and tail samples
+
+    Tags are excluded, so the same audio imported under a different author
+    or edition produces the same fingerprint. Only three samples are read
+    through mmap, which keeps the cost independent of the file size.
+
+    Args:
+        path: Audio file
+        sample_size: Bytes per sample
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            digest.update(b'0')
+            return digest.hexdigest()
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start, end = audio_payload_range(data, size)
+            length = end - start
+            digest.update(str(length).encode())
+            if length <= 3 * sample_size:
+                digest.update(data[start:end])
+            else:
+                middle = start + (length - sample_size) // 2
+                digest.update(data[start:start + sample_size])
+                digest.update(data[middle:middle + sample_size])
+                digest.update(data[end - sample_size:end])
+    return digest.hexdigest()
+
+
+def audio_digest(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash all audio data of a file, excluding tags
+
+    Unlike file_fingerprint every byte is read, so files that only differ
+    outside the samples (a repaired or re-encoded file of the same size)
+    get different digests.
+
+    Args:
+        path: Audio file
+        chunk_size: Bytes hashed per step
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return digest.hexdigest()
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start, end = audio_payload_range(data, size)
+            for offset in range(start, end, chunk_size):
+                digest.update(data[offset:min(offset + chunk_size, end)])
+    return digest.hexdigest()
+
+
+def book_signature(files: Iterable[Path]) -> str:
+    """
+    Combine per-file fingerprints into a signature for a whole book
+
+    Fingerprints are sorted, so the signature does not depend on how the
+    files are named in a particular copy of the book.
+
+    Args:
+        files: Audio files of the book
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for fingerprint in sorted(file_fingerprint(Path(f)) for f in files):
+        digest.update(fingerprint.encode())
+    return digest.hexdigest()
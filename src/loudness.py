@@ -0,0 +1,80 @@
+"""Loudness analysis and normalization gain for ReadarrM4B"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+INTEGRATED_PATTERN = re.compile(r'Integrated loudness:\s*I:\s*(-?\d+(?:\.\d+)?|-inf) LUFS', re.S)
+TRUE_PEAK_PATTERN = re.compile(r'True peak:\s*Peak:\s*(-?\d+(?:\.\d+)?|-inf) dBFS', re.S)
+
+# ebur128 reports silence as -70 LUFS (its absolute gate)
+SILENCE_LUFS = -70.0
+
+
+def parse_ebur128(output: str) -> Tuple[float, float]:
+    """
+    Integrated loudness and true peak from the summary of ffmpeg's ebur128 filter
+
+    Returns:
+        (LUFS, dBTP) tuple
+
+    Raises:
+        ValueError: If the output has no summary
+    """
+    integrated = INTEGRATED_PATTERN.findall(output)
+    peak = TRUE_PEAK_PATTERN.findall(output)
+    if not integrated or not peak:
+        raise ValueError("No ebur128 summary in ffmpeg output")
+    return float(integrated[-1]), float(peak[-1])
+
+
+def combine_loudness(measurements: List[Tuple[float, float, float]]) -> Optional[Tuple[float, float]]:
+    """
+    Loudness of a whole book from per-file measurements
+
+    Integrated loudness is averaged in the energy domain, weighted by
+    duration; silent files are left out. This ignores gating across file
+    boundaries, which is close enough for setting a gain.
+
+    Args:
+        measurements: (duration, LUFS, dBTP) per file
+
+    Returns:
+        (LUFS, dBTP) of the book, or None if everything is silent
+    """
+    energy = 0.0
+    total = 0.0
+    for duration, lufs, _ in measurements:
+        if lufs <= SILENCE_LUFS or duration <= 0:
+            continue
+        energy += duration * 10 ** (lufs / 10)
+        total += duration
+    if not total:
+        return None
+    return 10 * math.log10(energy / total), max(peak for _, _, peak in measurements)
+
+
+def normalization_gain(lufs: float, true_peak: float, target: float, max_true_peak: float,
+                       max_gain: float, min_adjust: float) -> float:
+    """
+    Gain in dB that moves a book to the target loudness
+
+    The gain never pushes the true peak above ``max_true_peak``, is limited
+    to ``max_gain`` either way, and is 0 below ``min_adjust`` so nearly
+    normalized books are encoded exactly as without normalization.
+    """
+    gain = min(target - lufs, max_true_peak - true_peak)
+    gain = max(-max_gain, min(max_gain, gain))
+    if abs(gain) < min_adjust:
+        return 0.0
+    return round(gain, 1)
+
+
+def loudness_record(lufs: float, true_peak: float, gain: float) -> Dict[str, float]:
+    """Measured and applied loudness as stored with a job and in the index"""
+    return {
+        'measured_lufs': round(lufs, 1),
+        'true_peak_db': round(true_peak, 1),
+        'gain_db': gain,
+        'output_lufs': round(lufs + gain, 1),
+    }
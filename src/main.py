@@ -7,15 +7,68 @@ Supports both CLI and HTTP API modes
 import asyncio
 import json
 import logging
+import math
 import os
 import sys
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
+from urllib.parse import parse_qs, urlparse
 
+import diagnostics
+from calibration import calibrate
 from config import Config
+from config_reload import ConfigReloader
 from converter import M4BConverter
-from utils import setup_logging
+from distributed import run_worker
+from ratelimit import TokenBucketLimiter
+from report import DirectoryTotalsCache, format_report, library_report, walk_library
+from scheduler import ConversionScheduler
+from stats import book_audio, conversion_settings, plan
+from utils import format_duration, format_size, setup_logging
+from watcher import BookWatcher, directory_state, find_pending_books
+
+# Readarr events that change metadata but not audio
+RETAG_EVENTS = ('Retag', 'BookFileRetag')
+# Readarr events that move book files to another directory
+MOVE_EVENTS = ('Rename', 'Move')
+
+
+def book_metadata(data: dict) -> dict:
+    """
+    Conversion metadata from a Readarr book payload
+    
+    Raises:
+        ValueError: If the payload has no author, title or book files
+    """
+    author_data = data.get('author') or {}
+    book_data = data.get('book') or {}
+    author_name = author_data.get('name')
+    book_title = book_data.get('title')
+    if not author_name or not book_title:
+        raise ValueError('Missing author name or book title in webhook')
+    
+    # Get the directory path from the first book file (Retag events send a single bookFile)
+    raw_files = data.get('bookFiles') or ([data['bookFile']] if data.get('bookFile') else [])
+    book_files = [
+        {'path': book_file['path'], 'size': book_file.get('size')}
+        for book_file in raw_files
+        if book_file.get('path')
+    ]
+    if not book_files:
+        raise ValueError('Could not determine book directory from bookFiles')
+    
+    return {
+        'author_name': author_name,
+        'book_title': book_title,
+        'author_path': author_data.get('path'),
+        'book_directory': str(Path(book_files[0]['path']).parent),
+        'book_id': book_data.get('id'),
+        'book_files': book_files,
+        'is_test': False
+    }
 
 
 class WebhookHandler(BaseHTTPRequestHandler):
@@ -24,17 +77,33 @@ class WebhookHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests with audiobook conversion data"""
         try:
+            # Workers poll and heartbeat often; they are authenticated instead of rate limited
+            if urlparse(self.path).path.startswith('/lease'):
+                self._handle_lease(urlparse(self.path).path)
+                return
+            
+            # Refuse floods before reading or logging the body
+            retry = self.server.rate_limiter.acquire(self.client_address[0])
+            if retry:
+                self._send_json_response(429, {'error': 'Rate limit exceeded'},
+                                         {'Retry-After': str(math.ceil(retry))})
+                return
+            
+            if urlparse(self.path).path == '/bulk':
+                self._handle_bulk()
+                return
+            
             content_length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
             
             # Log full request to dedicated webhook log file
-            webhook_log_file = Path(self.server.config.webhook_log_file)
-            with open(webhook_log_file, "a") as f:
-                f.write(f"\n=== WEBHOOK RECEIVED {self._get_timestamp()} ===\n")
-                f.write(f"Headers: {dict(self.headers)}\n")
-                f.write(f"Data: {json.dumps(data, indent=2)}\n")
-                f.write("=" * 50 + "\n")
+            self.server.requests_logger.info(
+                f"\n=== WEBHOOK RECEIVED {self._get_timestamp()} ===\n"
+                f"Headers: {dict(self.headers)}\n"
+                f"Data: {json.dumps(data, indent=2)}\n"
+                + "=" * 50
+            )
             
             # Also save JSON for debugging
             webhook_json_file = Path(self.server.config.webhook_json_file)
@@ -59,106 +128,462 @@ class WebhookHandler(BaseHTTPRequestHandler):
                 self._send_json_response(200, {'status': 'success', 'message': 'Test successful'})
                 return
             
-            if not author_name or not book_title:
-                self._send_json_response(400, {'error': 'Missing author name or book title in webhook'})
+            # Renames carry the moved files instead of a book
+            if event_type in MOVE_EVENTS:
+                if self._reject_if_queue_full():
+                    return
+                self._queue_moves(data, author_name, author_path)
                 return
             
-            # Get the directory path from the first book file
-            book_files = data.get('bookFiles', [])
-            book_directory = None
-            if book_files:
-                first_file_path = book_files[0].get('path', '')
-                if first_file_path:
-                    book_directory = str(Path(first_file_path).parent)
+            try:
+                metadata = book_metadata(data)
+            except ValueError as e:
+                self._send_json_response(400, {'error': str(e)})
+                return
+            book_directory = metadata['book_directory']
             
-            if not book_directory:
-                self._send_json_response(400, {'error': 'Could not determine book directory from bookFiles'})
+            if self._reject_if_queue_full():
                 return
             
-            # Queue conversion
-            metadata = {
-                'author_name': author_name,
-                'book_title': book_title,
-                'author_path': author_path,
-                'book_directory': book_directory,
-                'is_test': False
-            }
+            # Metadata changes only rewrite the tags of the existing M4B
+            if event_type in RETAG_EVENTS:
+                self.server.webhook_logger.info(f"Queueing retag for directory: {book_directory}")
+                job = self.server.scheduler.submit(Path(book_directory), metadata, action='retag')
+                self._send_json_response(202, {'status': 'accepted', 'message': 'Retag queued', 'job_id': job.id})
+                return
             
             self.server.webhook_logger.info(f"Queueing conversion for directory: {book_directory}")
             
-            # Schedule the conversion task in the main event loop
-            import threading
-            if hasattr(self.server, '_event_loop') and self.server._event_loop:
-                asyncio.run_coroutine_threadsafe(self._convert_audiobook(metadata), self.server._event_loop)
-            else:
-                self.server.webhook_logger.error("No event loop available for conversion task")
+            # Hand the conversion to the scheduler running in the main event loop
+            job = self.server.scheduler.submit(Path(book_directory), metadata)
             
-            self._send_json_response(202, {'status': 'accepted', 'message': 'Conversion queued'})
+            self._send_json_response(202, {'status': 'accepted', 'message': 'Conversion queued', 'job_id': job.id})
             
         except Exception as e:
             self.server.webhook_logger.error(f"Request error: {e}")
             self._send_json_response(500, {'error': str(e)})
     
+    def _handle_lease(self, path: str):
+        """Job-lease protocol for --worker processes (only when the coordinator is enabled)"""
+        config = self.server.config
+        if not config.coordinator_enabled:
+            self._send_json_response(404, {'error': 'Not found'})
+            return
+        if config.coordinator_token and self.headers.get('X-Worker-Token') != config.coordinator_token:
+            self._send_json_response(403, {'error': 'Invalid worker token'})
+            return
+        
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(content_length) or b'{}')
+        scheduler = self.server.scheduler
+        parts = path.strip('/').split('/')
+        
+        if parts == ['lease']:
+            job = scheduler.lease(body.get('worker') or self.client_address[0], config.coordinator_lease_seconds)
+            lease = None
+            if job:
+                lease = {
+                    'id': job.lease_id,
+                    'lease_seconds': config.coordinator_lease_seconds,
+                    'job': {'id': job.id, 'book_path': str(job.book_path), 'metadata': job.metadata,
+                            'action': job.action, 'class': job.job_class},
+                }
+            self._send_json_response(200, {'lease': lease})
+        elif len(parts) == 3 and parts[2] == 'heartbeat':
+            if scheduler.renew(parts[1], config.coordinator_lease_seconds):
+                self._send_json_response(200, {'lease_seconds': config.coordinator_lease_seconds})
+            else:
+                self._send_json_response(410, {'error': 'Lease expired'})
+        elif len(parts) == 3 and parts[2] == 'complete':
+            job = scheduler.finish_lease(parts[1], bool(body.get('success')))
+            if job is None:
+                self._send_json_response(410, {'error': 'Lease expired'})
+                return
+            # The worker recorded the conversion in its own index
+            if job.state == 'done' and body.get('output_path'):
+                self.server.converter.index.record(job.book_path, Path(body['output_path']),
+                                                   body.get('signature'), job.metadata, body.get('loudness'))
+                job.loudness = body.get('loudness')
+            self._send_json_response(200, {'status': job.state})
+        else:
+            self._send_json_response(404, {'error': 'Not found'})
+    
+    def _handle_bulk(self):
+        """
+        Queue a batch of books: a JSON array or NDJSON of directory paths,
+        ``{"path": ...}`` objects or Readarr payloads
+        
+        Items are deduplicated against the batch, the queue and the conversion
+        index, then queued together. The response has one result per item.
+        """
+        query = parse_qs(urlparse(self.path).query)
+        job_class = query.get('class', ['bulk'])[0]
+        if job_class not in self.server.config.scheduler_classes:
+            self._send_json_response(400, {'error': f"Unknown job class: {job_class}"})
+            return
+        
+        chunked = 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+        if not chunked and self.headers.get('Content-Length') is None:
+            self._send_json_response(411, {'error': 'Content-Length or chunked Transfer-Encoding required'})
+            return
+        body = self._read_body(chunked)
+        content_type = self.headers.get('Content-Type', '')
+        if 'ndjson' in content_type or 'jsonlines' in content_type:
+            items = self._read_ndjson(body)
+        else:
+            items = json.loads(b"".join(body).decode('utf-8'))
+            if not isinstance(items, list):
+                self._send_json_response(400, {'error': 'Expected a JSON array or NDJSON'})
+                return
+        
+        outputs = self.server.converter.index.outputs()
+        results = [None] * len(items)
+        books = []
+        positions = []
+        seen = set()
+        for position, item in enumerate(items):
+            try:
+                book_path, metadata = self._bulk_item(item)
+            except ValueError as e:
+                results[position] = {'status': 'invalid', 'error': str(e)}
+                continue
+            key = str(book_path)
+            if key in seen:
+                results[position] = {'status': 'duplicate', 'reason': 'batch'}
+            elif key in outputs and os.path.exists(outputs[key]):
+                results[position] = {'status': 'duplicate', 'reason': 'converted'}
+            else:
+                seen.add(key)
+                books.append((book_path, metadata))
+                positions.append(position)
+        
+        # Queue what fits below the bulk depth; bulk items have their own cap
+        # so a backfill neither overflows nor blocks the webhook queue
+        max_depth = self.server.config.webhook_max_bulk_queue_depth
+        accepted = len(books)
+        if max_depth:
+            accepted = min(accepted, max(0, max_depth - self.server.scheduler.queue_depth('bulk')))
+        jobs = self.server.scheduler.submit_many(books[:accepted], source='bulk', job_class=job_class)
+        for position, job in zip(positions, jobs):
+            results[position] = ({'status': 'queued', 'job_id': job.id} if job
+                                 else {'status': 'duplicate', 'reason': 'queued'})
+        for position in positions[accepted:]:
+            results[position] = {'status': 'rejected', 'reason': 'queue full'}
+        
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        self.server.webhook_logger.info(f"Bulk request with {len(items)} items: {counts}")
+        
+        headers = None
+        rejected = len(positions) - accepted
+        if rejected:
+            headers = {'Retry-After': str(self.server.scheduler.retry_after(rejected))}
+        status = 429 if rejected and not counts.get('queued') else 202
+        self._send_json_response(status, {'counts': counts, 'results': results}, headers)
+    
+    def _read_body(self, chunked: bool):
+        """
+        Yield the request body in pieces, decoding chunked transfer encoding
+
+        Raises:
+            ValueError: If a chunk size line is malformed
+        """
+        if not chunked:
+            remaining = int(self.headers['Content-Length'])
+            while remaining > 0:
+                data = self.rfile.read(min(remaining, 64 * 1024))
+                if not data:
+                    return
+                remaining -= len(data)
+                yield data
+            return
+        while True:
+            size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip trailers up to the blank line ending the body
+                while self.rfile.readline().strip():
+                    pass
+                return
+            yield self.rfile.read(size)
+            self.rfile.readline()  # CRLF after the chunk data
+    
+    def _read_ndjson(self, body) -> list:
+        """Parse an NDJSON body line by line, keeping errors as ValueError items"""
+        items = []
+        
+        def parse(line: bytes) -> None:
+            if not line.strip():
+                return
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"Invalid JSON: {e}"))
+        
+        pending = b""
+        for data in body:
+            *lines, pending = (pending + data).split(b"\n")
+            for line in lines:
+                parse(line)
+        parse(pending)
+        return items
+    
+    def _bulk_item(self, item) -> tuple:
+        """
+        Book directory and metadata of one bulk item
+        
+        Raises:
+            ValueError: If the item is malformed or names a missing directory
+        """
+        if isinstance(item, ValueError):
+            raise item
+        if isinstance(item, dict) and 'path' in item:
+            item = item['path']
+        if isinstance(item, str):
+            if not os.path.isabs(item) or not os.path.isdir(item):
+                raise ValueError(f"Not an existing absolute directory: {item}")
+            return Path(item), None
+        if isinstance(item, dict):
+            metadata = book_metadata(item)
+            return Path(metadata['book_directory']), metadata
+        raise ValueError("Expected a path or a Readarr payload")
+    
+    def _webhook_queue_depth(self) -> int:
+        """Queued jobs that count against webhook.max_queue_depth (all but bulk items)"""
+        scheduler = self.server.scheduler
+        return scheduler.queue_depth() - scheduler.queue_depth('bulk')
+    
+    def _reject_if_queue_full(self) -> bool:
+        """Send 429 when the queue is at its maximum depth"""
+        max_depth = self.server.config.webhook_max_queue_depth
+        if not max_depth:
+            return False
+        depth = self._webhook_queue_depth()
+        if depth < max_depth:
+            return False
+        retry_after = self.server.scheduler.retry_after(depth - max_depth + 1)
+        self.server.webhook_logger.warning(f"Queue full ({depth} jobs), asking client to retry in {retry_after}s")
+        self._send_json_response(429, {'error': 'Conversion queue is full', 'queued': depth},
+                                 {'Retry-After': str(retry_after)})
+        return True
+    
+    def _queue_moves(self, data: dict, author_name: Optional[str], author_path: Optional[str]):
+        """Queue one move job per renamed book directory"""
+        directories = {}
+        for book_file in data.get('renamedBookFiles') or data.get('bookFiles') or []:
+            if book_file.get('path'):
+                previous = book_file.get('previousPath')
+                directories[str(Path(book_file['path']).parent)] = str(Path(previous).parent) if previous else None
+        
+        if not directories:
+            self._send_json_response(400, {'error': 'Could not determine book directory from renamed files'})
+            return
+        
+        book_data = data.get('book') or {}
+        job_ids = []
+        for book_directory, previous_directory in directories.items():
+            metadata = {
+                'author_name': author_name,
+                'book_title': book_data.get('title'),
+                'author_path': author_path,
+                'book_directory': book_directory,
+                'previous_directory': previous_directory,
+                'book_id': book_data.get('id'),
+                'is_test': False
+            }
+            self.server.webhook_logger.info(f"Queueing move: {previous_directory} -> {book_directory}")
+            job = self.server.scheduler.submit(Path(book_directory), metadata, action='move')
+            job_ids.append(job.id)
+        
+        self._send_json_response(202, {'status': 'accepted', 'message': 'Move queued', 'job_ids': job_ids})
+    
+    def do_GET(self):
+        """Handle GET requests for the admin endpoints"""
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._send_health()
+            return
+        if url.path.startswith('/admin/'):
+            self._handle_admin(url.path, parse_qs(url.query))
+            return
+        self._send_json_response(404, {'error': 'Not found'})
+    
+    def _send_health(self):
+        """
+        Report health and queue saturation
+
+        A full queue is reported in the body with 200, since the server
+        still works through it; 503 means the event loop running the jobs
+        has stopped.
+        """
+        scheduler = self.server.scheduler
+        max_depth = self.server.config.webhook_max_queue_depth
+        status = scheduler.status()
+        depth = self._webhook_queue_depth()
+        saturated = bool(max_depth) and depth >= max_depth
+        loop = self.server._event_loop
+        healthy = loop is None or loop.is_running()
+        rate = scheduler.drain_rate()
+        self._send_json_response(200 if healthy else 503, {
+            'status': 'unhealthy' if not healthy else 'saturated' if saturated else 'ok',
+            'saturated': saturated,
+            'queued': status['queued'],
+            'queued_bulk': status['queued'] - depth,
+            'running': status['running'],
+            'max_queue_depth': max_depth,
+            'saturation': round(depth / max_depth, 3) if max_depth else None,
+            'drain_rate_per_hour': round(rate * 3600, 1) if rate else None,
+            'queue_eta_seconds': round(max(0, status['queue_eta'] - time.time())) if status['queue_eta'] else None,
+            'retry_after': scheduler.retry_after(depth - max_depth + 1) if saturated else 0,
+        })
+    
+    def _handle_admin(self, path: str, query: dict):
+        """Serve profiling endpoints (only when enabled in config)"""
+        config = self.server.config
+        if not config.admin_enabled:
+            self._send_json_response(404, {'error': 'Not found'})
+            return
+        if config.admin_token and self.headers.get('X-Admin-Token') != config.admin_token:
+            self._send_json_response(403, {'error': 'Invalid admin token'})
+            return
+        
+        try:
+            if path == '/admin/profile':
+                seconds = min(float(query.get('seconds', ['10'])[0]), config.admin_max_profile_seconds)
+                output_format = query.get('format', ['collapsed'])[0]
+                self.server.logger.info(f"Running {output_format} CPU profile for {seconds}s")
+                if output_format == 'pstats':
+                    report = diagnostics.profile_loop(self.server._event_loop, seconds)
+                elif output_format == 'collapsed':
+                    report = diagnostics.sample_stacks(seconds)
+                else:
+                    self._send_json_response(400, {'error': 'format must be collapsed or pstats'})
+                    return
+                self._send_text_response(200, report)
+            elif path == '/admin/memory':
+                limit = int(query.get('limit', ['25'])[0])
+                self._send_json_response(200, self.server.memory_snapshots.report(limit))
+            elif path == '/admin/queue':
+                self._send_json_response(200, self.server.scheduler.status())
+            elif path == '/admin/loop':
+                report = diagnostics.loop_report(self.server._event_loop, self.server.loop_monitor)
+                self._send_json_response(503 if 'error' in report else 200, report)
+            else:
+                self._send_json_response(404, {'error': 'Not found'})
+        except ValueError as e:
+            self._send_json_response(400, {'error': str(e)})
+    
     def _get_timestamp(self):
         """Get current timestamp"""
         import datetime
         return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def _send_json_response(self, status_code: int, data: dict):
+    def _send_json_response(self, status_code: int, data: dict, headers: Optional[dict] = None):
         """Send JSON response"""
         self.send_response(status_code)
         self.send_header('Content-type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(json.dumps(data).encode())
     
-    async def _convert_audiobook(self, metadata: dict):
-        """Convert audiobook asynchronously"""
-        try:
-            book_path = Path(metadata['book_directory'])
-            self.server.webhook_logger.info(f"Starting conversion for: {book_path}")
-            success = await self.server.converter.convert_audiobook(book_path, metadata)
-            
-            if success:
-                self.server.webhook_logger.info(f"✅ Conversion completed: {book_path}")
-            else:
-                self.server.webhook_logger.error(f"❌ Conversion failed: {book_path}")
-        except Exception as e:
-            self.server.webhook_logger.error(f"Conversion error: {e}")
+    def _send_text_response(self, status_code: int, text: str):
+        """Send plain text response"""
+        self.send_response(status_code)
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(text.encode('utf-8'))
     
     def log_message(self, format, *args):
         """Override to use our logger"""
         self.server.logger.info(format % args)
 
 
-class ReadarrM4BServer(HTTPServer):
+class ReadarrM4BServer(ThreadingHTTPServer):
     """HTTP server with configuration and converter"""
     
+    daemon_threads = True
+    
     def __init__(self, server_address, handler_class, config: Config, event_loop=None):
         super().__init__(server_address, handler_class)
         self.config = config
         self.converter = M4BConverter(config)
+        self.scheduler = ConversionScheduler(config, self.converter)
+        self.rate_limiter = TokenBucketLimiter(config.webhook_rate_limit_per_minute,
+                                               config.webhook_rate_limit_burst)
         self.logger = logging.getLogger(__name__)
         self._event_loop = event_loop
         
-        # Setup dedicated webhook logger
+        # Diagnostics (only used by the opt-in admin endpoints)
+        self.loop_monitor = diagnostics.LoopLagMonitor() if config.admin_enabled else None
+        self.memory_snapshots = diagnostics.MemorySnapshots()
+        
+        # Dedicated webhook loggers (written to webhook_log_file by setup_logging)
         self.webhook_logger = logging.getLogger('webhook')
-        webhook_handler = logging.FileHandler(config.webhook_log_file)
-        webhook_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.webhook_logger.addHandler(webhook_handler)
         self.webhook_logger.setLevel(logging.INFO)
+        self.requests_logger = logging.getLogger('webhook.requests')
+    
+    def apply_config(self, config: Config) -> None:
+        """
+        Swap in a reloaded config
+        
+        Requests and jobs started from now on use it; running jobs finish
+        with the converter they started with.
+        """
+        converter = self.converter.with_config(config)
+        self.scheduler.apply_config(config, converter)
+        self.rate_limiter.configure(config.webhook_rate_limit_per_minute, config.webhook_rate_limit_burst)
+        logging.getLogger().setLevel(getattr(logging, config.log_level.upper(), logging.INFO))
+        self.converter = converter
+        self.config = config
 
 
 
 
-async def run_server(config: Config):
-    """Run HTTP server mode"""
+async def run_server(config: Config, watch: bool = False, scan: bool = False):
+    """
+    Run HTTP server mode
+    
+    Args:
+        config: Configuration
+        watch: Also watch the library for new books
+        scan: Queue every unconverted book in the library as bulk work
+    """
     logger = logging.getLogger(__name__)
     
+    if config.calibration_enabled and config.calibration is None:
+        logger.info("No calibration for this host yet, measuring encoder parallelism before starting...")
+        try:
+            await calibrate(config)
+            config = Config(config.config_file)
+        except (RuntimeError, OSError) as e:
+            logger.warning(f"Calibration failed, using configured defaults: {e}")
+    
     # Get current event loop
     loop = asyncio.get_event_loop()
     
     server = ReadarrM4BServer((config.webhook_host, config.webhook_port), WebhookHandler, config, loop)
     logger.info(f"🚀 ReadarrM4B HTTP server started on {config.webhook_host}:{config.webhook_port}")
+    background_tasks = [asyncio.create_task(server.scheduler.run())]
+    if server.loop_monitor:
+        background_tasks.append(asyncio.create_task(server.loop_monitor.run()))
+        logger.info("Admin endpoints enabled under /admin/")
+    watcher = None
+    if watch:
+        watcher = BookWatcher(config, server.scheduler)
+        background_tasks.append(asyncio.create_task(watcher.run()))
+    
+    def apply_config(new_config: Config) -> None:
+        server.apply_config(new_config)
+        if watcher:
+            watcher.config = new_config
+    
+    background_tasks.append(asyncio.create_task(ConfigReloader(config, apply_config).run()))
+    if scan:
+        books = await asyncio.to_thread(find_pending_books, config.audiobooks_paths)
+        for book in books:
+            server.scheduler.submit(book, None, source='scan')
+        logger.info(f"Library scan queued {len(books)} books as bulk jobs")
     
     try:
         # Run server in a thread to not block the asyncio event loop
@@ -175,6 +600,95 @@ async def run_server(config: Config):
         server.server_close()
 
 
+def _bulk_settings(config: Config) -> tuple:
+    """A scheduler without a converter and the conversion settings of a bulk job"""
+    scheduler = ConversionScheduler(config, converter=None)
+    tokens = max(1, min(int(config.jobs), scheduler.class_cpu_budget('bulk')))
+    return scheduler, conversion_settings(config, tokens if config.resume_partial else config.jobs)
+
+
+def plan_books(config: Config, target: Optional[str]) -> dict:
+    """
+    Estimate the cost of converting the pending books below a path
+
+    Args:
+        config: Configuration
+        target: A book directory, a directory of books, or None/--scan for
+            every configured library path
+
+    Returns:
+        Plan totals (see stats.plan) plus input_seconds and input_bytes
+    """
+    if target in (None, '--scan'):
+        books = find_pending_books(config.audiobooks_paths)
+    elif directory_state(Path(target)):
+        books = [Path(target)]
+    else:
+        books = find_pending_books([target])
+
+    scheduler, settings = _bulk_settings(config)
+    # Reading MP3 headers is I/O bound, mostly on network shares
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        audio = list(pool.map(book_audio, books))
+    estimates = [scheduler.model.estimate(settings, size, seconds) for seconds, size in audio]
+    result = plan(estimates, scheduler.class_slots('bulk'))
+    result.update(input_seconds=sum(seconds for seconds, _ in audio), input_bytes=sum(size for _, size in audio),
+                  slots=scheduler.class_slots('bulk'), settings=settings)
+    return result
+
+
+def report_library(config: Config, target: Optional[str]) -> dict:
+    """
+    Walk the library and summarize converted and pending books for --report
+
+    Per-directory totals are cached by directory mtime in
+    ``cache.report_file``, so repeated reports only rescan what changed.
+
+    Args:
+        config: Configuration
+        target: A directory to report on, or None for every library path
+
+    Returns:
+        Report dict (see report.library_report)
+    """
+    roots = [target] if target else config.audiobooks_paths
+    cache = DirectoryTotalsCache(config.report_cache_file)
+    cache.load()
+    entries = walk_library(roots, cache)
+    try:
+        cache.save(entries)
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Could not save report cache: {e}")
+    scheduler, settings = _bulk_settings(config)
+    return library_report(entries, lambda size, seconds: scheduler.model.estimate(settings, size, seconds))
+
+
+def print_plan(config: Config, result: dict) -> None:
+    """Print a plan for --plan"""
+    print(f"Books to convert:  {result['books']} ({format_duration(int(result['input_seconds']))} of audio, "
+          f"{format_size(result['input_bytes'])})")
+    print(f"Estimated time:    {format_duration(int(result['wall_seconds']))} "
+          f"with {result['slots']} concurrent conversions")
+    print(f"Output size:       {format_size(result['output_bytes'])}")
+    print(f"Peak scratch:      {format_size(result['peak_scratch_bytes'])} in {config.temp_dir}")
+    if not result['measured']:
+        print("Note: no conversions recorded yet for these settings on this host, estimates use defaults")
+
+
+def print_calibration(outcome: dict) -> None:
+    """Print calibration trials and the chosen combination for --calibrate"""
+    host = outcome['fingerprint']
+    print(f"Host: {host['cpu_model']} ({host['cores']} cores)")
+    print(f"{'codec':<12} {'books':>5} {'jobs':>5} {'wall':>8} {'speed':>10}")
+    for trial in outcome['trials']:
+        print(f"{trial['audio_codec']:<12} {trial['concurrent_books']:>5} {trial['jobs']:>5} "
+              f"{trial['wall_seconds']:>7.1f}s {trial['realtime_factor']:>9.1f}x")
+    result = outcome['result']
+    print(f"Using {result['concurrent_books']} concurrent books x {result['jobs']} jobs "
+          f"(cpu_budget {result['cpu_budget']})" + (f" with {result['audio_codec']}" if 'audio_codec' in result else "")
+          + " where the config does not set them")
+
+
 async def run_cli(config: Config, args: list):
     """Run CLI mode for testing and manual conversion"""
     logger = logging.getLogger(__name__)
@@ -195,26 +709,64 @@ async def run_cli(config: Config, args: list):
         book_path = Path(target_path)
         return await converter.convert_audiobook(book_path)
     
+    elif '--plan' in args:
+        # Cost estimate without converting
+        path_index = args.index('--plan') + 1
+        target = args[path_index] if path_index < len(args) else None
+        result = await asyncio.to_thread(plan_books, config, target)
+        print_plan(config, result)
+        return True
+    
+    elif '--report' in args:
+        # Library totals, as a table or JSON with --json
+        path_index = args.index('--report') + 1
+        target = args[path_index] if path_index < len(args) and not args[path_index].startswith('--') else None
+        report = await asyncio.to_thread(report_library, config, target)
+        print(json.dumps(report, indent=2) if '--json' in args else format_report(report))
+        return True
+    
+    elif '--calibrate' in args:
+        # Measure the best jobs/concurrency for this host
+        try:
+            outcome = await calibrate(config)
+        except (RuntimeError, OSError) as e:
+            logger.error(f"Calibration failed: {e}")
+            return False
+        print_calibration(outcome)
+        return True
+    
     elif '--test' in args:
         # Test configuration
         logger.info("Testing configuration...")
         return config.validate()
     
     else:
-        logger.error("Invalid CLI usage. Use --server for webhook mode, --test for config validation, or --convert <path> for manual conversion.")
+        logger.error("Invalid CLI usage. Use --server for webhook mode, --watch to also watch the library, --scan to backfill the library, --worker <url> to convert for a coordinator, --plan <path|--scan> to estimate a backfill, --report [path] [--json] for library totals, --calibrate to measure encoder parallelism, --test for config validation, or --convert <path> for manual conversion.")
         return False
 
 
 async def main():
     """Main entry point - webhook server focused"""
     config = Config()
-    setup_logging(config.log_level, config.log_file)
+    setup_logging(config.log_level, config.log_file,
+                  webhook_log_file=config.webhook_log_file,
+                  json_file=config.log_json_file,
+                  max_bytes=config.log_max_bytes,
+                  backup_count=config.log_backup_count)
     logger = logging.getLogger(__name__)
     
     # Determine mode
-    if '--server' in sys.argv or len(sys.argv) == 1:
-        # HTTP server mode (default - webhook focused)
-        await run_server(config)
+    if '--worker' in sys.argv:
+        # Worker mode: convert jobs leased from a coordinator
+        index = sys.argv.index('--worker') + 1
+        if index >= len(sys.argv):
+            logger.error("--worker requires the coordinator URL")
+            sys.exit(1)
+        await run_worker(config, sys.argv[index])
+    elif not any(flag in sys.argv for flag in ('--plan', '--report')) and (any(flag in sys.argv for flag in ('--server', '--watch', '--scan'))
+                                       or len(sys.argv) == 1):
+        # HTTP server mode (default - webhook focused), --watch and --scan add library work
+        await run_server(config, watch='--watch' in sys.argv, scan='--scan' in sys.argv)
     else:
         # CLI mode (testing and manual conversion only)
         success = await run_cli(config, sys.argv)
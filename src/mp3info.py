@@ -0,0 +1,240 @@
+"""Lightweight MP3 header parsing for ReadarrM4B"""
+
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+HEADER_SCAN_BYTES = 64 * 1024
+
+# Enough of a picture frame for its mime type and description
+APIC_HEADER_BYTES = 1024
+
+# Bitrates in kbit/s indexed by [version group][layer][bitrate index]
+# version group 0 = MPEG-1, 1 = MPEG-2/2.5; layer 1..3
+_BITRATES = {
+    (0, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (0, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (0, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (1, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (1, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (1, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def id3v2_size(header: bytes) -> int:
+    """
+    Total size of an ID3v2 tag from its 10-byte header
+
+    Returns:
+        Tag size including header and footer, 0 if there is no tag
+    """
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+def _parse_frame_header(data: bytes, pos: int):
+    """Decode an MPEG audio frame header, returning None if it is not valid"""
+    if pos + 4 > len(data) or data[pos] != 0xff or (data[pos + 1] & 0xe0) != 0xe0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x03
+    layer_bits = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    group = 0 if version_bits == 3 else 1
+    bitrate = _BITRATES[(group, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+    if layer == 1:
+        samples = 384
+    elif layer == 2 or group == 0:
+        samples = 1152
+    else:
+        samples = 576
+    padding = (data[pos + 2] >> 1) & 0x01
+    if layer == 1:
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        frame_length = samples // 8 * bitrate // sample_rate + padding
+    mono = (data[pos + 3] >> 6) == 3
+    return {
+        'mpeg1': group == 0,
+        'frame_length': frame_length,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples_per_frame': samples,
+        'mono': mono,
+    }
+
+
+def mp3_duration(path: Path) -> float:
+    """
+    Estimate the duration of an MP3 from its headers without decoding
+
+    Uses the frame count of a Xing/Info or VBRI header when present and
+    falls back to the first frame's bitrate for CBR files.
+
+    Args:
+        path: MP3 file
+
+    Returns:
+        Duration in seconds, 0.0 if no valid frame was found
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        tag_size = id3v2_size(f.read(10))
+        f.seek(tag_size)
+        data = f.read(HEADER_SCAN_BYTES)
+        f.seek(max(0, size - 128))
+        has_id3v1 = size - tag_size >= 128 and f.read(3) == b'TAG'
+
+    for pos in range(len(data) - 4):
+        frame = _parse_frame_header(data, pos)
+        if not frame:
+            continue
+        # Guard against false syncs inside leftover tag data
+        next_pos = pos + frame['frame_length']
+        if next_pos + 4 <= len(data) and not _parse_frame_header(data, next_pos):
+            continue
+
+        # Xing/Info header follows the side information
+        if frame['mpeg1']:
+            side_info = 17 if frame['mono'] else 32
+        else:
+            side_info = 9 if frame['mono'] else 17
+        xing = pos + 4 + side_info
+        frames = None
+        if data[xing:xing + 4] in (b'Xing', b'Info'):
+            flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+            if flags & 0x01:
+                frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+        elif data[pos + 36:pos + 40] == b'VBRI':
+            frames = struct.unpack('>I', data[pos + 50:pos + 54])[0]
+
+        if frames:
+            return frames * frame['samples_per_frame'] / frame['sample_rate']
+
+        audio_bytes = size - tag_size - pos - (128 if has_id3v1 else 0)
+        return audio_bytes * 8 / frame['bitrate']
+
+    return 0.0
+
+
+def _frame_size(raw: bytes, version: int) -> int:
+    """Size of an ID3v2 frame body (syncsafe in v2.4)"""
+    if version == 4:
+        return (raw[0] << 21) | (raw[1] << 14) | (raw[2] << 7) | raw[3]
+    return int.from_bytes(raw, 'big')
+
+
+def _apic_header(body: bytes, version: int) -> Optional[Tuple[str, int, int]]:
+    """
+    Parse the fields before the image data of an APIC (or v2.2 PIC) frame
+
+    Returns:
+        (mime type, picture type, offset of the image data in the frame), or
+        None if the fields do not fit in ``body``
+    """
+    if len(body) < 4:
+        return None
+    encoding = body[0]
+    if version == 2:
+        image_format = body[1:4].decode('latin-1').lower()
+        mime = 'image/jpeg' if image_format in ('jpg', 'jpe') else f'image/{image_format}'
+        pos = 4
+    else:
+        end = body.find(b'\x00', 1)
+        if end < 0:
+            return None
+        mime = body[1:end].decode('latin-1').lower() or 'image/jpeg'
+        pos = end + 1
+    if pos >= len(body):
+        return None
+    picture_type = body[pos]
+    pos += 1
+    # Description, terminated by one zero byte (Latin-1/UTF-8) or two (UTF-16)
+    if encoding in (1, 2):
+        while pos + 1 < len(body) and body[pos:pos + 2] != b'\x00\x00':
+            pos += 2
+        pos += 2
+    else:
+        end = body.find(b'\x00', pos)
+        if end < 0:
+            return None
+        pos = end + 1
+    if pos > len(body):
+        return None
+    if mime in ('jpg', 'image/jpg'):
+        mime = 'image/jpeg'
+    return mime, picture_type, pos
+
+
+def id3_pictures(path: Path) -> List[Dict[str, Any]]:
+    """
+    Find the embedded pictures of an MP3 by walking its ID3v2 frames
+
+    Only frame headers and the first bytes of picture frames are read; other
+    frames are skipped with seeks, so neither the audio nor the images are
+    loaded. Tags using unsynchronisation, compressed or encrypted frames are
+    skipped.
+
+    Args:
+        path: MP3 file
+
+    Returns:
+        Dicts with offset and size of the image data, mime and picture_type
+        (3 is the front cover)
+    """
+    pictures = []
+    with open(path, 'rb') as f:
+        header = f.read(10)
+        tag_size = id3v2_size(header)
+        if not tag_size:
+            return pictures
+        version, flags = header[3], header[5]
+        if version not in (2, 3, 4) or flags & 0x80:
+            return pictures
+        end = 10 + (tag_size - 10 - (10 if flags & 0x10 else 0))
+        pos = 10
+        if flags & 0x40 and version in (3, 4):
+            raw = f.read(4)
+            extended = _frame_size(raw, 4) if version == 4 else int.from_bytes(raw, 'big') + 4
+            pos += extended
+        id_length, header_length = (3, 6) if version == 2 else (4, 10)
+        picture_id = b'PIC' if version == 2 else b'APIC'
+
+        while pos + header_length <= end:
+            f.seek(pos)
+            frame_header = f.read(header_length)
+            frame_id = frame_header[:id_length]
+            if len(frame_header) < header_length or not frame_id.strip(b'\x00'):
+                break
+            size = _frame_size(frame_header[id_length:id_length + (3 if version == 2 else 4)], version)
+            body_start = pos + header_length
+            pos = body_start + size
+            if size <= 0 or pos > end:
+                break
+            if frame_id != picture_id:
+                continue
+            # Compression, encryption and unsynchronisation change the stored bytes
+            if version == 3 and frame_header[9] & 0xc0:
+                continue
+            if version == 4 and frame_header[9] & 0x0f:
+                continue
+            parsed = _apic_header(f.read(min(size, APIC_HEADER_BYTES)), version)
+            if not parsed:
+                continue
+            mime, picture_type, data_offset = parsed
+            pictures.append({
+                'offset': body_start + data_offset,
+                'size': size - data_offset,
+                'mime': mime,
+                'picture_type': picture_type,
+            })
+    return pictures
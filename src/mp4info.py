@@ -0,0 +1,200 @@
+"""MP4 box parsing and output verification for ReadarrM4B"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class MP4FormatError(ValueError):
+    """Raised when a file does not have a valid MP4 box structure"""
+
+
+def iter_boxes(data, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Iterate over the boxes between start and end
+
+    Args:
+        data: Buffer supporting slicing (bytes or mmap)
+        start: Offset of the first box
+        end: Offset where the enclosing box ends
+
+    Yields:
+        Tuples of (box type, payload offset, box end offset)
+
+    Raises:
+        MP4FormatError: If a box header is invalid or a box exceeds its parent
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise MP4FormatError(f"Truncated header of box {box_type!r} at {pos}")
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise MP4FormatError(f"Invalid size {size} of box {box_type!r} at {pos}")
+        if pos + size > end:
+            raise MP4FormatError(f"Box {box_type.decode('latin-1')} at {pos} is truncated "
+                                 f"({size} bytes declared, {end - pos} available)")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def find_box(data, start: int, end: int, path: List[bytes]) -> Optional[Tuple[int, int]]:
+    """Find the first box matching a path of box types, returning (payload, end)"""
+    for box_type, payload, box_end in iter_boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            return payload, box_end
+        return find_box(data, payload, box_end, path[1:])
+    return None
+
+
+def _parse_mvhd(data, payload: int) -> float:
+    """Movie duration in seconds from an mvhd box"""
+    version = data[payload]
+    if version == 1:
+        timescale, duration = struct.unpack('>IQ', data[payload + 20:payload + 32])
+    else:
+        timescale, duration = struct.unpack('>II', data[payload + 12:payload + 20])
+    return duration / timescale if timescale else 0.0
+
+
+def _parse_chpl(data, payload: int, end: int) -> List[Tuple[float, str]]:
+    """Nero chapter list as (start seconds, title) tuples"""
+    version = data[payload]
+    pos = payload + 4 + (4 if version else 0)
+    count = data[pos]
+    pos += 1
+    chapters = []
+    for _ in range(count):
+        if pos + 9 > end:
+            raise MP4FormatError("Truncated chapter list")
+        start = struct.unpack('>Q', data[pos:pos + 8])[0] / 10_000_000
+        length = data[pos + 8]
+        title = bytes(data[pos + 9:pos + 9 + length]).decode('utf-8', errors='replace')
+        chapters.append((start, title))
+        pos += 9 + length
+    return chapters
+
+
+def _chapter_track_samples(data, moov: Tuple[int, int]) -> int:
+    """Number of samples in the QuickTime chapter track referenced by tref/chap"""
+    track_samples = {}
+    chapter_ids = set()
+    for box_type, payload, box_end in iter_boxes(data, *moov):
+        if box_type != b'trak':
+            continue
+        tkhd = find_box(data, payload, box_end, [b'tkhd'])
+        if not tkhd:
+            continue
+        offset = 20 if data[tkhd[0]] == 1 else 12
+        track_id = struct.unpack('>I', data[tkhd[0] + offset:tkhd[0] + offset + 4])[0]
+
+        chap = find_box(data, payload, box_end, [b'tref', b'chap'])
+        if chap:
+            for pos in range(chap[0], chap[1] - 3, 4):
+                chapter_ids.add(struct.unpack('>I', data[pos:pos + 4])[0])
+
+        stsz = find_box(data, payload, box_end, [b'mdia', b'minf', b'stbl', b'stsz'])
+        if stsz:
+            track_samples[track_id] = struct.unpack('>I', data[stsz[0] + 8:stsz[0] + 12])[0]
+
+    return max((track_samples.get(track_id, 0) for track_id in chapter_ids), default=0)
+
+
+def inspect_m4b(path: Path) -> Dict[str, Any]:
+    """
+    Read the structure of an MP4/M4B file without decoding any audio
+
+    The file is memory-mapped and only box headers and the small metadata
+    boxes are touched, so even multi-GB files are inspected in milliseconds.
+
+    Args:
+        path: MP4/M4B file
+
+    Returns:
+        Dict with top-level box types, mdat payload size, duration in
+        seconds, Nero chapters and the chapter count
+
+    Raises:
+        MP4FormatError: If the box structure is invalid or truncated
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size < 8:
+            raise MP4FormatError(f"File too small to be an MP4 ({size} bytes)")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            boxes = {}
+            last_end = 0
+            for box_type, payload, box_end in iter_boxes(data, 0, size):
+                boxes.setdefault(box_type, (payload, box_end))
+                last_end = box_end
+            if last_end != size:
+                raise MP4FormatError(f"{size - last_end} trailing bytes after last box")
+
+            mdat = boxes.get(b'mdat')
+            info = {
+                'boxes': [box_type.decode('latin-1') for box_type in boxes],
+                'mdat_size': mdat[1] - mdat[0] if mdat else 0,
+                'duration': 0.0,
+                'chapters': [],
+                'chapter_count': 0,
+            }
+            moov = boxes.get(b'moov')
+            if not moov:
+                return info
+
+            mvhd = find_box(data, moov[0], moov[1], [b'mvhd'])
+            if mvhd:
+                info['duration'] = _parse_mvhd(data, mvhd[0])
+
+            chpl = find_box(data, moov[0], moov[1], [b'udta', b'chpl'])
+            if chpl:
+                info['chapters'] = _parse_chpl(data, *chpl)
+
+            info['chapter_count'] = max(len(info['chapters']), _chapter_track_samples(data, moov))
+            return info
+
+
+def verify_m4b(path: Path, expected_duration: Optional[float] = None, tolerance: float = 0.0,
+               expected_chapters: Optional[int] = None) -> List[str]:
+    """
+    Check that a converted file is complete before originals are deleted
+
+    Args:
+        path: Converted M4B file
+        expected_duration: Sum of the input durations in seconds
+        tolerance: Allowed duration difference in seconds
+        expected_chapters: Required chapter count
+
+    Returns:
+        List of problems, empty if the file passed
+    """
+    try:
+        info = inspect_m4b(path)
+    except (OSError, MP4FormatError) as e:
+        return [str(e)]
+
+    problems = []
+    for box in ('moov', 'mdat'):
+        if box not in info['boxes']:
+            problems.append(f"Missing {box} box")
+    if 'mdat' in info['boxes'] and info['mdat_size'] == 0:
+        problems.append("Empty mdat box")
+
+    if expected_duration is not None and abs(info['duration'] - expected_duration) > tolerance:
+        problems.append(f"Duration {info['duration']:.1f}s differs from input duration "
+                        f"{expected_duration:.1f}s by more than {tolerance:.1f}s")
+
+    if expected_chapters is not None and info['chapter_count'] != expected_chapters:
+        problems.append(f"Found {info['chapter_count']} chapters, expected {expected_chapters}")
+
+    return problems
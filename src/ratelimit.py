@@ -0,0 +1,65 @@
+"""Request rate limiting for the ReadarrM4B webhook server"""
+
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets
+
+    Each client may send ``burst`` requests at once and then
+    ``rate_per_minute`` requests per minute.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, int(burst))
+        self.max_clients = max_clients
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate_per_minute: float, burst: int) -> None:
+        """Change the rate and burst; existing buckets refill at the new rate"""
+        with self._lock:
+            self.rate = rate_per_minute / 60.0
+            self.burst = max(1, int(burst))
+            self._next_prune = 0.0
+
+    def acquire(self, client: str, cost: int = 1) -> float:
+        """
+        Take tokens from a client's bucket
+
+        Args:
+            client: Client identifier (remote address)
+            cost: Tokens the request needs
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until it would be
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        cost = min(cost, self.burst)
+        with self._lock:
+            # Once per refill period, and whenever a new client would exceed max_clients
+            if now >= self._next_prune or (client not in self._buckets
+                                           and len(self._buckets) >= self.max_clients):
+                self._prune(now)
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[client] = (tokens - cost, now)
+                return 0.0
+            self._buckets[client] = (tokens, now)
+            return (cost - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        """Forget clients whose buckets have refilled (lock held)"""
+        full_after = self.burst / self.rate
+        self._next_prune = now + full_after
+        for client, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[client]
@@ -0,0 +1,211 @@
+"""Library size and conversion report for ReadarrM4B"""
+
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mp3info import mp3_duration
+from utils import format_duration, format_size
+
+# Bump when directory entries change shape so old caches are ignored
+REPORT_CACHE_VERSION = 1
+
+# Directories scanned at once; stats are I/O bound, mostly on network shares
+WALK_THREADS = 8
+
+# Pending books listed as the largest and the slowest
+TOP_BOOKS = 5
+
+
+class DirectoryTotalsCache:
+    """
+    Per-directory file totals keyed by path, valid while the mtime matches
+
+    A directory's mtime changes when entries are added, removed or renamed,
+    which covers downloads, conversions and cleanups. A file rewritten in
+    place is not noticed until its directory changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> None:
+        """Read the cache file, starting empty if it is missing or stale"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == REPORT_CACHE_VERSION:
+            self.entries = data.get('directories', {})
+
+    def save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the cache with the directories of the last walk, atomically"""
+        self.entries = {path: {key: value for key, value in entry.items() if key != 'cached'}
+                        for path, entry in entries.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': REPORT_CACHE_VERSION, 'directories': self.entries}, f)
+        os.replace(temp_path, self.path)
+
+
+def scan_directory(path: str, cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    File totals of one directory (not recursive)
+
+    Args:
+        path: Directory
+        cached: Previous entry, returned as is if the mtime still matches
+
+    Returns:
+        Dict with mtime_ns, subdirs, mp3_files, mp3_bytes, m4b_bytes,
+        failed_bytes (outputs set aside after failed verification) and
+        audio_seconds (only measured for pending books), or None if the
+        directory is gone
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if cached and cached.get('mtime_ns') == mtime:
+        return cached
+
+    entry = {'mtime_ns': mtime, 'subdirs': [], 'mp3_files': 0, 'mp3_bytes': 0, 'm4b_bytes': 0,
+             'failed_bytes': 0, 'audio_seconds': None}
+    mp3_paths = []
+    try:
+        with os.scandir(path) as entries:
+            for item in entries:
+                if item.is_dir(follow_symlinks=False):
+                    entry['subdirs'].append(item.name)
+                    continue
+                if not item.is_file():
+                    continue
+                name = item.name.lower()
+                size = item.stat().st_size
+                if name.endswith('.mp3'):
+                    entry['mp3_files'] += 1
+                    entry['mp3_bytes'] += size
+                    mp3_paths.append(item.path)
+                elif name.endswith('.m4b'):
+                    entry['m4b_bytes'] += size
+                elif name.endswith('.m4b.failed'):
+                    entry['failed_bytes'] += size
+    except OSError:
+        return None
+
+    if mp3_paths and not entry['m4b_bytes']:
+        seconds = 0.0
+        for mp3_path in mp3_paths:
+            try:
+                seconds += mp3_duration(Path(mp3_path))
+            except (OSError, ValueError):
+                continue
+        entry['audio_seconds'] = seconds
+    entry['subdirs'].sort()
+    return entry
+
+
+def walk_library(roots: List[str], cache: DirectoryTotalsCache,
+                 threads: int = WALK_THREADS) -> Dict[str, Dict[str, Any]]:
+    """
+    Scan every directory below the roots, one tree level at a time in parallel
+
+    Unchanged directories cost one stat; their cached subdirectories are
+    still visited, so changes deeper in the tree are found.
+
+    Returns:
+        Directory entries (see scan_directory) by path, with a ``cached``
+        flag on those served from the cache
+    """
+    results = {}
+    frontier = [str(Path(root)) for root in roots]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while frontier:
+            scanned = pool.map(lambda path: (path, scan_directory(path, cache.entries.get(path))), frontier)
+            frontier = []
+            for path, entry in scanned:
+                if entry is None or path in results:
+                    continue
+                results[path] = dict(entry, cached=entry is cache.entries.get(path))
+                frontier.extend(os.path.join(path, name) for name in entry['subdirs'])
+    return results
+
+
+def library_report(entries: Dict[str, Dict[str, Any]], estimate, top: int = TOP_BOOKS) -> Dict[str, Any]:
+    """
+    Summarize a library walk
+
+    Args:
+        entries: Result of walk_library
+        estimate: Callable (input_bytes, input_seconds) -> estimate dict with
+            wall_seconds and output_bytes, for pending books
+        top: Number of largest and slowest pending books to list
+
+    Returns:
+        Report dict (JSON serializable)
+    """
+    converted = []
+    pending = []
+    mp3_bytes = m4b_bytes = reclaimable = 0
+    for path, entry in entries.items():
+        mp3_bytes += entry['mp3_bytes']
+        m4b_bytes += entry['m4b_bytes']
+        reclaimable += entry['failed_bytes']
+        if entry['m4b_bytes']:
+            converted.append(path)
+            # Originals kept beside a finished M4B
+            reclaimable += entry['mp3_bytes']
+        elif entry['mp3_files']:
+            result = estimate(entry['mp3_bytes'], entry['audio_seconds'])
+            pending.append({
+                'path': path,
+                'mp3_files': entry['mp3_files'],
+                'mp3_bytes': entry['mp3_bytes'],
+                'audio_seconds': round(entry['audio_seconds'] or 0.0, 1),
+                'estimated_seconds': round(result['wall_seconds'], 1),
+                'estimated_output_bytes': int(result['output_bytes']),
+            })
+
+    return {
+        'directories': len(entries),
+        'cached_directories': sum(1 for entry in entries.values() if entry['cached']),
+        'converted_books': len(converted),
+        'pending_books': len(pending),
+        'mp3_bytes': mp3_bytes,
+        'm4b_bytes': m4b_bytes,
+        'reclaimable_bytes': reclaimable,
+        'pending_mp3_bytes': sum(book['mp3_bytes'] for book in pending),
+        'pending_output_bytes': sum(book['estimated_output_bytes'] for book in pending),
+        'pending_seconds': round(sum(book['estimated_seconds'] for book in pending), 1),
+        'largest_pending': sorted(pending, key=lambda book: -book['mp3_bytes'])[:top],
+        'slowest_pending': sorted(pending, key=lambda book: -book['estimated_seconds'])[:top],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report as a text table"""
+    lines = [
+        f"Books converted:   {report['converted_books']}",
+        f"Books pending:     {report['pending_books']} ({format_size(report['pending_mp3_bytes'])} of MP3, "
+        f"about {format_duration(int(report['pending_seconds']))} of conversion)",
+        f"MP3 total:         {format_size(report['mp3_bytes'])}",
+        f"M4B total:         {format_size(report['m4b_bytes'])}",
+        f"Reclaimable:       {format_size(report['reclaimable_bytes'])} "
+        f"(originals beside an M4B and failed outputs)",
+        f"Directories:       {report['directories']} ({report['cached_directories']} unchanged)",
+    ]
+    for title, books, column in (("Largest pending books", report['largest_pending'], 'mp3_bytes'),
+                                 ("Slowest pending books", report['slowest_pending'], 'estimated_seconds')):
+        if not books:
+            continue
+        lines.extend(["", title, f"{'size':>10} {'audio':>12} {'estimate':>12}  path"])
+        for book in books:
+            lines.append(f"{format_size(book['mp3_bytes']):>10} {format_duration(int(book['audio_seconds'])):>12} "
+                         f"{format_duration(int(book['estimated_seconds'])):>12}  {book['path']}")
+    return "\n".join(lines)
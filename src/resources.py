@@ -0,0 +1,255 @@
+"""OS resource controls for conversion helper processes"""
+
+import asyncio
+import ctypes
+import logging
+import os
+import platform
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# I/O scheduling classes of ioprio_set(2)
+IO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+IO_CLASS_NAMES = {value: name for name, value in IO_CLASSES.items()}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+
+# (ioprio_set, ioprio_get) syscall numbers; glibc has no wrappers
+IOPRIO_SYSCALLS = {
+    'x86_64': (251, 252),
+    'i386': (289, 290),
+    'i686': (289, 290),
+    'aarch64': (30, 31),
+    'riscv64': (30, 31),
+    'armv7l': (314, 315),
+    'ppc64le': (273, 274),
+    's390x': (282, 283),
+}
+
+# cgroup v2 cpu.max period in microseconds
+CPU_PERIOD = 100_000
+
+_libc = None
+
+
+def _syscall() -> Optional[Callable]:
+    """libc's syscall(2), or None if it cannot be loaded"""
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(None, use_errno=True)
+        except OSError:
+            _libc = False
+    return _libc.syscall if _libc else None
+
+
+def ioprio_value(io_class: str, level: int) -> int:
+    """Encode an I/O class and level (0 highest to 7 lowest) for ioprio_set"""
+    return (IO_CLASSES[io_class] << IOPRIO_CLASS_SHIFT) | (0 if io_class == 'idle' else level)
+
+
+def get_ioprio(pid: int) -> Optional[tuple]:
+    """
+    I/O class and level of a process
+
+    Returns:
+        (class name, level), or None if unsupported or the process is gone
+    """
+    numbers = IOPRIO_SYSCALLS.get(platform.machine())
+    syscall = _syscall()
+    if not numbers or not syscall:
+        return None
+    value = syscall(numbers[1], IOPRIO_WHO_PROCESS, pid)
+    if value < 0:
+        return None
+    io_class = IO_CLASS_NAMES.get(value >> IOPRIO_CLASS_SHIFT, 'best-effort')
+    return io_class, value & ((1 << IOPRIO_CLASS_SHIFT) - 1)
+
+
+def profile_is_empty(profile: Dict[str, Any]) -> bool:
+    """Whether a profile leaves processes as they are"""
+    return all(profile.get(key) is None for key in ('nice', 'io_class', 'cpu_max', 'memory_max_mb'))
+
+
+# Joins the cgroup named by $1 and execs the rest of its arguments
+CGROUP_LAUNCHER = 'echo $$ 2>/dev/null > "$1/cgroup.procs"; shift; exec "$@"'
+
+
+def wrap_command(cmd: list, profile: Dict[str, Any], cgroup: Optional[Path]) -> list:
+    """
+    Prefix a command so it starts with a profile applied
+
+    nice, ionice and a small shell launcher set the profile and then exec
+    the command, so everything it starts inherits it from the first
+    instruction on. Nothing runs in the forked child before exec, which
+    would be unsafe in a threaded program. Missing tools and failures leave
+    the command as it is and show up when the result is verified.
+    """
+    prefix = []
+    if profile.get('nice') is not None and shutil.which("nice"):
+        # nice -n is relative to our own niceness
+        increment = profile['nice'] - os.getpriority(os.PRIO_PROCESS, 0)
+        if increment:
+            prefix += ["nice", "-n", str(increment)]
+    if profile.get('io_class') and shutil.which("ionice"):
+        prefix += ["ionice", "-t", "-c", str(IO_CLASSES[profile['io_class']])]
+        if profile['io_class'] != 'idle':
+            prefix += ["-n", str(profile['io_priority'])]
+    # Join the cgroup last, so the limits cover the command and all it starts
+    if cgroup is not None:
+        prefix += ["sh", "-c", CGROUP_LAUNCHER, "cgroup-launcher", str(cgroup)]
+    return prefix + list(cmd)
+
+
+async def wait_for_exec(pid: int, cmd: list, timeout: float = 1.0) -> None:
+    """Wait until a wrapped command has passed its wrappers and exec'd itself"""
+    wanted = [str(arg) for arg in cmd]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        try:
+            argv = Path(f"/proc/{pid}/cmdline").read_bytes().split(b"\0")[:-1]
+        except OSError:
+            return
+        if [os.fsdecode(arg) for arg in argv] == wanted:
+            return
+        await asyncio.sleep(0.005)
+
+
+def verify(pid: int, profile: Dict[str, Any], cgroup: Optional[Path], cgroup_root: Path) -> Dict[str, Any]:
+    """
+    Read back what a process actually got
+
+    Returns:
+        Dict with the observed nice, io_class, io_priority and cgroup,
+        ``verified`` (None if the process exited before it could be checked)
+        and a list of ``errors``
+    """
+    applied: Dict[str, Any] = {'errors': []}
+    try:
+        applied['nice'] = os.getpriority(os.PRIO_PROCESS, pid)
+    except OSError:
+        applied['verified'] = None
+        return applied
+    errors: List[str] = applied['errors']
+    if profile.get('nice') is not None and applied['nice'] != profile['nice']:
+        errors.append(f"nice is {applied['nice']}, wanted {profile['nice']}")
+
+    ioprio = get_ioprio(pid)
+    if ioprio:
+        applied['io_class'], applied['io_priority'] = ioprio
+    if profile.get('io_class'):
+        wanted = (profile['io_class'], 0 if profile['io_class'] == 'idle' else profile['io_priority'])
+        if ioprio is None:
+            errors.append("I/O priority is not supported on this platform")
+        elif ioprio != wanted:
+            errors.append(f"I/O priority is {ioprio[0]}/{ioprio[1]}, wanted {wanted[0]}/{wanted[1]}")
+
+    if profile.get('cpu_max') or profile.get('memory_max_mb'):
+        applied['cgroup'] = None
+        try:
+            for line in Path(f"/proc/{pid}/cgroup").read_text().splitlines():
+                if line.startswith("0::"):
+                    applied['cgroup'] = line[3:]
+        except OSError:
+            pass
+        if cgroup is None:
+            errors.append("cgroup limits could not be set up")
+        elif not applied['cgroup'] or not cgroup.as_posix().endswith(applied['cgroup']):
+            wanted = cgroup.relative_to(cgroup_root.parent)
+            errors.append(f"process is in cgroup {applied['cgroup']}, wanted {wanted}")
+        else:
+            applied['cpu_max'] = profile.get('cpu_max')
+            applied['memory_max_mb'] = profile.get('memory_max_mb')
+    applied['verified'] = not errors
+    return applied
+
+
+def release_cgroup(job) -> None:
+    """Remove the cgroup of a finished job, if it got one"""
+    if job.cgroup:
+        try:
+            job.cgroup.rmdir()
+        except OSError as e:
+            logging.getLogger(__name__).debug(f"Could not remove {job.cgroup}: {e}")
+    job.cgroup = None
+
+
+class ResourceControl:
+    """
+    Start helper processes with the resource profile of the running job
+
+    Profiles come from ``scheduler.classes``: a nice level, an I/O class
+    and priority, and optionally cgroup v2 CPU and memory limits. The
+    limits are shared by all processes of a job through one cgroup per job
+    below ``scheduler.cgroup_root``, which must be a writable, delegated
+    cgroup v2 directory.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.cgroup_root = Path(config.scheduler_cgroup_root)
+        self.logger = logging.getLogger(__name__)
+
+    def profile(self, job) -> Dict[str, Any]:
+        """Resource profile of a job's class (empty without a job)"""
+        if job is None:
+            return {}
+        return self.config.scheduler_classes.get(job.job_class, {}).get('resources', {})
+
+    def _write(self, path: Path, value: str) -> None:
+        with open(path, 'w') as f:
+            f.write(value)
+
+    def _job_cgroup(self, job, profile: Dict[str, Any]) -> Optional[Path]:
+        """Create (once) the cgroup holding a job's processes, None if limits are off or unavailable"""
+        if not (profile.get('cpu_max') or profile.get('memory_max_mb')):
+            return None
+        # False marks a job whose cgroup could not be created
+        if job.cgroup is not None:
+            return job.cgroup or None
+        cgroup = self.cgroup_root / f"job-{job.id}"
+        try:
+            self.cgroup_root.mkdir(exist_ok=True)
+            controllers = [name for name, key in (('cpu', 'cpu_max'), ('memory', 'memory_max_mb')) if profile.get(key)]
+            self._write(self.cgroup_root / "cgroup.subtree_control", " ".join(f"+{name}" for name in controllers))
+            cgroup.mkdir(exist_ok=True)
+            if profile.get('cpu_max'):
+                self._write(cgroup / "cpu.max", f"{int(profile['cpu_max'] * CPU_PERIOD)} {CPU_PERIOD}")
+            if profile.get('memory_max_mb'):
+                self._write(cgroup / "memory.max", str(int(profile['memory_max_mb'] * 1024 * 1024)))
+        except OSError as e:
+            self.logger.warning(f"Cannot set up cgroup limits in {self.cgroup_root}: {e}")
+            job.cgroup = False
+            return None
+        job.cgroup = cgroup
+        return cgroup
+
+    async def spawn(self, cmd: list, job=None, **kwargs) -> asyncio.subprocess.Process:
+        """
+        Start a helper process in its own session with the job's profile
+
+        Args:
+            cmd: Command and arguments
+            job: Job the process belongs to (None runs it unrestricted)
+            **kwargs: Passed to asyncio.create_subprocess_exec
+
+        Returns:
+            The started process
+        """
+        profile = self.profile(job)
+        cgroup = self._job_cgroup(job, profile) if job is not None else None
+        process = await asyncio.create_subprocess_exec(*wrap_command(cmd, profile, cgroup),
+                                                       start_new_session=True, **kwargs)
+        if job is not None and not profile_is_empty(profile):
+            await wait_for_exec(process.pid, cmd)
+            applied = verify(process.pid, profile, cgroup, self.cgroup_root)
+            if applied['verified'] is not None:
+                if applied['errors'] and (job.resources or {}).get('verified') is not False:
+                    self.logger.warning(f"Resource profile not fully applied to job {job.id}: "
+                                        f"{'; '.join(applied['errors'])}")
+                # The first mismatch stays visible in the job status
+                if (job.resources or {}).get('verified') is not False:
+                    job.resources = applied
+        return process
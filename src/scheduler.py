@@ -0,0 +1,663 @@
+"""Conversion job scheduling for ReadarrM4B"""
+
+import asyncio
+import datetime
+import heapq
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import Config, parse_time_window
+from resources import release_cgroup
+from stats import StatsStore, conversion_settings, mp3_bytes
+
+# Converter method and log label for each job action
+ACTIONS = {
+    'convert': ('convert_audiobook', 'Conversion'),
+    'retag': ('retag_audiobook', 'Retag'),
+    'move': ('move_audiobook', 'Move'),
+}
+
+# Job sources that queue bulk work; everything else is interactive
+BULK_SOURCES = ('scan', 'watch', 'bulk')
+
+# How often time windows are re-checked while nothing else happens
+WINDOW_CHECK_SECONDS = 30
+
+# Weight of the newest job in the average job duration
+DURATION_SMOOTHING = 0.2
+
+# Book directories sized per dispatcher pass for the throughput model
+MEASURE_BATCH = 500
+
+current_job: ContextVar[Optional['Job']] = ContextVar('current_job', default=None)
+
+
+def device_of(path: Path) -> Optional[int]:
+    """st_dev of a path, or of its nearest existing parent"""
+    path = Path(path)
+    for candidate in [path, *path.parents]:
+        try:
+            return os.stat(candidate).st_dev
+        except OSError:
+            continue
+    return None
+
+
+def in_windows(windows: List[str], now: Optional[datetime.datetime] = None) -> bool:
+    """Check whether the local time falls in any window (no windows means always)"""
+    if not windows:
+        return True
+    now = now or datetime.datetime.now()
+    minute = now.hour * 60 + now.minute
+    for window in windows:
+        start, end = parse_time_window(window)
+        if start <= end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            return True
+    return False
+
+
+@contextmanager
+def track_process(process):
+    """
+    Register a helper process with the running job so it can be paused
+
+    Processes must be started with ``start_new_session=True`` so their whole
+    process group (m4b-tool's ffmpeg children included) is signalled.
+    """
+    job = current_job.get()
+    if job is None:
+        yield
+        return
+    job.processes.add(process)
+    if job.paused:
+        job.signal(signal.SIGSTOP)
+    try:
+        yield
+    finally:
+        job.processes.discard(process)
+
+
+class Job:
+    """A queued or running conversion"""
+
+    def __init__(self, book_path: Path, metadata: Optional[Dict[str, Any]] = None, source: str = 'webhook',
+                 action: str = 'convert', job_class: Optional[str] = None):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown job action: {action}")
+        self.id = uuid.uuid4().hex[:12]
+        self.book_path = Path(book_path)
+        self.metadata = metadata
+        self.source = source
+        self.action = action
+        self.job_class = job_class or ('bulk' if source in BULK_SOURCES else 'interactive')
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.devices: tuple = ()
+        self.cpu_tokens = 0
+        self.paused = False
+        self.processes = set()
+        self.worker: Optional[str] = None
+        self.lease_id: Optional[str] = None
+        self.lease_expires = 0.0
+        self.input_bytes: Optional[int] = None
+        self.estimate: Optional[float] = None
+        self.loudness: Optional[Dict[str, float]] = None
+        # Resource profile as verified on the job's processes, and its cgroup
+        self.resources: Optional[Dict[str, Any]] = None
+        self.cgroup = None
+
+    def signal(self, signum: int) -> None:
+        """Send a signal to the process groups of the job's helper processes"""
+        for process in list(self.processes):
+            if process.returncode is None:
+                try:
+                    os.killpg(process.pid, signum)
+                except OSError:
+                    pass
+
+    def status(self) -> Dict[str, Any]:
+        """Job state for status reporting"""
+        return {
+            'id': self.id,
+            'book_path': str(self.book_path),
+            'source': self.source,
+            'action': self.action,
+            'class': self.job_class,
+            'state': 'paused' if self.paused else self.state,
+            'worker': self.worker,
+            'estimated_seconds': self.estimate,
+            'loudness': self.loudness,
+            'resources': self.resources,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class ConversionScheduler:
+    """
+    Run conversions with per-device concurrency and a shared CPU budget
+
+    Every job is tied to the devices (``st_dev``) of its book directory and of
+    the scratch directory. Each device has its own concurrency limit, so
+    books on different disks convert in parallel while books on the same
+    spinning disk do not seek against each other. All jobs share one CPU
+    budget counted in encoder threads (``conversion.jobs`` per job).
+
+    Jobs are either interactive (webhooks) or bulk (scans, watch mode). Each
+    class has its own job and CPU limits, interactive jobs are started first,
+    and bulk jobs leave ``reserved_interactive_cpu`` and one slot per device
+    free. Bulk jobs only start inside their time windows; outside them running
+    bulk jobs are paused with SIGSTOP or held until they finish.
+
+    The throughput model of past conversions estimates each job's duration.
+    Bulk jobs run shortest first and status reports an ETA per job.
+
+    ``submit`` is thread-safe and may be called from the HTTP server threads.
+    """
+
+    def __init__(self, config: Config, converter):
+        self.config = config
+        self.converter = converter
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pending: List[Job] = []
+        self._running: Dict[str, Job] = {}
+        # Jobs leased to remote workers, by lease id
+        self._leased: Dict[str, Job] = {}
+        self._device_active = Counter()
+        self._cpu_in_use = 0
+        self._class_active = Counter()
+        self._class_cpu = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = set()
+        self._scratch_device = device_of(Path(config.temp_dir))
+        self._device_limits = self._resolve_device_limits(config)
+        self._avg_duration: Optional[float] = None
+        self.stats = StatsStore(config.database_file)
+        self.model = self.stats.model()
+
+    def apply_config(self, config: Config, converter=None) -> None:
+        """
+        Switch to a reloaded config
+
+        Limits, windows and estimates use the new settings from the next
+        dispatch on. Queued jobs get their devices and CPU tokens again, so
+        they fit a lowered budget; running jobs keep their converter, CPU
+        tokens and devices.
+
+        Args:
+            config: The new configuration
+            converter: Converter for jobs started from now on (kept if None)
+        """
+        device_limits = self._resolve_device_limits(config)
+        scratch_device = device_of(Path(config.temp_dir))
+        with self._lock:
+            parents = {job.book_path.parent for job in self._pending}
+        # Look up devices outside the lock; books of one batch mostly share parents
+        devices = {parent: device_of(parent) for parent in parents}
+        with self._lock:
+            self.config = config
+            if converter is not None:
+                self.converter = converter
+            self._device_limits = device_limits
+            self._scratch_device = scratch_device
+            for job in self._pending:
+                parent = job.book_path.parent
+                if parent not in devices:
+                    devices[parent] = device_of(parent)
+                self._assign_resources(job, devices[parent])
+                if job.input_bytes is not None:
+                    self._estimate(job, job.input_bytes)
+        self._notify()
+
+    def _resolve_device_limits(self, config: Config) -> Dict[int, int]:
+        """Map configured per-path limits to device ids"""
+        limits = {}
+        for path, limit in config.scheduler_device_limits.items():
+            device = device_of(Path(path))
+            if device is None:
+                self.logger.warning(f"Ignoring device limit for missing path: {path}")
+                continue
+            limits[device] = int(limit)
+        return limits
+
+    def submit(self, book_path: Path, metadata: Optional[Dict[str, Any]] = None, source: str = 'webhook',
+               action: str = 'convert', job_class: Optional[str] = None) -> Job:
+        """
+        Queue a conversion
+
+        Args:
+            book_path: Audiobook directory
+            metadata: Optional metadata from Readarr
+            source: Where the job came from (webhook, cli, watch, scan, bulk)
+            action: Job type, one of ACTIONS
+            job_class: interactive or bulk (derived from source by default)
+
+        Returns:
+            The queued job, or the one already queued or running for the book
+        """
+        job = self._new_job(book_path, metadata, source, action, job_class)
+        with self._lock:
+            # Jobs of one book share its checkpoint directory
+            active = self._active_jobs().get((job.book_path, job.action))
+            if active is None:
+                self._pending.append(job)
+        if active is not None:
+            self.logger.info(f"Job {active.id} for {job.book_path} is already {active.state}, not queueing again")
+            return active
+        self.logger.info(f"Queued {job.job_class} job {job.id} for {job.book_path} (devices {list(job.devices)})")
+        self._notify()
+        return job
+
+    def _active_jobs(self) -> Dict[tuple, Job]:
+        """Queued, running and leased jobs by (book_path, action); call with the lock held"""
+        return {(job.book_path, job.action): job
+                for job in [*self._pending, *self._running.values(), *self._leased.values()]}
+
+    def submit_many(self, books: List[tuple], source: str = 'bulk', action: str = 'convert',
+                    job_class: Optional[str] = None) -> List[Optional[Job]]:
+        """
+        Queue many conversions at once, skipping books already queued or running
+
+        Args:
+            books: (book_path, metadata) pairs
+            source: Where the jobs came from
+            action: Job type, one of ACTIONS
+            job_class: interactive or bulk (derived from source by default)
+
+        Returns:
+            The queued job per book, or None for books that were already queued
+        """
+        devices = {}
+        jobs = []
+        for book_path, metadata in books:
+            job = Job(book_path, metadata, source, action, job_class)
+            # Books of one batch mostly share a few parent directories
+            parent = job.book_path.parent
+            if parent not in devices:
+                devices[parent] = device_of(parent)
+            self._assign_resources(job, devices[parent])
+            jobs.append(job)
+
+        with self._lock:
+            active = set(self._active_jobs())
+            queued = []
+            for job in jobs:
+                if (job.book_path, job.action) in active:
+                    queued.append(None)
+                    continue
+                active.add((job.book_path, job.action))
+                self._pending.append(job)
+                queued.append(job)
+        count = sum(job is not None for job in queued)
+        self.logger.info(f"Queued {count} {source} jobs ({len(jobs) - count} already queued)")
+        self._notify()
+        return queued
+
+    def _new_job(self, book_path: Path, metadata: Optional[Dict[str, Any]], source: str, action: str,
+                 job_class: Optional[str]) -> Job:
+        """Create a job with its devices and CPU tokens"""
+        job = Job(book_path, metadata, source, action, job_class)
+        self._assign_resources(job, device_of(job.book_path))
+        return job
+
+    def _assign_resources(self, job: Job, book_device: Optional[int]) -> None:
+        """Set the devices and CPU tokens a job needs"""
+        job.devices = tuple(sorted({d for d in (book_device, self._scratch_device) if d is not None}))
+        if job.action == 'convert':
+            job.cpu_tokens = max(1, min(int(self.config.jobs), self.class_cpu_budget(job.job_class)))
+        else:
+            # Retagging and moving copy and rewrite files, they do not encode
+            job.cpu_tokens = 1
+        # Webhook payloads carry file sizes, other jobs are sized by the dispatcher
+        book_files = (job.metadata or {}).get('book_files')
+        if book_files and all(book_file.get('size') for book_file in book_files):
+            self._estimate(job, sum(book_file['size'] for book_file in book_files
+                                    if book_file['path'].lower().endswith('.mp3')))
+
+    def _estimate(self, job: Job, input_bytes: int) -> None:
+        """Set a job's input size and estimated duration"""
+        job.input_bytes = input_bytes
+        if job.action != 'convert':
+            job.estimate = 0.0
+            return
+        jobs = job.cpu_tokens if self.config.resume_partial else self.config.jobs
+        settings = conversion_settings(self.config, jobs)
+        job.estimate = self.model.estimate(settings, input_bytes)['wall_seconds']
+
+    def _measure_pending(self) -> bool:
+        """
+        Size pending jobs that have no estimate yet (runs off the event loop)
+
+        Returns:
+            True if more jobs are left to size
+        """
+        with self._lock:
+            unsized = [job for job in self._pending if job.input_bytes is None]
+        for job in unsized[:MEASURE_BATCH]:
+            self._estimate(job, mp3_bytes(job.book_path))
+        return len(unsized) > MEASURE_BATCH
+
+    def _ordered(self, jobs: List[Job]) -> List[Job]:
+        """Interactive jobs in arrival order, then bulk jobs shortest first"""
+        def key(job: Job) -> tuple:
+            if job.job_class == 'interactive':
+                return (0, 0.0)
+            return (1, job.estimate if job.estimate is not None else float('inf'))
+        return sorted(jobs, key=key)
+
+    def _notify(self) -> None:
+        """Wake the dispatcher from any thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def device_limit(self, device: int) -> int:
+        """Concurrent jobs allowed on a device"""
+        return self._device_limits.get(device, self.config.scheduler_per_device_jobs)
+
+    def class_cpu_budget(self, job_class: str) -> int:
+        """Encoder threads a job class may use, after the interactive reserve for bulk"""
+        budget = min(self.config.scheduler_classes[job_class]['cpu_budget'], self.config.scheduler_cpu_budget)
+        if job_class == 'bulk':
+            budget = min(budget, self.config.scheduler_cpu_budget - self.config.scheduler_reserved_interactive_cpu)
+        return max(1, budget)
+
+    def class_slots(self, job_class: str) -> int:
+        """Conversions of a job class that can run at the same time on this host"""
+        budget = self.class_cpu_budget(job_class)
+        slots = budget // max(1, min(int(self.config.jobs), budget))
+        max_jobs = self.config.scheduler_classes[job_class]['max_jobs']
+        return max(1, min(slots, max_jobs) if max_jobs is not None else slots)
+
+    def in_window(self, job_class: str) -> bool:
+        """Check whether a job class may run now"""
+        return in_windows(self.config.scheduler_classes[job_class]['windows'])
+
+    def _can_start(self, job: Job) -> bool:
+        """Check device slots, class limits and CPU budget for a job (lock held)"""
+        if self._cpu_in_use + job.cpu_tokens > self.config.scheduler_cpu_budget:
+            return False
+        settings = self.config.scheduler_classes[job.job_class]
+        if settings['max_jobs'] is not None and self._class_active[job.job_class] >= settings['max_jobs']:
+            return False
+        if self._class_cpu[job.job_class] + job.cpu_tokens > self.class_cpu_budget(job.job_class):
+            return False
+        # Bulk jobs keep a slot free on devices that allow more than one job
+        reserve = 1 if job.job_class == 'bulk' else 0
+        return all(self._device_active[device] < max(1, self.device_limit(device) - reserve)
+                   for device in job.devices)
+
+    def _dispatch(self) -> None:
+        """Enforce time windows and start every pending job that fits, interactive first"""
+        bulk_allowed = self.in_window('bulk')
+        with self._lock:
+            self._expire_leases()
+            self._apply_window('bulk', bulk_allowed)
+            if not self.config.coordinator_run_local:
+                return
+            for job in self._ordered(self._pending):
+                if self._cpu_in_use >= self.config.scheduler_cpu_budget:
+                    break
+                if job.job_class == 'bulk' and not bulk_allowed:
+                    continue
+                if not self._can_start(job):
+                    continue
+                self._pending.remove(job)
+                self._running[job.id] = job
+                self._cpu_in_use += job.cpu_tokens
+                self._class_active[job.job_class] += 1
+                self._class_cpu[job.job_class] += job.cpu_tokens
+                for device in job.devices:
+                    self._device_active[device] += 1
+                job.state = 'running'
+                job.started_at = time.time()
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def lease(self, worker: str, lease_seconds: float) -> Optional[Job]:
+        """
+        Hand the next pending job to a remote worker
+
+        Interactive jobs go first and bulk jobs only inside their window. The
+        worker's own machine does the work, so local device and CPU limits
+        do not apply.
+
+        Args:
+            worker: Worker identifier
+            lease_seconds: Time until the lease expires without a heartbeat
+
+        Returns:
+            The leased job, or None if nothing can be leased
+        """
+        bulk_allowed = self.in_window('bulk')
+        with self._lock:
+            candidates = [job for job in self._ordered(self._pending)
+                          if bulk_allowed or job.job_class == 'interactive']
+            if not candidates:
+                return None
+            job = candidates[0]
+            self._pending.remove(job)
+            job.state = 'leased'
+            job.worker = worker
+            job.lease_id = uuid.uuid4().hex
+            job.lease_expires = time.monotonic() + lease_seconds
+            job.started_at = time.time()
+            self._leased[job.lease_id] = job
+        self.logger.info(f"Leased job {job.id} to {worker}: {job.book_path}")
+        return job
+
+    def renew(self, lease_id: str, lease_seconds: float) -> bool:
+        """Extend a lease; False if it expired or is unknown"""
+        with self._lock:
+            job = self._leased.get(lease_id)
+            if job is None:
+                return False
+            job.lease_expires = time.monotonic() + lease_seconds
+            return True
+
+    def finish_lease(self, lease_id: str, success: bool) -> Optional[Job]:
+        """
+        Record the result a worker reported
+
+        Returns:
+            The finished job, or None if the lease had expired
+        """
+        with self._lock:
+            job = self._leased.pop(lease_id, None)
+            if job is None:
+                return None
+            job.state = 'done' if success else 'failed'
+            job.finished_at = time.time()
+            self._record_duration(job)
+        label = ACTIONS[job.action][1]
+        if success:
+            self.logger.info(f"✅ {label} completed by {job.worker}: {job.book_path}")
+        else:
+            self.logger.error(f"❌ {label} failed on {job.worker}: {job.book_path}")
+        self._notify()
+        return job
+
+    def _expire_leases(self) -> None:
+        """Requeue jobs whose worker stopped sending heartbeats (lock held)"""
+        now = time.monotonic()
+        for lease_id, job in list(self._leased.items()):
+            if job.lease_expires > now:
+                continue
+            del self._leased[lease_id]
+            self.logger.warning(f"Lease of job {job.id} on {job.worker} expired, requeueing {job.book_path}")
+            job.state = 'queued'
+            job.worker = None
+            job.lease_id = None
+            job.started_at = None
+            self._pending.insert(0, job)
+
+    def _record_duration(self, job: Job) -> None:
+        """Fold a finished conversion into the average job duration (lock held)"""
+        if job.action == 'convert' and job.started_at:
+            duration = job.finished_at - job.started_at
+            self._avg_duration = duration if self._avg_duration is None else (
+                DURATION_SMOOTHING * duration + (1 - DURATION_SMOOTHING) * self._avg_duration)
+
+    def _apply_window(self, job_class: str, allowed: bool) -> None:
+        """Pause or resume running jobs of a class (lock held)"""
+        pause = not allowed and self.config.scheduler_classes[job_class]['outside_window'] == 'pause'
+        for job in self._running.values():
+            if job.job_class != job_class or job.paused == pause:
+                continue
+            job.paused = pause
+            job.signal(signal.SIGSTOP if pause else signal.SIGCONT)
+            self.logger.info(f"{'Paused' if pause else 'Resumed'} {job_class} job {job.id}: {job.book_path}")
+
+    async def _run_job(self, job: Job) -> None:
+        """Run one conversion and release its resources"""
+        method, label = ACTIONS[job.action]
+        # The job keeps this converter (and its config) even if the config is reloaded meanwhile
+        run = getattr(self.converter, method)
+        current_job.set(job)
+        success = False
+        try:
+            self.logger.info(f"Starting {job.action} job {job.id}: {job.book_path}")
+            success = await run(job.book_path, job.metadata)
+        except Exception as e:
+            self.logger.error(f"{label} error in job {job.id}: {e}")
+        finally:
+            release_cgroup(job)
+            job.state = 'done' if success else 'failed'
+            job.paused = False
+            job.finished_at = time.time()
+            with self._lock:
+                self._record_duration(job)
+                self._running.pop(job.id, None)
+                self._cpu_in_use -= job.cpu_tokens
+                self._class_active[job.job_class] -= 1
+                self._class_cpu[job.job_class] -= job.cpu_tokens
+                for device in job.devices:
+                    self._device_active[device] -= 1
+            if success:
+                self.logger.info(f"✅ {label} completed: {job.book_path}")
+                if job.action == 'convert':
+                    await self._refresh_model()
+            else:
+                self.logger.error(f"❌ {label} failed: {job.book_path}")
+            self._wakeup.set()
+
+    async def _refresh_model(self) -> None:
+        """Reload the throughput model after a conversion added to it"""
+        try:
+            self.model = await asyncio.to_thread(self.stats.model)
+        except Exception as e:
+            self.logger.warning(f"Could not reload throughput model: {e}")
+
+    async def run(self) -> None:
+        """Dispatch jobs until cancelled"""
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._loop = asyncio.get_running_loop()
+        while True:
+            # Leases are checked for expiry every second while any are out
+            timeout = 1.0 if self._leased else WINDOW_CHECK_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if await asyncio.to_thread(self._measure_pending):
+                self._wakeup.set()
+            self._dispatch()
+
+    def queue_depth(self, source: Optional[str] = None) -> int:
+        """Number of jobs waiting to start, only those from ``source`` if given"""
+        with self._lock:
+            if source is None:
+                return len(self._pending)
+            return sum(job.source == source for job in self._pending)
+
+    def drain_rate(self) -> Optional[float]:
+        """Jobs finished per second at the current concurrency, None before the first job"""
+        with self._lock:
+            if not self._avg_duration:
+                return None
+            return max(1, len(self._running)) / self._avg_duration
+
+    def retry_after(self, excess: int = 1, default: int = 60) -> int:
+        """
+        Seconds until the queue should have room for ``excess`` more jobs
+
+        Args:
+            excess: Jobs that have to finish first
+            default: Answer when no job has finished yet
+        """
+        rate = self.drain_rate()
+        if rate is None:
+            return default
+        return int(min(3600, max(1, excess / rate)))
+
+    async def drain(self, poll_interval: float = 0.2) -> None:
+        """Wait until no job is queued or running"""
+        while True:
+            with self._lock:
+                if not self._pending and not self._running and not self._leased:
+                    return
+            await asyncio.sleep(poll_interval)
+
+    def _etas(self) -> Dict[str, float]:
+        """
+        Expected finish time of each local job (lock held)
+
+        Pending jobs are played through ``cpu_budget / jobs`` slots in
+        dispatch order; jobs without an estimate yet count as instant.
+        """
+        now = time.time()
+        slots = max(1, self.config.scheduler_cpu_budget // max(1, int(self.config.jobs)))
+        etas = {}
+        finish = []
+        for job in self._running.values():
+            etas[job.id] = max(now, (job.started_at or now) + (job.estimate or 0.0))
+            finish.append(etas[job.id])
+        finish = sorted(finish)[-slots:]
+        finish += [now] * (slots - len(finish))
+        heapq.heapify(finish)
+        for job in self._ordered(self._pending):
+            etas[job.id] = heapq.heappop(finish) + (job.estimate or 0.0)
+            heapq.heappush(finish, etas[job.id])
+        return etas
+
+    def status(self) -> Dict[str, Any]:
+        """Queue and device utilisation snapshot"""
+        with self._lock:
+            etas = self._etas()
+            jobs = []
+            for job in [*self._running.values(), *self._leased.values(), *self._ordered(self._pending)]:
+                jobs.append({**job.status(), 'eta': etas.get(job.id)})
+            return {
+                'queued': len(self._pending),
+                'running': len(self._running),
+                'leased': len(self._leased),
+                'cpu_in_use': self._cpu_in_use,
+                'cpu_budget': self.config.scheduler_cpu_budget,
+                'avg_job_seconds': self._avg_duration,
+                'queue_eta': max(etas.values(), default=None),
+                'classes': {name: {'active': self._class_active[name], 'cpu_in_use': self._class_cpu[name],
+                                   'in_window': self.in_window(name)}
+                            for name in self.config.scheduler_classes},
+                'devices': {str(device): {'active': active, 'limit': self.device_limit(device)}
+                            for device, active in self._device_active.items()},
+                'jobs': jobs,
+            }
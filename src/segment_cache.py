@@ -0,0 +1,110 @@
+"""Content-addressed cache of encoded segments for ReadarrM4B"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fingerprint import audio_digest
+from utils import link_or_copy
+
+
+class SegmentCache:
+    """
+    Size-limited LRU store of encoded segments
+
+    Entries are keyed by a hash of all of the source's audio data (which
+    ignores tags, so a metadata-only change still hits) plus the encoder
+    settings and
+    stored as ``<dir>/<key[:2]>/<key>.m4b``. The modification time of an entry
+    is bumped on every hit and the least recently used entries are evicted
+    once the cache grows beyond its limit.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[Path, int]] = None
+        self._total = 0
+
+    def key(self, source: Path, encoder: Dict[str, Any]) -> str:
+        """Cache key for a source file encoded with the given settings"""
+        settings = json.dumps(encoder, sort_keys=True)
+        # A sampled fingerprint could splice the wrong audio into a book
+        return hashlib.sha1(f"{audio_digest(source)}:{settings}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.m4b"
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """
+        Place a cached segment at dest
+
+        Returns:
+            True on a cache hit, False otherwise
+        """
+        entry = self._entry_path(key)
+        try:
+            link_or_copy(entry, dest)
+            os.utime(entry)
+            return True
+        except OSError:
+            return False
+
+    def store(self, key: str, segment: Path) -> None:
+        """Add an encoded segment to the cache and evict old entries if needed"""
+        entry = self._entry_path(key)
+        tmp_path = entry.with_suffix('.tmp')
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            link_or_copy(segment, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            self.logger.warning(f"Could not add segment to cache: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            entries = self._load_entries()
+            self._total += entry.stat().st_size - entries.get(entry, 0)
+            entries[entry] = entry.stat().st_size
+            self._evict(entries)
+
+    def _load_entries(self) -> Dict[Path, int]:
+        """Scan the cache directory once per process"""
+        if self._entries is None:
+            self._entries = {}
+            self._total = 0
+            for entry in self.cache_dir.glob("*/*.m4b"):
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                self._entries[entry] = size
+                self._total += size
+        return self._entries
+
+    def _evict(self, entries: Dict[Path, int]) -> None:
+        """Remove least recently used entries until the cache fits its limit"""
+        if self._total <= self.max_bytes:
+            return
+
+        def last_used(entry: Path) -> float:
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0.0
+
+        evicted = 0
+        for entry in sorted(entries, key=last_used):
+            if self._total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            self._total -= entries.pop(entry)
+            evicted += 1
+        self.logger.info(f"Segment cache evicted {evicted} entries")
@@ -0,0 +1,261 @@
+"""Conversion statistics and throughput model for ReadarrM4B"""
+
+import heapq
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mp3info import mp3_duration
+
+# Conversions per setting the model averages over
+MODEL_WINDOW = 50
+
+# Assumptions used until a setting has history: audio seconds encoded per
+# wall second, MP3 bytes per audio second (128 kbit/s) and output bytes per
+# input byte
+DEFAULT_REALTIME_FACTOR = 40.0
+DEFAULT_BYTES_PER_AUDIO_SECOND = 16000
+DEFAULT_OUTPUT_RATIO = 1.0
+
+
+def conversion_settings(config, jobs: int) -> Dict[str, Any]:
+    """
+    Settings that determine how fast a conversion runs
+
+    Args:
+        config: Configuration
+        jobs: Encoder threads the conversion gets
+
+    Returns:
+        Settings dict, recorded with every conversion and used as model key
+    """
+    settings = {
+        'audio_codec': config.audio_codec or 'aac',
+        'pipeline': 'segments' if config.resume_partial else 'm4b-tool',
+        'jobs': int(jobs),
+    }
+    # The analysis pass adds a decode of every file
+    if config.loudness_enabled and config.resume_partial:
+        settings['loudness'] = True
+    return settings
+
+
+def settings_key(settings: Dict[str, Any]) -> str:
+    """Stable string form of conversion settings"""
+    return json.dumps(settings, sort_keys=True)
+
+
+def mp3_bytes(book_path: Path) -> int:
+    """Total size of the MP3 files in a directory"""
+    total = 0
+    try:
+        with os.scandir(book_path) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.mp3') and entry.is_file():
+                    total += entry.stat().st_size
+    except OSError:
+        pass
+    return total
+
+
+def book_audio(book_path: Path) -> tuple:
+    """
+    Audio duration and size of the MP3 files in a directory
+
+    Returns:
+        Tuple of (seconds, bytes)
+    """
+    seconds = 0.0
+    size = 0
+    for mp3_file in Path(book_path).glob("*.mp3"):
+        try:
+            seconds += mp3_duration(mp3_file)
+            size += mp3_file.stat().st_size
+        except (OSError, ValueError):
+            continue
+    return seconds, size
+
+
+class ThroughputModel:
+    """
+    Encode speed of one host per conversion setting
+
+    Each setting has a realtime factor (audio seconds converted per wall
+    second), an input rate in bytes per wall second for estimates without
+    durations, and the output size as a fraction of the input. Settings
+    without history fall back to the average over all settings, then to
+    conservative defaults.
+    """
+
+    def __init__(self, rates: Dict[str, Dict[str, float]]):
+        self.rates = rates
+
+    def rate(self, settings: Dict[str, Any]) -> Dict[str, float]:
+        """Rates for a setting, with the fallbacks applied"""
+        rate = self.rates.get(settings_key(settings))
+        if rate:
+            return rate
+        if self.rates:
+            pooled = {name: sum(r[name] for r in self.rates.values()) / len(self.rates)
+                      for name in ('realtime_factor', 'bytes_per_second', 'output_ratio')}
+            return {**pooled, 'conversions': 0}
+        return {
+            'realtime_factor': DEFAULT_REALTIME_FACTOR,
+            'bytes_per_second': DEFAULT_REALTIME_FACTOR * DEFAULT_BYTES_PER_AUDIO_SECOND,
+            'output_ratio': DEFAULT_OUTPUT_RATIO,
+            'conversions': 0,
+        }
+
+    def estimate(self, settings: Dict[str, Any], input_bytes: int,
+                 input_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Estimate one conversion
+
+        Args:
+            settings: Conversion settings (see conversion_settings)
+            input_bytes: Total MP3 size
+            input_seconds: Total audio duration, if known
+
+        Returns:
+            Dict with wall_seconds, output_bytes, scratch_bytes and whether
+            the setting has history (``measured``)
+        """
+        rate = self.rate(settings)
+        if input_seconds:
+            wall_seconds = input_seconds / rate['realtime_factor']
+        else:
+            wall_seconds = input_bytes / rate['bytes_per_second']
+        output_bytes = int(input_bytes * rate['output_ratio'])
+        # The segment pipeline holds every intermediate plus the merged file
+        scratch_bytes = output_bytes * (2 if settings.get('pipeline') == 'segments' else 1)
+        return {
+            'wall_seconds': wall_seconds,
+            'output_bytes': output_bytes,
+            'scratch_bytes': scratch_bytes,
+            'measured': rate['conversions'] > 0,
+        }
+
+
+class StatsStore:
+    """
+    SQLite record of finished conversions
+
+    Shares the database file of the conversion index. Rows are kept per host
+    so a database on shared storage still gives each machine its own model.
+    """
+
+    def __init__(self, db_path: str, host: Optional[str] = None):
+        self.db_path = Path(db_path)
+        self.host = host or socket.gethostname()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS conversion_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    host TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    book_directory TEXT,
+                    input_seconds REAL NOT NULL,
+                    input_bytes INTEGER NOT NULL,
+                    output_bytes INTEGER NOT NULL,
+                    wall_seconds REAL NOT NULL,
+                    cpu_seconds REAL NOT NULL,
+                    finished_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS conversion_stats_host ON conversion_stats (host, settings)")
+
+    @contextmanager
+    def connect(self):
+        """Open a connection that commits on success and is always closed"""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record(self, settings: Dict[str, Any], input_seconds: float, input_bytes: int, output_bytes: int,
+               wall_seconds: float, cpu_seconds: float, book_directory: Optional[Path] = None) -> None:
+        """
+        Record a finished conversion
+
+        Args:
+            settings: Conversion settings (see conversion_settings)
+            input_seconds: Audio duration of the source files
+            input_bytes: Size of the source files
+            output_bytes: Size of the M4B
+            wall_seconds: Elapsed time of the encode and merge
+            cpu_seconds: CPU time of the helper processes
+            book_directory: Audiobook directory
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT INTO conversion_stats (host, settings, book_directory, input_seconds, input_bytes, "
+                "output_bytes, wall_seconds, cpu_seconds, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.host, settings_key(settings), str(book_directory) if book_directory else None,
+                 input_seconds, input_bytes, output_bytes, wall_seconds, cpu_seconds, time.time())
+            )
+
+    def model(self, window: int = MODEL_WINDOW) -> ThroughputModel:
+        """
+        Build this host's model from its most recent conversions per setting
+
+        Rates are ratios of sums, so long books weigh more than short ones.
+        """
+        with self.connect() as db:
+            rows = db.execute("""
+                SELECT settings, COUNT(*) AS conversions, SUM(input_seconds) AS input_seconds,
+                       SUM(input_bytes) AS input_bytes, SUM(output_bytes) AS output_bytes,
+                       SUM(wall_seconds) AS wall_seconds, SUM(cpu_seconds) AS cpu_seconds
+                FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY settings ORDER BY id DESC) AS n
+                      FROM conversion_stats WHERE host = ?)
+                WHERE n <= ? GROUP BY settings
+            """, (self.host, window)).fetchall()
+        rates = {}
+        for row in rows:
+            if row['wall_seconds'] <= 0 or row['input_bytes'] <= 0 or row['input_seconds'] <= 0:
+                continue
+            rates[row['settings']] = {
+                'realtime_factor': row['input_seconds'] / row['wall_seconds'],
+                'bytes_per_second': row['input_bytes'] / row['wall_seconds'],
+                'output_ratio': row['output_bytes'] / row['input_bytes'],
+                'cpu_per_audio_second': row['cpu_seconds'] / row['input_seconds'],
+                'conversions': row['conversions'],
+            }
+        return ThroughputModel(rates)
+
+
+def plan(estimates: List[Dict[str, Any]], slots: int) -> Dict[str, Any]:
+    """
+    Combine per-book estimates into a plan for ``slots`` concurrent jobs
+
+    Books are assigned longest first to the slot that frees up next, which
+    gives the makespan; peak scratch assumes the largest books overlap.
+
+    Args:
+        estimates: Results of ThroughputModel.estimate
+        slots: Conversions that run at the same time
+
+    Returns:
+        Dict with books, wall_seconds, output_bytes, peak_scratch_bytes and
+        measured (False if any estimate used defaults)
+    """
+    slots = max(1, slots)
+    finish = [0.0] * slots
+    for seconds in sorted((e['wall_seconds'] for e in estimates), reverse=True):
+        heapq.heapreplace(finish, finish[0] + seconds)
+    scratch = sorted((e['scratch_bytes'] for e in estimates), reverse=True)
+    return {
+        'books': len(estimates),
+        'wall_seconds': max(finish),
+        'output_bytes': sum(e['output_bytes'] for e in estimates),
+        'peak_scratch_bytes': sum(scratch[:slots]),
+        'measured': all(e['measured'] for e in estimates),
+    }
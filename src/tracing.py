@@ -0,0 +1,232 @@
+"""Per-job phase tracing for ReadarrM4B"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils import sanitize_filename
+
+_current_trace: ContextVar[Optional['JobTrace']] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional[Dict[str, Any]]] = ContextVar('current_span', default=None)
+
+
+class _NullSpan:
+    """Shared no-op span used when tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _start_record(name: str, attrs: Dict[str, Any], track: str) -> Dict[str, Any]:
+    """New span record whose parent is the innermost open span"""
+    parent = _current_span.get()
+    return {
+        'name': name,
+        'attrs': attrs,
+        'track': track,
+        'span_id': os.urandom(8).hex(),
+        'parent_id': parent['span_id'] if parent else None,
+        'start_ns': time.time_ns(),
+    }
+
+
+class _Span:
+    """Context manager recording one span on the active trace"""
+
+    def __init__(self, trace: 'JobTrace', name: str, attrs: Dict[str, Any], track: str):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.track = track
+        self.record = None
+        self._token = None
+
+    def __enter__(self):
+        self.record = _start_record(self.name, self.attrs, self.track)
+        self._token = _current_span.set(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['end_ns'] = time.time_ns()
+        if exc_type is not None:
+            self.record['attrs']['error'] = repr(exc)
+        _current_span.reset(self._token)
+        self.trace.spans.append(self.record)
+        return False
+
+    def set(self, **attrs) -> None:
+        """Add attributes to the span"""
+        self.attrs.update(attrs)
+
+
+class JobTrace:
+    """Spans recorded for a single conversion job"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Dict[str, Any]] = []
+        self._phases: Dict[str, Dict[str, Any]] = {}
+
+    def set_phase(self, track: str, name: str, **attrs) -> None:
+        """
+        End the running phase on a track and start a new one
+
+        Phases are sequential children of the span that is open when they
+        start, for stages only visible in a subprocess's output.
+        """
+        running = self._phases.get(track)
+        if running and running['name'] == name:
+            return
+        self.end_phase(track)
+        self._phases[track] = _start_record(name, attrs, track)
+
+    def end_phase(self, track: str) -> None:
+        """End the running phase on a track, if any"""
+        record = self._phases.pop(track, None)
+        if record:
+            record['end_ns'] = time.time_ns()
+            self.spans.append(record)
+
+    def close(self) -> None:
+        """End every running phase"""
+        for track in list(self._phases):
+            self.end_phase(track)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Spans in Chrome trace event format (loads in Perfetto/chrome://tracing)"""
+        tracks = {}
+        events = []
+        for span in sorted(self.spans, key=lambda s: s['start_ns']):
+            tid = tracks.setdefault(span['track'], len(tracks) + 1)
+            events.append({
+                'name': span['name'],
+                'ph': 'X',
+                'pid': 1,
+                'tid': tid,
+                'ts': span['start_ns'] / 1000,
+                'dur': (span['end_ns'] - span['start_ns']) / 1000,
+                'args': {key: str(value) for key, value in span['attrs'].items()},
+            })
+        for track, tid in tracks.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': track}})
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': self.name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Spans in OTLP/JSON format for an OpenTelemetry collector"""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span['span_id'],
+                'name': span['name'],
+                'kind': 1,
+                'startTimeUnixNano': str(span['start_ns']),
+                'endTimeUnixNano': str(span['end_ns']),
+                'attributes': [{'key': key, 'value': {'stringValue': str(value)}}
+                               for key, value in span['attrs'].items()],
+            }
+            if span['parent_id']:
+                otlp_span['parentSpanId'] = span['parent_id']
+            spans.append(otlp_span)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': 'readarr-m4b'}},
+                {'key': 'job.name', 'value': {'stringValue': self.name}},
+            ]},
+            'scopeSpans': [{'scope': {'name': 'readarr-m4b'}, 'spans': spans}],
+        }]}
+
+
+def span(name: str, track: str = 'job', **attrs):
+    """
+    Record a span on the current job's trace
+
+    Returns a shared no-op context manager when no trace is active, so
+    instrumented code costs a single context variable lookup when disabled.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, attrs, track)
+
+
+def current_trace() -> Optional[JobTrace]:
+    """The trace of the running job, or None when tracing is disabled"""
+    return _current_trace.get()
+
+
+@asynccontextmanager
+async def job_trace(config, name: str):
+    """
+    Trace a job when tracing is enabled, writing its files on exit
+
+    The files are written in a worker thread, off the event loop.
+
+    Args:
+        config: Configuration with tracing settings
+        name: Job name used for the trace and its file names
+    """
+    if not config.tracing_enabled:
+        yield None
+        return
+
+    trace = JobTrace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.close()
+        await asyncio.to_thread(_export, config, trace)
+
+
+def _export(config, trace: JobTrace) -> None:
+    """Write the trace files and optionally send the spans to a collector"""
+    logger = logging.getLogger(__name__)
+    trace_dir = Path(config.tracing_dir)
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{sanitize_filename(trace.name)}"
+    try:
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        trace_file = trace_dir / f"{stem}.trace.json"
+        with open(trace_file, 'w') as f:
+            json.dump(trace.to_chrome_trace(), f)
+        logger.info(f"Trace written to {trace_file}")
+
+        if config.tracing_otlp:
+            with open(trace_dir / f"{stem}.otlp.json", 'w') as f:
+                json.dump(trace.to_otlp(), f)
+    except OSError as e:
+        logger.warning(f"Could not write trace: {e}")
+
+    if config.tracing_otlp_endpoint:
+        threading.Thread(target=_post_otlp, args=(config.tracing_otlp_endpoint, trace.to_otlp()),
+                         daemon=True).start()
+
+
+def _post_otlp(endpoint: str, payload: Dict[str, Any]) -> None:
+    """Send spans to an OTLP/HTTP JSON endpoint such as a local collector"""
+    request = urllib.request.Request(endpoint, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        urllib.request.urlopen(request, timeout=10).close()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Could not send trace to {endpoint}: {e}")
@@ -1,19 +1,72 @@
 """Utility functions for ReadarrM4B"""
 
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
 import sys
 from pathlib import Path
 from typing import Optional
 
+_log_listener: Optional[logging.handlers.QueueListener] = None
 
-def setup_logging(level: str = "INFO", log_file: Optional[str] = None) -> None:
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format log records as one JSON object per line"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compress a rotated log file"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _rotating_handler(log_file: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    """Size-rotated file handler that gzips old files"""
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(level: str = "INFO", log_file: Optional[str] = None,
+                  webhook_log_file: Optional[str] = None, json_file: Optional[str] = None,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5) -> None:
     """
     Setup logging configuration
     
+    Loggers only put records on a queue; a single background listener thread
+    does the console and file writes, so logging never blocks the event loop.
+    
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR)
         log_file: Optional log file path
+        webhook_log_file: Optional file for the ``webhook`` loggers only
+        json_file: Optional JSON-lines log file path
+        max_bytes: Size at which log files are rotated
+        backup_count: Number of compressed rotated files to keep
     """
+    global _log_listener
+    stop_logging()
+    
     # Convert level string to logging constant
     numeric_level = getattr(logging, level.upper(), logging.INFO)
     
@@ -23,32 +76,61 @@ def setup_logging(level: str = "INFO", log_file: Optional[str] = None) -> None:
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
-    # Setup root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(numeric_level)
-    
-    # Clear any existing handlers
-    root_logger.handlers.clear()
+    # Raw webhook request dumps only go to the webhook log
+    def not_request_dump(record: logging.LogRecord) -> bool:
+        return record.name != 'webhook.requests'
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    console_handler.addFilter(not_request_dump)
+    handlers = [console_handler]
+    errors = []
     
-    # File handler (if specified)
-    if log_file:
+    # File handlers (if specified)
+    for path, handler_formatter, webhook_only in ((log_file, formatter, False),
+                                                  (json_file, JsonLinesFormatter(), False),
+                                                  (webhook_log_file, formatter, True)):
+        if not path:
+            continue
         try:
-            # Create log directory if it doesn't exist
-            log_path = Path(log_file)
-            log_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            file_handler = logging.FileHandler(log_file)
-            file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
-            
+            file_handler = _rotating_handler(path, max_bytes, backup_count)
+            file_handler.setFormatter(handler_formatter)
+            if webhook_only:
+                file_handler.addFilter(lambda record: record.name.split('.')[0] == 'webhook')
+            else:
+                file_handler.addFilter(not_request_dump)
+            handlers.append(file_handler)
         except Exception as e:
             # If we can't setup file logging, just log to console
-            root_logger.warning(f"Could not setup file logging to {log_file}: {e}")
+            errors.append(f"Could not setup file logging to {path}: {e}")
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    
+    # Setup root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(numeric_level)
+    
+    # Clear any existing handlers
+    root_logger.handlers.clear()
+    root_logger.addHandler(queue_handler)
+    
+    for error in errors:
+        root_logger.warning(error)
+
+
+def stop_logging() -> None:
+    """Flush queued log records and stop the background listener"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(stop_logging)
 
 
 def sanitize_filename(filename: str) -> str:
@@ -86,6 +168,44 @@ def sanitize_filename(filename: str) -> str:
     return sanitized.strip()
 
 
+def natural_sort_key(path: Path) -> tuple:
+    """
+    Sort key ordering numbers in file and folder names by value
+    
+    "Chapter 2.mp3" sorts before "Chapter 10.mp3", as m4b-tool orders the
+    files of a directory.
+    
+    Args:
+        path: File path
+        
+    Returns:
+        Key for sorted()
+    """
+    key = []
+    for part in Path(path).parts:
+        # Split keeps digit runs at odd indexes, so ints only meet ints
+        chunks = re.split(r'(\d+)', part.casefold())
+        key.append((tuple(int(chunk) if index % 2 else chunk for index, chunk in enumerate(chunks)), part))
+    return tuple(key)
+
+
+def link_or_copy(source: Path, dest: Path) -> None:
+    """
+    Hardlink source to dest, falling back to a copy across filesystems
+    
+    Args:
+        source: Existing file
+        dest: New path (replaced if it exists)
+    """
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        if not source.exists():
+            raise
+        shutil.copy2(source, dest)
+
+
 def format_duration(seconds: int) -> str:
     """
     Format duration in seconds to human-readable format
@@ -119,12 +239,17 @@ def get_directory_size(path: Path) -> int:
         Total size in bytes
     """
     total_size = 0
-    try:
-        for file_path in path.rglob('*'):
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
-    except (OSError, PermissionError):
-        pass
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        total_size += entry.stat().st_size
+        except OSError:
+            continue
     
     return total_size
 
@@ -0,0 +1,264 @@
+"""Watch-folder ingestion for ReadarrM4B"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Polling still works without watchdog
+    FileSystemEventHandler = object
+    Observer = None
+
+from config import Config
+
+# Filesystems that do not deliver inotify events for changes made elsewhere
+POLL_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'fuse', 'fuseblk', 'sshfs', 'davfs'}
+
+
+def filesystem_type(path: Path) -> Optional[str]:
+    """Filesystem type of the mount holding path, from /proc/mounts"""
+    try:
+        with open('/proc/mounts') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+    resolved = str(Path(path).resolve())
+    best = None
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        if resolved == mount_point or resolved.startswith(mount_point.rstrip('/') + '/'):
+            if best is None or len(mount_point) > len(best[0]):
+                best = (mount_point, fs_type)
+    return best[1] if best else None
+
+
+def needs_polling(path: Path) -> bool:
+    """Check whether a library root lives on a filesystem without change events"""
+    fs_type = filesystem_type(path) or ''
+    return fs_type in POLL_FILESYSTEMS or fs_type.startswith('fuse.')
+
+
+def directory_state(path: Path) -> Optional[tuple]:
+    """
+    Audio files of a directory with their sizes and modification times
+
+    Returns:
+        Sorted (name, size, mtime_ns) tuples, or None if the directory is
+        gone or already holds an M4B
+    """
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                suffix = os.path.splitext(entry.name)[1].lower()
+                if suffix == '.m4b':
+                    return None
+                if suffix == '.mp3' and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    except OSError:
+        return None
+    return tuple(sorted(files))
+
+
+def find_pending_books(roots: List[str]) -> List[Path]:
+    """Directories below the library roots that hold MP3s but no M4B"""
+    pending = []
+    for root in roots:
+        pending.extend(path for path in DirectoryPoller(Path(root)).scan() if directory_state(path))
+    return sorted(pending)
+
+
+class DirectoryPoller:
+    """
+    Incremental change detection for a directory tree
+
+    Each pass stats every known directory once and lists only those whose
+    mtime changed, so unchanged trees cost one stat per directory.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._mtimes: Dict[str, int] = {}
+        self._children: Dict[str, List[str]] = {}
+
+    def scan(self) -> List[Path]:
+        """
+        Walk the tree once
+
+        Returns:
+            Directories that are new or whose entries changed since the last pass
+        """
+        changed = []
+        seen = set()
+        stack = [str(self.root)]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(path)
+            if self._mtimes.get(path) != mtime:
+                self._mtimes[path] = mtime
+                try:
+                    with os.scandir(path) as entries:
+                        self._children[path] = [entry.path for entry in entries
+                                                if entry.is_dir(follow_symlinks=False)]
+                except OSError:
+                    self._children[path] = []
+                changed.append(Path(path))
+            stack.extend(self._children.get(path, []))
+
+        for path in set(self._mtimes) - seen:
+            del self._mtimes[path]
+            self._children.pop(path, None)
+        return changed
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward file events to the watcher as touched directories"""
+
+    def __init__(self, watcher: 'BookWatcher'):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type not in ('created', 'modified', 'moved', 'closed'):
+            return
+        path = getattr(event, 'dest_path', None) or event.src_path
+        self.watcher.touch(Path(path) if event.is_directory else Path(path).parent)
+
+
+class BookWatcher:
+    """
+    Queue books that appear in the library outside of Readarr
+
+    Filesystem events (or polling on network and FUSE mounts) mark book
+    directories as active. Once a directory has been quiet for the debounce
+    period and holds MP3s but no M4B, it is submitted to the scheduler.
+    One observer watches each library root recursively and a single poller
+    thread handles polled roots, regardless of the number of directories.
+    """
+
+    def __init__(self, config: Config, scheduler):
+        self.config = config
+        self.scheduler = scheduler
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Directory -> (last activity, confirm, audio state at the last check)
+        self._active: Dict[Path, tuple] = {}
+        self._observer = None
+        self._pollers: List[DirectoryPoller] = []
+        self._event_roots: List[Path] = []
+
+        for root in map(Path, config.audiobooks_paths):
+            mode = config.watch_mode
+            if mode == 'auto':
+                mode = 'poll' if Observer is None or needs_polling(root) else 'events'
+            if mode == 'events' and Observer is None:
+                self.logger.warning("watchdog is not installed, polling instead")
+                mode = 'poll'
+            if mode == 'poll':
+                self._pollers.append(DirectoryPoller(root))
+            else:
+                self._event_roots.append(root)
+            self.logger.info(f"Watching {root} ({mode})")
+
+    def touch(self, path: Path, confirm: bool = False) -> None:
+        """
+        Record activity in a directory (thread-safe)
+
+        Args:
+            path: Directory that changed
+            confirm: Require the audio files to stay unchanged for a further
+                debounce period, for roots that only report directory changes
+        """
+        with self._lock:
+            entry = self._active.get(Path(path))
+            confirm = confirm or bool(entry and entry[1])
+            self._active[Path(path)] = (time.monotonic(), confirm, None)
+
+    def _start_observer(self) -> None:
+        """Start the watchdog observer for event-driven roots"""
+        if not self._event_roots:
+            return
+        self._observer = Observer()
+        handler = _EventHandler(self)
+        for root in self._event_roots:
+            self._observer.schedule(handler, str(root), recursive=True)
+        self._observer.start()
+
+    def _initial_scan(self) -> int:
+        """Mark every directory of event-driven roots so pending books are found"""
+        count = 0
+        for root in self._event_roots:
+            for path in DirectoryPoller(root).scan():
+                self.touch(path)
+                count += 1
+        return count
+
+    def _poll(self) -> None:
+        """One incremental pass over every polled root"""
+        for poller in self._pollers:
+            for path in poller.scan():
+                self.touch(path, confirm=True)
+
+    def _settle(self) -> List[Path]:
+        """
+        Take directories that have been quiet for the debounce period
+
+        Returns:
+            Settled directories that hold MP3s but no M4B
+        """
+        now = time.monotonic()
+        with self._lock:
+            quiet = [(path, *entry) for path, entry in self._active.items()
+                     if now - entry[0] >= self.config.watch_debounce_seconds]
+        ready = []
+        for path, last, confirm, state in quiet:
+            current = directory_state(path)
+            with self._lock:
+                entry = self._active.get(path)
+                if entry is None or entry[0] != last:
+                    continue  # Touched again meanwhile
+                if current and confirm and current != state:
+                    # Growing files go unreported on polled mounts, wait for them to stop
+                    self._active[path] = (now, confirm, current)
+                    continue
+                del self._active[path]
+            if current:
+                ready.append(path)
+        return ready
+
+    def _submit(self, path: Path) -> None:
+        """Queue a settled book (the scheduler skips books already queued or running)"""
+        self.logger.info(f"New book found: {path}")
+        self.scheduler.submit(path, None, source='watch')
+
+    async def run(self) -> None:
+        """Watch until cancelled"""
+        self._start_observer()
+        try:
+            if self._event_roots:
+                count = await asyncio.to_thread(self._initial_scan)
+                self.logger.info(f"Initial scan found {count} directories")
+            tick = max(0.05, min(1.0, self.config.watch_debounce_seconds / 4))
+            next_poll = 0.0
+            while True:
+                if self._pollers and time.monotonic() >= next_poll:
+                    await asyncio.to_thread(self._poll)
+                    next_poll = time.monotonic() + self.config.watch_poll_interval
+                for path in await asyncio.to_thread(self._settle):
+                    self._submit(path)
+                await asyncio.sleep(tick)
+        finally:
+            if self._observer:
+                self._observer.stop()
+                self._observer.join()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for encoder parallelism calibration
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from calibration import (CalibrationCache, calibrate, candidate_combinations, files_per_book, fingerprint_key,
+                         host_fingerprint)
+from test_converter import write_config
+
+
+class TestCalibration(unittest.TestCase):
+    """Test calibration trials, the cache and how Config applies results"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_candidate_combinations(self):
+        """Test combinations fill between half and all of the threads"""
+        self.assertEqual(candidate_combinations(8), [(1, 8), (2, 4), (4, 2), (8, 1)])
+        self.assertEqual(candidate_combinations(1), [(1, 1)])
+        self.assertTrue(all(3 < books * jobs <= 6 for books, jobs in candidate_combinations(6)))
+
+    def test_trials_have_a_file_per_job(self):
+        """Test books in wide trials have enough files for every parallel encode"""
+        self.assertEqual(files_per_book(1), 4)
+        self.assertEqual(files_per_book(16), 16)
+
+    def test_cache_is_per_host(self):
+        """Test results are only returned for the same host fingerprint"""
+        cache = CalibrationCache(str(self.root / "calibration.json"))
+        host = {'cpu_model': 'Test CPU', 'cores': 8, 'machine': 'x86_64'}
+        cache.store(host, {'jobs': 2}, [])
+        self.assertEqual(cache.get(host), {'jobs': 2})
+        self.assertIsNone(cache.get({**host, 'cores': 16}))
+
+    def test_calibrate_picks_fastest(self):
+        """Test the fastest combination and codec are stored"""
+        config = write_config(self.root, "calibration:\n  codecs: [aac, libfdk_aac]\n  sample_seconds: 10\n"
+                                         "scheduler:\n  cpu_budget: 4\n")
+
+        async def fake_sample(work_dir, seconds):
+            return work_dir / "sample.mp3"
+
+        async def fake_trial(work_dir, sample, books, jobs, codec):
+            # 2 books x 2 jobs with libfdk_aac is fastest
+            return 0.5 if (books, jobs, codec) == (2, 2, 'libfdk_aac') else 2.0
+
+        with patch('calibration.shutil.which', return_value='/usr/bin/ffmpeg'), \
+                patch('calibration.make_sample', fake_sample), patch('calibration.run_trial', fake_trial):
+            outcome = asyncio.run(calibrate(config))
+
+        self.assertEqual(len(outcome['trials']), 6)
+        self.assertEqual(outcome['result'], {'jobs': 2, 'concurrent_books': 2, 'cpu_budget': 4,
+                                             'realtime_factor': 160.0, 'audio_codec': 'libfdk_aac'})
+        stored = json.loads(Path(config.calibration_cache_file).read_text())
+        self.assertIn(fingerprint_key(host_fingerprint()), stored)
+
+    def test_config_uses_calibration_unless_set(self):
+        """Test calibrated values apply only where the config sets none"""
+        CalibrationCache(str(self.root / "calibration.json")).store(
+            host_fingerprint(), {'jobs': 2, 'concurrent_books': 3, 'cpu_budget': 6, 'realtime_factor': 50}, [])
+
+        config = write_config(self.root)
+        self.assertEqual(config.jobs, 2)
+        self.assertEqual(config.scheduler_cpu_budget, 6)
+        self.assertEqual(config.get_m4b_tool_args()[:2], ["--jobs", "2"])
+
+        config = write_config(self.root, "  jobs: 8\nscheduler:\n  cpu_budget: 16\n")
+        self.assertEqual(config.jobs, 8)
+        self.assertEqual(config.scheduler_cpu_budget, 16)
+
+    def test_calibrate_requires_ffmpeg(self):
+        """Test a missing ffmpeg is reported"""
+        config = write_config(self.root)
+        with patch('calibration.shutil.which', return_value=None):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(calibrate(config))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for silence-based chapter detection
+"""
+
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from chapters import chapters_from_silences, detection_windows, merge_silences, parse_silencedetect
+from converter import M4BConverter
+from test_converter import write_config
+from test_mp4info import mp3_frames
+
+# Silences of the test book in file time
+SILENCES = [(10.5, 12.5), (19.0, 20.5)]
+
+
+class TestChapterHelpers(unittest.TestCase):
+    """Test windowing, parsing and merging"""
+
+    def test_windows_overlap_and_cover_the_file(self):
+        """Test windows step by window minus overlap up to the end"""
+        self.assertEqual(detection_windows(26, 12, 3), [(0.0, 12), (9.0, 12), (18.0, 8)])
+        self.assertEqual(detection_windows(5, 12, 3), [(0.0, 5)])
+
+    def test_parse_silencedetect(self):
+        """Test offsets are applied and an open silence ends with the window"""
+        output = ("[silencedetect @ 0x1] silence_start: 1.5\n"
+                  "[silencedetect @ 0x1] silence_end: 3.25 | silence_duration: 1.75\n"
+                  "[silencedetect @ 0x1] silence_start: 9\n")
+        self.assertEqual(parse_silencedetect(output, 100, 110), [(101.5, 103.25), (109.0, 110)])
+
+    def test_merge_joins_window_halves(self):
+        """Test a silence split by a window edge is joined before the length check"""
+        silences = [(10.5, 12.0), (10.8, 12.5), (30.0, 30.5), (40.0, 42.0)]
+        self.assertEqual(merge_silences(silences, min_silence=1.0), [(10.5, 12.5), (40.0, 42.0)])
+
+    def test_min_chapter_length(self):
+        """Test silences too close to the previous chapter or the end are skipped"""
+        silences = [(100, 102), (150, 152), (400, 402), (590, 592)]
+        chapters = chapters_from_silences(silences, duration=600, min_chapter=120)
+        self.assertEqual(chapters, [(0.0, "Chapter 1"), (151.0, "Chapter 2"), (401.0, "Chapter 3")])
+
+
+class TestDetectChapters(unittest.TestCase):
+    """Test detection on a book with fake ffmpeg output"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.config = write_config(root, """chapters:
+  min_silence_seconds: 1
+  min_chapter_minutes: 0.1
+  window_minutes: 0.2
+  overlap_seconds: 3
+""")
+        self.converter = M4BConverter(self.config)
+        self.book = root / "Book.mp3"
+        self.book.write_bytes(mp3_frames(1000))
+        self.windows = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    async def fake_silencedetect(self, cmd, cwd=None):
+        """Report the parts of SILENCES inside the requested window"""
+        start = float(cmd[cmd.index("-ss") + 1])
+        end = start + float(cmd[cmd.index("-t") + 1])
+        self.windows.append(start)
+        lines = []
+        for silence_start, silence_end in SILENCES:
+            if silence_end <= start or silence_start >= end:
+                continue
+            lines.append(f"silence_start: {max(silence_start, start) - start:.3f}")
+            if silence_end <= end:
+                lines.append(f"silence_end: {silence_end - start:.3f} | silence_duration: 1")
+        return 0, "\n".join(lines)
+
+    def detect(self):
+        with patch('converter.shutil.which', return_value='/usr/bin/tone'), \
+                patch.object(self.converter, '_run_process', self.fake_silencedetect):
+            return asyncio.run(self.converter._detect_chapters([self.book]))
+
+    def test_chapters_are_detected_and_cached(self):
+        """Test chapters from windowed detection and a cache hit the second time"""
+        chapters = self.detect()
+        self.assertEqual([title for _, title in chapters], ["Chapter 1", "Chapter 2", "Chapter 3"])
+        self.assertEqual([round(start, 2) for start, _ in chapters], [0.0, 11.5, 19.75])
+        self.assertEqual(self.windows, [0.0, 9.0, 18.0])
+
+        self.windows.clear()
+        self.assertEqual(self.detect(), chapters)
+        self.assertEqual(self.windows, [])
+
+    def test_many_files_keep_file_name_chapters(self):
+        """Test books with many files are not analysed in auto mode"""
+        with patch.object(self.converter, '_run_process', self.fake_silencedetect):
+            chapters = asyncio.run(self.converter._detect_chapters([self.book] * 3))
+        self.assertIsNone(chapters)
+        self.assertEqual(self.windows, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
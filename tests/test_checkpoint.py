@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for conversion checkpoints
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from checkpoint import JobCheckpoint
+
+
+class TestJobCheckpoint(unittest.TestCase):
+    """Test resumable job directories"""
+
+    def setUp(self):
+        """Set up a book with two source files"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.book = root / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        self.scratch = root / "scratch"
+        self.sources = []
+        for name in ("01.mp3", "02.mp3"):
+            source = self.book / name
+            source.write_bytes(b"mp3" * 100)
+            self.sources.append(source)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def _checkpoint(self, encoder=None):
+        checkpoint = JobCheckpoint(str(self.scratch), self.book, encoder or {'audio_codec': 'aac'})
+        checkpoint.load()
+        return checkpoint
+
+    def _encode(self, checkpoint, source):
+        segment = checkpoint.segment_path(source)
+        segment.write_bytes(b"aac" * 50)
+        checkpoint.mark_done(source, segment)
+        return segment
+
+    def test_resume_reuses_finished_files(self):
+        """Test a new attempt only encodes what is missing"""
+        checkpoint = self._checkpoint()
+        self._encode(checkpoint, self.sources[0])
+
+        resumed = self._checkpoint()
+        self.assertEqual(resumed.pending(self.sources), [self.sources[1]])
+
+    def test_truncated_segment_is_not_reused(self):
+        """Test size and hash verification of intermediates"""
+        checkpoint = self._checkpoint()
+        segment = self._encode(checkpoint, self.sources[0])
+        segment.write_bytes(b"aac" * 10)
+
+        resumed = self._checkpoint()
+        self.assertEqual(resumed.pending(self.sources), self.sources)
+        self.assertFalse(segment.exists())
+
+    def test_corrupted_segment_same_size_is_not_reused(self):
+        """Test the hash catches damage that keeps the size"""
+        checkpoint = self._checkpoint()
+        segment = self._encode(checkpoint, self.sources[0])
+        segment.write_bytes(b"xyz" * 50)
+
+        self.assertFalse(self._checkpoint().is_done(self.sources[0]))
+
+    def test_encoder_change_discards_checkpoint(self):
+        """Test intermediates from other encoder settings are dropped"""
+        checkpoint = self._checkpoint()
+        self._encode(checkpoint, self.sources[0])
+
+        resumed = self._checkpoint({'audio_codec': 'libfdk_aac'})
+        self.assertEqual(resumed.pending(self.sources), self.sources)
+
+    def test_orphaned_segments_are_removed(self):
+        """Test intermediates of removed sources are not merged"""
+        checkpoint = self._checkpoint()
+        orphan = self._encode(checkpoint, self.sources[1])
+
+        resumed = self._checkpoint()
+        resumed.pending(self.sources[:1])
+        self.assertFalse(orphan.exists())
+
+    def test_same_name_in_subfolders(self):
+        """Test files with the same name on different discs get their own entries"""
+        discs = []
+        for disc in ("CD1", "CD2"):
+            (self.book / disc).mkdir()
+            source = self.book / disc / "01.mp3"
+            source.write_bytes(disc.encode() * 100)
+            discs.append(source)
+
+        checkpoint = self._checkpoint()
+        segments = [self._encode(checkpoint, source) for source in discs]
+        self.assertEqual([segment.name for segment in segments], ["CD1 - 01.m4b", "CD2 - 01.m4b"])
+        self.assertEqual(checkpoint.segment_path(self.sources[0]).name, "01.m4b")
+
+        resumed = self._checkpoint()
+        self.assertEqual(resumed.pending(discs + self.sources), self.sources)
+        self.assertTrue(all(segment.exists() for segment in segments))
+
+    def test_discard_removes_job_directory(self):
+        """Test cleanup after a successful conversion"""
+        checkpoint = self._checkpoint()
+        self._encode(checkpoint, self.sources[0])
+        checkpoint.discard()
+        self.assertFalse(checkpoint.job_dir.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
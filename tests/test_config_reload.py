@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for live configuration reload
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config_reload import ConfigReloader, changed_settings
+from scheduler import ConversionScheduler
+from test_converter import write_config
+from test_scheduler import FakeConverter
+
+
+class TestConfigReload(unittest.TestCase):
+    """Test validation, the swap and what running jobs keep"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / "audiobooks").mkdir()
+        self.config = write_config(self.root, "  jobs: 2\nreload:\n  poll_seconds: 0.05\n")
+        self.applied = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def rewrite(self, extra: str) -> None:
+        write_config(self.root, extra)
+
+    def test_valid_change_is_applied(self):
+        """Test a changed, valid file is applied and an unchanged one is not"""
+        reloader = ConfigReloader(self.config, self.applied.append)
+        self.assertFalse(reloader.reload())
+
+        self.rewrite("  jobs: 6\n  stability_wait_seconds: 5\nreload:\n  poll_seconds: 0.05\n")
+        self.assertTrue(reloader.reload())
+        self.assertEqual(len(self.applied), 1)
+        self.assertEqual((self.applied[0].jobs, self.applied[0].stability_wait_seconds), (6, 5))
+        # reserved_interactive_cpu defaults to jobs
+        self.assertEqual(changed_settings(self.config, reloader.config),
+                         ['jobs', 'scheduler_reserved_interactive_cpu', 'stability_wait_seconds'])
+
+    def test_invalid_file_keeps_previous_config(self):
+        """Test unreadable and invalid files are rejected"""
+        reloader = ConfigReloader(self.config, self.applied.append)
+        self.config.config_file.write_text("paths: [unclosed\n")
+        with self.assertLogs('config_reload', level='ERROR'):
+            self.assertFalse(reloader.reload())
+
+        self.rewrite("  jobs: 6\n  duplicates: sometimes\n")
+        with self.assertLogs('config_reload', level='ERROR') as logs:
+            self.assertFalse(reloader.reload())
+        self.assertIn("duplicates", logs.output[0])
+        self.assertEqual(self.applied, [])
+        self.assertIs(reloader.config, self.config)
+
+    def test_restart_settings_keep_running_values(self):
+        """Test settings that need a restart are not swapped in with the rest"""
+        reloader = ConfigReloader(self.config, self.applied.append)
+        self.rewrite("  jobs: 2\nreload:\n  poll_seconds: 0.05\nadmin:\n  enabled: true\n")
+        with self.assertLogs('config_reload', level='WARNING'):
+            self.assertFalse(reloader.reload())
+
+        self.rewrite("  jobs: 5\nreload:\n  poll_seconds: 0.05\nadmin:\n  enabled: true\n")
+        self.assertTrue(reloader.reload())
+        self.assertEqual((self.applied[0].jobs, self.applied[0].admin_enabled), (5, False))
+
+    def test_mtime_and_sighup_trigger_reload(self):
+        """Test the watcher reloads after a file change and on SIGHUP"""
+        async def scenario():
+            reloader = ConfigReloader(self.config, lambda config: self.applied.append(config.jobs))
+            task = asyncio.create_task(reloader.run())
+            await asyncio.sleep(0.1)
+            self.rewrite("  jobs: 3\nreload:\n  poll_seconds: 0.05\n")
+            # Coarse filesystem timestamps would hide a quick rewrite
+            stat = os.stat(self.config.config_file)
+            os.utime(self.config.config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            for _ in range(50):
+                if self.applied:
+                    break
+                await asyncio.sleep(0.02)
+
+            # SIGHUP reloads even without a file change (changed settings only)
+            reloader.config.reload_enabled = False
+            reloader.config.jobs = 1
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(50):
+                if len(self.applied) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            task.cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.applied, [3, 3])
+
+    def test_running_jobs_keep_their_converter(self):
+        """Test queued jobs start on the new converter while the running one finishes on the old"""
+        config = write_config(self.root, "  jobs: 4\nscheduler:\n  cpu_budget: 4\n")
+        old = FakeConverter(duration=0.2)
+        new = FakeConverter(duration=0.01)
+
+        async def scenario():
+            scheduler = ConversionScheduler(config, old)
+            runner = asyncio.create_task(scheduler.run())
+            for n in range(3):
+                scheduler.submit(self.root / "audiobooks" / f"book{n}")
+            await asyncio.sleep(0.05)
+            scheduler.apply_config(write_config(self.root, "  jobs: 2\nscheduler:\n  cpu_budget: 8\n"), new)
+            await asyncio.wait_for(scheduler.drain(poll_interval=0.01), timeout=5)
+            runner.cancel()
+            return scheduler
+
+        scheduler = asyncio.run(scenario())
+        self.assertEqual(len(old.converted), 1)
+        self.assertEqual(len(new.converted), 2)
+        self.assertEqual(scheduler.status()['cpu_budget'], 8)
+
+    def test_queued_jobs_fit_a_lowered_budget(self):
+        """Test queued jobs get CPU tokens within the new budget and still start"""
+        config = write_config(self.root, "  jobs: 4\nscheduler:\n  cpu_budget: 8\n")
+        converter = FakeConverter(duration=0.01)
+
+        async def scenario():
+            scheduler = ConversionScheduler(config, converter)
+            job = scheduler.submit(self.root / "audiobooks" / "book")
+            scheduler.apply_config(write_config(self.root, "  jobs: 4\nscheduler:\n  cpu_budget: 2\n"))
+            tokens = job.cpu_tokens
+            runner = asyncio.create_task(scheduler.run())
+            await asyncio.wait_for(scheduler.drain(poll_interval=0.01), timeout=5)
+            runner.cancel()
+            return tokens
+
+        self.assertEqual(asyncio.run(scenario()), 2)
+        self.assertEqual(len(converter.converted), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Tests for the converter
+"""
+
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import Config
+from converter import M4BConverter, format_chapters
+from test_mp4info import build_m4b, mp3_frames
+
+
+def write_config(root: Path, extra: str = "") -> Config:
+    """Write a minimal config file below root and load it"""
+    config_file = root / "config.yaml"
+    config_file.write_text(f"""
+paths:
+  audiobooks: "{root / 'audiobooks'}"
+  temp_dir: "{root / 'tmp'}"
+  database: "{root / 'state.db'}"
+conversion:
+  stability_wait_seconds: 0
+{extra}
+""")
+    return Config(config_file)
+
+
+class TestConverterInputs(unittest.TestCase):
+    """Test input selection and stability checks"""
+
+    def setUp(self):
+        """Set up a book directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.book = self.root / "audiobooks" / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        for name in ("01.mp3", "02.mp3", "stray.mp3"):
+            (self.book / name).write_bytes(b"x" * 10)
+        self.converter = M4BConverter(write_config(self.root))
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_directory_scan_without_book_files(self):
+        """Test CLI jobs fall back to scanning the directory"""
+        files, sizes = self.converter._resolve_input_files(self.book, None)
+        self.assertEqual(len(files), 3)
+        self.assertIsNone(sizes)
+
+    def test_book_files_are_authoritative(self):
+        """Test webhook jobs only use the imported files"""
+        metadata = {'book_files': [
+            {'path': str(self.book / "01.mp3"), 'size': 10},
+            {'path': str(self.book / "02.mp3"), 'size': 10},
+            {'path': str(self.book / "cover.jpg"), 'size': 5},
+        ]}
+        files, sizes = self.converter._resolve_input_files(self.book, metadata)
+        self.assertEqual([f.name for f in files], ["01.mp3", "02.mp3"])
+        self.assertEqual(sizes[self.book / "01.mp3"], 10)
+
+    def test_reported_sizes_skip_the_wait(self):
+        """Test files matching Readarr's sizes are stable immediately"""
+        self.converter.config.stability_wait_seconds = 3600
+        files = [self.book / "01.mp3"]
+
+        stable = asyncio.run(asyncio.wait_for(
+            self.converter._wait_for_stability(files, {files[0]: 10}), timeout=5))
+        self.assertTrue(stable)
+
+    def test_same_name_on_two_discs(self):
+        """Test a partial file is not hidden by a complete one of the same name"""
+        self.converter.config.stability_wait_seconds = 0
+        files = []
+        for disc, size in (("CD1", 10), ("CD2", 4)):
+            (self.book / disc).mkdir()
+            (self.book / disc / "01.mp3").write_bytes(b"x" * size)
+            files.append(self.book / disc / "01.mp3")
+
+        info = self.converter._get_file_info(files)
+        self.assertEqual(info, {files[0]: 10, files[1]: 4})
+        # CD2/01.mp3 is still short of the size Readarr reported, so the wait is not skipped
+        with self.assertLogs('converter', level='INFO') as logs:
+            asyncio.run(self.converter._wait_for_stability(files, {files[0]: 10, files[1]: 10}))
+        self.assertFalse(any("match the sizes" in line for line in logs.output))
+
+    def test_missing_file_is_not_stable(self):
+        """Test a listed file that never appears aborts the conversion"""
+        files = [self.book / "01.mp3", self.book / "missing.mp3"]
+        self.assertFalse(asyncio.run(self.converter._wait_for_stability(files)))
+
+
+class TestRetag(unittest.TestCase):
+    """Test metadata-only retagging of an existing M4B"""
+
+    def setUp(self):
+        """Set up a converted book"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.book = self.root / "audiobooks" / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        self.output = self.book / "Author - Old Title.m4b"
+        self.output.write_bytes(build_m4b(chapters=("Old Title 1", "Old Title 2")))
+        self.converter = M4BConverter(write_config(self.root))
+        self.converter.index.record(self.book, self.output, "sig",
+                                    {'author_name': "Author", 'book_title': "Old Title", 'book_id': 7})
+        self.commands = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    async def fake_tone(self, cmd, cwd=None):
+        """Record the tone command and the chapters it was given"""
+        chapters = None
+        if "--meta-chapters-file" in cmd:
+            chapters = Path(cmd[cmd.index("--meta-chapters-file") + 1]).read_text()
+        self.commands.append((cmd, chapters))
+        return 0, ""
+
+    def test_retag_renames_without_encoding(self):
+        """Test tags, chapter names, file name and index are updated"""
+        metadata = {'author_name': "Author", 'book_title': "New Title", 'book_id': 7}
+        with patch('converter.shutil.which', return_value="/usr/bin/tone"), \
+                patch.object(self.converter, '_run_process', self.fake_tone):
+            self.assertTrue(asyncio.run(self.converter.retag_audiobook(self.book, metadata)))
+
+        cmd, chapters = self.commands[0]
+        self.assertEqual(cmd[:2], ["tone", "tag"])
+        self.assertIn("New Title", cmd)
+        self.assertEqual(chapters, "00:00:00.000 New Title 1\n00:00:10.000 New Title 2\n")
+        self.assertFalse(self.output.exists())
+        new_output = self.book / "Author - New Title.m4b"
+        self.assertTrue(new_output.exists())
+        record = self.converter.index.get(self.book)
+        self.assertEqual(record['output_path'], str(new_output))
+        self.assertEqual(record['signature'], "sig")
+        self.assertEqual(list(self.book.iterdir()), [new_output])
+
+    def test_retag_without_output_fails(self):
+        """Test a book that was never converted is not retagged"""
+        self.output.unlink()
+        with patch('converter.shutil.which', return_value="/usr/bin/tone"):
+            self.assertFalse(asyncio.run(self.converter.retag_audiobook(self.book, {})))
+
+    def test_format_chapters(self):
+        """Test chapter start times are written as HH:MM:SS.mmm"""
+        self.assertEqual(format_chapters([(3723.5, "Part")]), "01:02:03.500 Part\n")
+
+
+class TestMove(unittest.TestCase):
+    """Test following renamed book directories"""
+
+    def setUp(self):
+        """Set up a converted book whose directory was renamed"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.old_book = self.root / "audiobooks" / "Old Author" / "Book"
+        self.new_book = self.root / "audiobooks" / "New Author" / "Book"
+        self.old_book.mkdir(parents=True)
+        self.new_book.mkdir(parents=True)
+        self.output = self.old_book / "Old Author - Book.m4b"
+        self.output.write_bytes(b"m4b")
+        self.converter = M4BConverter(write_config(self.root))
+        self.converter.index.record(self.old_book, self.output, "sig",
+                                    {'author_name': "Old Author", 'book_title': "Book", 'book_id': 7})
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_rename_moves_output(self):
+        """Test a rename event moves the M4B and updates the index"""
+        metadata = {'author_name': "New Author", 'previous_directory': str(self.old_book)}
+        self.assertTrue(asyncio.run(self.converter.move_audiobook(self.new_book, metadata)))
+
+        new_output = self.new_book / "New Author - Book.m4b"
+        self.assertEqual(new_output.read_bytes(), b"m4b")
+        self.assertFalse(self.output.exists())
+        self.assertIsNone(self.converter.index.get(self.old_book))
+        record = self.converter.index.get(self.new_book)
+        self.assertEqual(record['output_path'], str(new_output))
+        self.assertEqual(record['author'], "New Author")
+        self.assertEqual(record['signature'], "sig")
+
+    def test_import_without_mp3s_moves_by_book_id(self):
+        """Test an import into a new directory reuses the earlier conversion"""
+        metadata = {'author_name': "New Author", 'book_title': "Book", 'book_id': 7}
+        self.assertTrue(asyncio.run(self.converter.convert_audiobook(self.new_book, metadata)))
+        self.assertTrue((self.new_book / "New Author - Book.m4b").exists())
+        self.assertEqual(self.converter.index.find_by_book_id(7)['book_directory'], str(self.new_book))
+
+    def test_unknown_book_is_not_moved(self):
+        """Test a move without an index entry fails"""
+        self.assertFalse(asyncio.run(self.converter.move_audiobook(self.root / "audiobooks" / "Other", {})))
+
+
+
+
+class TestMergeOrder(unittest.TestCase):
+    """Test files are merged in natural order"""
+
+    def setUp(self):
+        """Set up a book whose track numbers have no leading zeros"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.book = self.root / "audiobooks" / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        self.mp3_files = []
+        for name in ("Chapter 10.mp3", "Chapter 2.mp3", "Chapter 1.mp3"):
+            (self.book / name).write_bytes(b"x" * 10)
+            self.mp3_files.append(self.book / name)
+        self.merged = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    async def fake_m4b_tool(self, source_path, output_path, extra_args=None, inputs=None):
+        self.merged = [Path(path).stem for path in inputs]
+        return True
+
+    async def fake_encode(self, sources, checkpoint, cache_stats=None, encoder=None):
+        return True
+
+    def test_checkpoint_merge_order(self):
+        """Test the resumable pipeline merges chapter 2 before chapter 10"""
+        converter = M4BConverter(write_config(self.root, "  skip_cover: true\n"))
+        with patch('converter.shutil.which', return_value="/usr/bin/ffmpeg"), \
+                patch.object(converter, '_encode_segments', self.fake_encode), \
+                patch.object(converter, '_run_m4b_tool', self.fake_m4b_tool):
+            self.assertTrue(asyncio.run(converter._convert_with_checkpoint(
+                self.book, self.mp3_files, self.book / "Book.m4b")))
+        self.assertEqual(self.merged, ["Chapter 1", "Chapter 2", "Chapter 10"])
+
+    def test_plain_merge_order(self):
+        """Test m4b-tool gets the files in natural order without checkpoints"""
+        converter = M4BConverter(write_config(self.root, """  skip_cover: true
+  resume_partial: false
+  cleanup_originals: false
+chapters:
+  detect: never
+verification:
+  enabled: false
+"""))
+        with patch('converter.shutil.which', return_value="/usr/bin/m4b-tool"), \
+                patch.object(converter, '_run_m4b_tool', self.fake_m4b_tool):
+            self.assertTrue(asyncio.run(converter.convert_audiobook(self.book)))
+        self.assertEqual(self.merged, ["Chapter 1", "Chapter 2", "Chapter 10"])
+
+class TestDuplicateLink(unittest.TestCase):
+    """Test linking the output of a book converted elsewhere"""
+
+    def setUp(self):
+        """Set up a one-file book and an existing output with detected chapters"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.book = self.root / "audiobooks" / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        self.mp3 = self.book / "01.mp3"
+        # 60 seconds of MP3 frames
+        self.mp3.write_bytes(mp3_frames(2297))
+        self.existing = self.root / "audiobooks" / "Other" / "Book" / "Book.m4b"
+        self.existing.parent.mkdir(parents=True)
+        self.existing.write_bytes(build_m4b(60.0, ("One", "Two", "Three")))
+        self.converter = M4BConverter(write_config(self.root, "  duplicates: hardlink\n  cleanup_originals: false\n"))
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_linked_output_keeps_detected_chapters(self):
+        """Test a linked output is not failed for having more chapters than files"""
+        output = self.book / "Book.m4b"
+        duplicate = {'output_path': str(self.existing), 'book_directory': str(self.existing.parent)}
+        handled = asyncio.run(self.converter._handle_duplicate(self.book, [self.mp3], output, duplicate,
+                                                               "sig", None))
+        self.assertTrue(handled)
+        self.assertTrue(output.exists())
+        self.assertEqual(self.converter.index.get(self.book)['output_path'], str(output))
+
+if __name__ == '__main__':
+    unittest.main()
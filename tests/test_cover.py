@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for cover art discovery and the resize cache
+"""
+
+import asyncio
+import struct
+import sys
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from converter import M4BConverter
+from cover import best_cover, find_covers, image_dimensions
+from mp3info import id3_pictures
+from test_converter import write_config
+from test_mp4info import mp3_frames
+
+
+def jpeg(width: int, height: int, padding: int = 0) -> bytes:
+    """A JPEG header with an APP0 segment and a baseline frame header"""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + bytes(9)
+    sof = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + bytes(3)
+    return b'\xff\xd8' + app0 + sof + bytes(padding) + b'\xff\xd9'
+
+
+def png(width: int, height: int) -> bytes:
+    """A PNG signature and IHDR chunk"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr
+            + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr)))
+
+
+def syncsafe(value: int) -> bytes:
+    return bytes([(value >> 21) & 0x7f, (value >> 14) & 0x7f, (value >> 7) & 0x7f, value & 0x7f])
+
+
+def id3_tag(frames: list, version: int = 3) -> bytes:
+    """An ID3v2 tag of (frame id, body) frames"""
+    data = b''
+    for frame_id, body in frames:
+        size = syncsafe(len(body)) if version == 4 else struct.pack('>I', len(body))
+        data += frame_id + size + b'\x00\x00' + body
+    return b'ID3' + bytes([version, 0, 0]) + syncsafe(len(data)) + data
+
+
+def apic(image: bytes, picture_type: int = 3, mime: bytes = b'image/jpeg', description: bytes = b'') -> bytes:
+    return b'\x00' + mime + b'\x00' + bytes([picture_type]) + description + b'\x00' + image
+
+
+class TestCoverDiscovery(unittest.TestCase):
+    """Test the ID3 picture parser and candidate selection"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.book = Path(self.temp_dir.name) / "Book"
+        self.book.mkdir()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_id3_pictures_locate_image_bytes(self):
+        """Test APIC frames are found in v2.3 and v2.4 tags without reading the audio"""
+        image = jpeg(600, 400)
+        for version in (3, 4):
+            tag = id3_tag([(b'TIT2', b'\x00Title'), (b'APIC', apic(image, description=b'Front'))], version)
+            path = self.book / f"v{version}.mp3"
+            path.write_bytes(tag + mp3_frames(10))
+            pictures = id3_pictures(path)
+            self.assertEqual(len(pictures), 1)
+            picture = pictures[0]
+            self.assertEqual((picture['mime'], picture['picture_type'], picture['size']),
+                             ('image/jpeg', 3, len(image)))
+            with open(path, 'rb') as f:
+                f.seek(picture['offset'])
+                self.assertEqual(f.read(picture['size']), image)
+            self.assertEqual(image_dimensions(path, picture['offset'], picture['size']), (600, 400))
+
+        untagged = self.book / "plain.mp3"
+        untagged.write_bytes(mp3_frames(10))
+        self.assertEqual(id3_pictures(untagged), [])
+
+    def test_dimensions(self):
+        """Test JPEG and PNG headers are read"""
+        (self.book / "a.png").write_bytes(png(800, 1200))
+        (self.book / "b.jpg").write_bytes(jpeg(300, 200))
+        (self.book / "c.jpg").write_bytes(b'not an image')
+        self.assertEqual(image_dimensions(self.book / "a.png"), (800, 1200))
+        self.assertEqual(image_dimensions(self.book / "b.jpg"), (300, 200))
+        self.assertIsNone(image_dimensions(self.book / "c.jpg"))
+
+    def test_best_candidate(self):
+        """Test named folder images win, then front covers, and duplicates are listed once"""
+        front = id3_tag([(b'APIC', apic(jpeg(1000, 1000)))])
+        for name in ("01.mp3", "02.mp3"):
+            (self.book / name).write_bytes(front + mp3_frames(10))
+        (self.book / "scan.jpg").write_bytes(jpeg(3000, 3000))
+        sources = sorted(self.book.glob("*.mp3"))
+
+        candidates = find_covers(self.book, sources)
+        self.assertEqual(len(candidates), 2)
+        self.assertEqual(best_cover(candidates)['path'], sources[0])
+
+        (self.book / "cover.png").write_bytes(png(500, 500))
+        self.assertEqual(best_cover(find_covers(self.book, sources))['path'].name, "cover.png")
+
+
+class TestCoverStage(unittest.TestCase):
+    """Test resizing and caching in the converter"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.config = write_config(root, "cover:\n  max_size_px: 1000\n  max_kb: 20\n  quality: 3\n")
+        self.converter = M4BConverter(self.config)
+        self.book = root / "audiobooks" / "Book"
+        self.book.mkdir(parents=True)
+        self.commands = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    async def fake_ffmpeg(self, cmd, cwd=None):
+        """Write an image that only fits the size limit at quality 11 or worse"""
+        self.commands.append(cmd)
+        quality = int(cmd[cmd.index("-q:v") + 1])
+        Path(cmd[-1]).write_bytes(jpeg(1000, 750, padding=40_000 if quality < 11 else 1_000))
+        return 0, ""
+
+    def find_cover(self, sources):
+        with patch('converter.shutil.which', return_value='/usr/bin/ffmpeg'), \
+                patch.object(self.converter, '_run_process', self.fake_ffmpeg):
+            return asyncio.run(self.converter._find_cover(self.book, sources))
+
+    def test_large_embedded_cover_is_resized_once(self):
+        """Test an oversized embedded picture is shrunk until it fits, then served from the cache"""
+        source = self.book / "01.mp3"
+        source.write_bytes(id3_tag([(b'APIC', apic(jpeg(4000, 3000, padding=100_000)))]) + mp3_frames(10))
+
+        cover = self.find_cover([source])
+        self.assertEqual(image_dimensions(cover), (1000, 750))
+        self.assertLessEqual(cover.stat().st_size, 20 * 1024)
+        self.assertEqual([cmd[cmd.index("-q:v") + 1] for cmd in self.commands], ["3", "7", "11"])
+        self.assertIn("force_original_aspect_ratio=decrease", self.commands[0][self.commands[0].index("-vf") + 1])
+
+        self.commands.clear()
+        self.assertEqual(self.find_cover([source]), cover)
+        self.assertEqual(self.commands, [])
+
+    def test_small_cover_is_used_unchanged(self):
+        """Test an image within the limits is cached without re-encoding"""
+        image = png(600, 600)
+        (self.book / "folder.png").write_bytes(image)
+        cover = self.find_cover([])
+        self.assertEqual(cover.read_bytes(), image)
+        self.assertEqual(cover.suffix, ".png")
+        self.assertEqual(self.commands, [])
+
+    def test_no_artwork(self):
+        """Test books without images get no cover"""
+        source = self.book / "01.mp3"
+        source.write_bytes(mp3_frames(10))
+        self.assertIsNone(self.find_cover([source]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for live diagnostics and the admin endpoints
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import diagnostics
+from main import ReadarrM4BServer, WebhookHandler
+from test_converter import write_config
+
+
+def busy_function(stop: threading.Event):
+    """Spin until stopped"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestDiagnostics(unittest.TestCase):
+    """Test profiling helpers"""
+
+    def setUp(self):
+        """Start an event loop in a background thread"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the event loop"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def test_sample_stacks_sees_busy_thread(self):
+        """Test collapsed stacks include a busy thread's function"""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_function, args=(stop,), name="busy")
+        worker.start()
+        try:
+            report = diagnostics.sample_stacks(0.2)
+        finally:
+            stop.set()
+            worker.join()
+        self.assertIn("busy;", report)
+        self.assertIn("busy_function", report)
+
+    def test_profile_loop(self):
+        """Test cProfile captures work on the loop thread"""
+        async def work():
+            for _ in range(20):
+                sum(range(10000))
+                await asyncio.sleep(0.01)
+
+        future = asyncio.run_coroutine_threadsafe(work(), self.loop)
+        report = diagnostics.profile_loop(self.loop, 0.1)
+        future.result()
+        self.assertIn("function calls", report)
+
+    def test_loop_report(self):
+        """Test lag and task count reporting"""
+        monitor = diagnostics.LoopLagMonitor(interval=0.01)
+        running = asyncio.run_coroutine_threadsafe(monitor.run(), self.loop)
+        time.sleep(0.1)
+        report = diagnostics.loop_report(self.loop, monitor)
+        running.cancel()
+        self.assertEqual(report['pending_tasks'], 1)
+        self.assertGreater(report['lag']['samples'], 0)
+
+    def test_memory_snapshots(self):
+        """Test tracemalloc start and diff reporting"""
+        snapshots = diagnostics.MemorySnapshots()
+        try:
+            self.assertIn('status', snapshots.report())
+            data = [bytearray(1024) for _ in range(100)]
+            report = snapshots.report(limit=5)
+            self.assertLessEqual(len(report['top']), 5)
+            self.assertTrue(report['diff'])
+            del data
+        finally:
+            import tracemalloc
+            tracemalloc.stop()
+
+
+class TestAdminEndpoints(unittest.TestCase):
+    """Test admin endpoint protection"""
+
+    def setUp(self):
+        """Start a server with admin endpoints enabled"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        (root / "audiobooks").mkdir()
+        config = write_config(root, "admin:\n  enabled: true\n  token: secret\n")
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self.server = ReadarrM4BServer(('127.0.0.1', 0), WebhookHandler, config, self.loop)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+        self.temp_dir.cleanup()
+
+    def _get(self, path, token=None):
+        request = urllib.request.Request(self.base + path)
+        if token:
+            request.add_header('X-Admin-Token', token)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def test_token_required(self):
+        """Test requests without the token are rejected"""
+        status, _ = self._get('/admin/loop')
+        self.assertEqual(status, 403)
+
+    def test_loop_endpoint(self):
+        """Test the loop endpoint returns JSON"""
+        status, body = self._get('/admin/loop', token='secret')
+        self.assertEqual(status, 200)
+        self.assertIn('pending_tasks', json.loads(body))
+
+    def test_blocked_loop_returns_partial_report(self):
+        """Test a loop that does not answer in time gives 503 instead of an error"""
+        self.loop.call_soon_threadsafe(time.sleep, 0.5)
+        with patch.object(diagnostics, 'LOOP_RESPONSE_TIMEOUT', 0.1):
+            status, body = self._get('/admin/loop', token='secret')
+        self.assertEqual(status, 503)
+        report = json.loads(body)
+        self.assertIsNone(report['pending_tasks'])
+        self.assertIn('lag', report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the coordinator/worker lease protocol
+"""
+
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from main import ReadarrM4BServer, WebhookHandler
+from scheduler import ConversionScheduler
+from test_converter import write_config
+
+COORDINATOR_CONFIG = """coordinator:
+  enabled: true
+  token: secret
+  lease_seconds: 5
+  run_local: false
+worker:
+  jobs: 1
+  poll_interval_seconds: 0.05
+"""
+
+# Worker process with a converter that only leaves a marker file
+WORKER_SCRIPT = """
+import asyncio, os, sys
+sys.path.insert(0, {src!r})
+from config import Config
+from distributed import Worker
+
+class MarkerConverter:
+    index = type('Index', (), {{'get': staticmethod(lambda path: None)}})()
+
+    async def convert_audiobook(self, book_path, metadata=None):
+        (book_path / f"done-{{os.getpid()}}").write_text("")
+        await asyncio.sleep(0.2)
+        return True
+
+asyncio.run(Worker(Config({config!r}), {url!r}, converter=MarkerConverter()).run())
+"""
+
+
+class TestLeases(unittest.TestCase):
+    """Test lease bookkeeping in the scheduler"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = write_config(Path(self.temp_dir.name), COORDINATOR_CONFIG)
+        self.scheduler = ConversionScheduler(self.config, converter=None)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_expired_lease_is_requeued(self):
+        """Test a job whose worker stops heartbeating goes to another worker"""
+        job = self.scheduler.submit(Path("/library/Author/Book"))
+        self.assertIs(self.scheduler.lease("worker-a", lease_seconds=0.01), job)
+        first_lease = job.lease_id
+        self.assertIsNone(self.scheduler.lease("worker-b", lease_seconds=10))
+
+        time.sleep(0.02)
+        self.scheduler._dispatch()
+        self.assertFalse(self.scheduler.renew(first_lease, 10))
+        self.assertIs(self.scheduler.lease("worker-b", lease_seconds=10), job)
+
+        # The late result of the first worker is discarded
+        self.assertIsNone(self.scheduler.finish_lease(first_lease, True))
+        self.assertTrue(self.scheduler.renew(job.lease_id, 10))
+        self.assertIs(self.scheduler.finish_lease(job.lease_id, True), job)
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(self.scheduler.status()['leased'], 0)
+
+
+class TestWorkerProcesses(unittest.TestCase):
+    """Test several worker processes against a local coordinator"""
+
+    def setUp(self):
+        """Start a coordinator"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / "audiobooks").mkdir()
+        self.config = write_config(self.root, COORDINATOR_CONFIG)
+        self.server = ReadarrM4BServer(('127.0.0.1', 0), WebhookHandler, self.config)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.workers = []
+
+    def tearDown(self):
+        """Stop workers and the coordinator"""
+        for worker in self.workers:
+            worker.kill()
+            worker.wait()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_workers_share_the_queue(self):
+        """Test every job runs exactly once across workers"""
+        books = []
+        for n in range(6):
+            book = self.root / "audiobooks" / "Author" / f"Book {n}"
+            book.mkdir(parents=True)
+            books.append(book)
+            self.server.scheduler.submit(book)
+
+        script = WORKER_SCRIPT.format(src=str(Path(__file__).parent.parent / "src"),
+                                      config=str(self.config.config_file), url=self.url)
+        for _ in range(3):
+            self.workers.append(subprocess.Popen([sys.executable, "-c", script], cwd=self.root,
+                                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            status = self.server.scheduler.status()
+            if not status['queued'] and not status['leased']:
+                break
+            time.sleep(0.05)
+        self.assertEqual((status['queued'], status['leased']), (0, 0))
+
+        markers = [list(book.glob("done-*")) for book in books]
+        self.assertTrue(all(len(found) == 1 for found in markers))
+        self.assertGreater(len({found[0].name for found in markers}), 1)
+
+    def test_token_required(self):
+        """Test lease requests need the worker token"""
+        from distributed import LeaseClient
+        with self.assertRaises(ConnectionError):
+            LeaseClient(self.url, token="wrong").lease("worker")
+        self.assertIsNone(LeaseClient(self.url, token="secret").lease("worker"))
+
+
+if __name__ == '__main__':
+    unittest.main()
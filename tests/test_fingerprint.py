@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for content fingerprints and the conversion index
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from conversion_index import ConversionIndex
+from fingerprint import book_signature, file_fingerprint
+
+
+def id3v2(payload: bytes) -> bytes:
+    """Build a minimal ID3v2 tag around payload"""
+    size = len(payload)
+    syncsafe = bytes([(size >> 21) & 0x7f, (size >> 14) & 0x7f, (size >> 7) & 0x7f, size & 0x7f])
+    return b'ID3\x04\x00\x00' + syncsafe + payload
+
+
+class TestFingerprint(unittest.TestCase):
+    """Test sampled fingerprints"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_tags_are_ignored(self):
+        """Test that the same audio with different tags matches"""
+        audio = os.urandom(4096)
+        first = self.root / "a.mp3"
+        second = self.root / "b.mp3"
+        first.write_bytes(id3v2(b'TPE1 Author') + audio)
+        second.write_bytes(id3v2(b'TPE1 Another Author') + audio + b'TAG' + bytes(125))
+
+        self.assertEqual(file_fingerprint(first), file_fingerprint(second))
+
+    def test_middle_sample_detects_changes(self):
+        """Test that a change in the middle of a large file is detected"""
+        audio = bytearray(os.urandom(1024 * 1024))
+        first = self.root / "a.mp3"
+        first.write_bytes(audio)
+        audio[len(audio) // 2] ^= 0xff
+        second = self.root / "b.mp3"
+        second.write_bytes(audio)
+
+        self.assertNotEqual(file_fingerprint(first), file_fingerprint(second))
+
+    def test_book_signature_ignores_file_names(self):
+        """Test that renamed copies of a book share a signature"""
+        first_book = self.root / "first"
+        second_book = self.root / "second"
+        first_book.mkdir()
+        second_book.mkdir()
+        chunks = [os.urandom(2048) for _ in range(3)]
+        for index, chunk in enumerate(chunks):
+            (first_book / f"{index:02d}.mp3").write_bytes(chunk)
+            (second_book / f"Chapter {3 - index}.mp3").write_bytes(chunk)
+
+        self.assertEqual(book_signature(first_book.glob("*.mp3")),
+                         book_signature(second_book.glob("*.mp3")))
+
+    def test_large_file_is_sampled(self):
+        """Test that fingerprinting does not read the whole file"""
+        large = self.root / "large.mp3"
+        with open(large, 'wb') as f:
+            f.truncate(1024 ** 3)
+
+        start = time.perf_counter()
+        file_fingerprint(large)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+class TestConversionIndex(unittest.TestCase):
+    """Test the conversion index"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.index = ConversionIndex(str(self.root / "index.db"))
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_find_by_signature(self):
+        """Test duplicate lookup skips the current book and missing outputs"""
+        output = self.root / "Book.m4b"
+        output.write_bytes(b"m4b")
+        self.index.record(self.root / "A", output, "sig", {'author_name': 'A', 'book_title': 'Book'})
+        self.index.record(self.root / "B", self.root / "missing.m4b", "sig")
+
+        match = self.index.find_by_signature("sig", exclude=self.root / "C")
+        self.assertEqual(match['output_path'], str(output))
+        self.assertIsNone(self.index.find_by_signature("sig", exclude=self.root / "A"))
+        self.assertIsNone(self.index.find_by_signature("other"))
+
+
+if __name__ == '__main__':
+    unittest.main()
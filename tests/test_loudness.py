@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for loudness analysis and normalization
+"""
+
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from checkpoint import JobCheckpoint
+from conversion_index import ConversionIndex
+from converter import M4BConverter
+from loudness import combine_loudness, normalization_gain, parse_ebur128
+from test_converter import write_config
+from test_mp4info import mp3_frames
+
+EBUR128_SUMMARY = """[Parsed_ebur128_0 @ 0x1] Summary:
+
+  Integrated loudness:
+    I:         {lufs} LUFS
+    Threshold: -33.1 LUFS
+
+  Loudness range:
+    LRA:         4.2 LU
+
+  True peak:
+    Peak:       {peak} dBFS
+"""
+
+
+class TestLoudnessHelpers(unittest.TestCase):
+    """Test parsing, combining and gain selection"""
+
+    def test_parse_summary(self):
+        """Test integrated loudness and true peak are read from the summary"""
+        self.assertEqual(parse_ebur128(EBUR128_SUMMARY.format(lufs=-23.4, peak=-3.0)), (-23.4, -3.0))
+        with self.assertRaises(ValueError):
+            parse_ebur128("no summary")
+
+    def test_combine_is_energy_weighted(self):
+        """Test equal loudness combines to itself and silent files are ignored"""
+        lufs, peak = combine_loudness([(100, -20.0, -4.0), (300, -20.0, -2.0), (50, -70.0, -60.0)])
+        self.assertAlmostEqual(lufs, -20.0)
+        self.assertEqual(peak, -2.0)
+        self.assertIsNone(combine_loudness([(10, -70.0, -70.0)]))
+
+    def test_gain_limits(self):
+        """Test the true peak ceiling, the gain limit and the dead band"""
+        def gain(lufs, peak):
+            return normalization_gain(lufs, peak, target=-18, max_true_peak=-1.5, max_gain=12, min_adjust=0.5)
+
+        self.assertEqual(gain(-24, -10), 6.0)
+        self.assertEqual(gain(-24, -3), 1.5)
+        self.assertEqual(gain(-40, -30), 12)
+        self.assertEqual(gain(-18.2, -9), 0.0)
+
+
+class TestNormalizedConversion(unittest.TestCase):
+    """Test the gain reaches the segment encode and the records"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.config = write_config(self.root, "loudness:\n  enabled: true\n  target_lufs: -18\n")
+        self.converter = M4BConverter(self.config)
+        self.book = self.root / "audiobooks" / "Book"
+        self.book.mkdir(parents=True)
+        self.sources = []
+        # Different lengths, so the files do not share an analysis cache entry
+        for name, frames in (("01.mp3", 100), ("02.mp3", 120)):
+            (self.book / name).write_bytes(mp3_frames(frames))
+            self.sources.append(self.book / name)
+        self.commands = []
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    async def fake_ffmpeg(self, cmd, cwd=None):
+        """Answer analysis passes and create encoded segments"""
+        self.commands.append(cmd)
+        if "ebur128=peak=true:framelog=quiet" in cmd:
+            return 0, EBUR128_SUMMARY.format(lufs=-24.0, peak=-10.0)
+        Path(cmd[-1]).write_bytes(b"segment")
+        return 0, ""
+
+    def test_gain_is_applied_in_the_encode(self):
+        """Test one analysis pass per file, a volume filter in the encode and caching"""
+        with patch.object(self.converter, '_run_process', self.fake_ffmpeg):
+            loudness = asyncio.run(self.converter._analyze_loudness(self.sources))
+            self.assertEqual(loudness, {'measured_lufs': -24.0, 'true_peak_db': -10.0, 'gain_db': 6.0,
+                                        'output_lufs': -18.0})
+
+            encoder = self.converter._encoder_settings(loudness['gain_db'])
+            checkpoint = JobCheckpoint(self.config.temp_dir, self.book, encoder)
+            checkpoint.load()
+            self.assertTrue(asyncio.run(self.converter._encode_segments(self.sources, checkpoint, None, encoder)))
+
+            # A second analysis is served from the cache
+            asyncio.run(self.converter._analyze_loudness(self.sources))
+
+        analyses = [cmd for cmd in self.commands if "ebur128=peak=true:framelog=quiet" in cmd]
+        encodes = [cmd for cmd in self.commands if "-c:a" in cmd]
+        self.assertEqual(len(analyses), 2)
+        self.assertEqual(len(encodes), 2)
+        self.assertTrue(all("volume=6.0dB" in cmd for cmd in encodes))
+        self.assertNotEqual(encoder, self.converter._encoder_settings())
+
+    def test_index_keeps_loudness(self):
+        """Test loudness is stored and an old database gains the columns"""
+        db_path = self.root / "old.db"
+        with sqlite3.connect(db_path) as db:
+            db.execute("CREATE TABLE books (book_directory TEXT PRIMARY KEY, output_path TEXT NOT NULL, "
+                       "signature TEXT, book_id INTEGER, author TEXT, title TEXT, converted_at REAL NOT NULL)")
+        db.close()
+        index = ConversionIndex(str(db_path))
+        loudness = {'measured_lufs': -24.0, 'true_peak_db': -10.0, 'gain_db': 6.0, 'output_lufs': -18.0}
+        index.record(self.book, self.book / "Book.m4b", "sig", None, loudness)
+        self.assertEqual(ConversionIndex.loudness(index.get(self.book)), loudness)
+
+        index.record(self.book, self.book / "Book.m4b", "sig")
+        self.assertIsNone(ConversionIndex.loudness(index.get(self.book)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for output verification and header parsing
+"""
+
+import struct
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from mp3info import mp3_duration
+from mp4info import inspect_m4b, verify_m4b
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    """Build an MP4 box"""
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def build_m4b(duration: float = 60.0, chapters=("One", "Two", "Three")) -> bytes:
+    """Build a minimal M4B with mvhd and Nero chapters"""
+    mvhd = box(b'mvhd', bytes(12) + struct.pack('>II', 1000, int(duration * 1000)) + bytes(80))
+    chpl_payload = b'\x01\x00\x00\x00' + bytes(4) + bytes([len(chapters)])
+    for index, title in enumerate(chapters):
+        encoded = title.encode()
+        chpl_payload += struct.pack('>QB', index * 10 * 10_000_000, len(encoded)) + encoded
+    moov = box(b'moov', mvhd + box(b'udta', box(b'chpl', chpl_payload)))
+    return box(b'ftyp', b'M4B \x00\x00\x02\x00') + moov + box(b'mdat', bytes(1000))
+
+
+def mp3_frames(count: int, xing_frames: int = 0) -> bytes:
+    """Build MPEG-1 Layer III 128 kbit/s 44.1 kHz frames"""
+    frame = b'\xff\xfb\x90\x00' + bytes(413)
+    data = frame * count
+    if xing_frames:
+        xing = b'Xing' + struct.pack('>II', 1, xing_frames)
+        data = frame[:36] + xing + data[36 + len(xing):]
+    return data
+
+
+class TestMP4Verification(unittest.TestCase):
+    """Test M4B structure checks"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "book.m4b"
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_inspect(self):
+        """Test duration and chapters are read"""
+        self.path.write_bytes(build_m4b())
+        info = inspect_m4b(self.path)
+
+        self.assertEqual(info['boxes'], ['ftyp', 'moov', 'mdat'])
+        self.assertAlmostEqual(info['duration'], 60.0)
+        self.assertEqual(info['chapter_count'], 3)
+        self.assertEqual(info['chapters'][1], (10.0, "Two"))
+
+    def test_valid_output_passes(self):
+        """Test a complete file passes verification"""
+        self.path.write_bytes(build_m4b())
+        self.assertEqual(verify_m4b(self.path, 59.0, 2.0, 3), [])
+
+    def test_truncated_output_fails(self):
+        """Test a truncated mdat is detected"""
+        self.path.write_bytes(build_m4b()[:-100])
+        problems = verify_m4b(self.path)
+        self.assertEqual(len(problems), 1)
+        self.assertIn("truncated", problems[0])
+
+    def test_missing_moov_fails(self):
+        """Test a file without moov is rejected"""
+        self.path.write_bytes(box(b'ftyp', b'M4B ') + box(b'mdat', bytes(100)))
+        self.assertIn("Missing moov box", verify_m4b(self.path))
+
+    def test_duration_and_chapter_mismatch(self):
+        """Test duration tolerance and chapter count checks"""
+        self.path.write_bytes(build_m4b())
+        problems = verify_m4b(self.path, 120.0, 5.0, 4)
+        self.assertEqual(len(problems), 2)
+
+
+class TestMP3Duration(unittest.TestCase):
+    """Test MP3 duration estimation"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "track.mp3"
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_cbr_duration(self):
+        """Test duration from bitrate and size"""
+        self.path.write_bytes(b'ID3\x04\x00\x00\x00\x00\x00\x05hello' + mp3_frames(100))
+        self.assertAlmostEqual(mp3_duration(self.path), 100 * 417 * 8 / 128000, places=3)
+
+    def test_xing_frame_count(self):
+        """Test duration from a Xing header"""
+        self.path.write_bytes(mp3_frames(10, xing_frames=1000))
+        self.assertAlmostEqual(mp3_duration(self.path), 1000 * 1152 / 44100, places=3)
+
+    def test_not_an_mp3(self):
+        """Test files without frames report zero"""
+        self.path.write_bytes(b'not audio at all')
+        self.assertEqual(mp3_duration(self.path), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the library report
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from main import report_library, run_cli
+from report import DirectoryTotalsCache, walk_library
+from test_converter import write_config
+from test_mp4info import mp3_frames
+
+
+class TestLibraryReport(unittest.TestCase):
+    """Test the walk, the mtime cache and the totals"""
+
+    def setUp(self):
+        """Set up a library with converted and pending books"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.config = write_config(self.root)
+        self.author = self.root / "audiobooks" / "Author"
+        for name, frames in (("Short", 500), ("Long", 2000)):
+            book = self.author / name
+            book.mkdir(parents=True)
+            (book / "01.mp3").write_bytes(mp3_frames(frames))
+        done = self.author / "Done"
+        done.mkdir()
+        (done / "Done.m4b").write_bytes(b"m" * 3000)
+        (done / "01.mp3").write_bytes(b"x" * 1000)
+        (done / "Old.m4b.failed").write_bytes(b"f" * 500)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_totals(self):
+        """Test counts, sizes, reclaimable space and pending book order"""
+        report = report_library(self.config, None)
+        self.assertEqual(report['converted_books'], 1)
+        self.assertEqual(report['pending_books'], 2)
+        self.assertEqual(report['m4b_bytes'], 3000)
+        self.assertEqual(report['mp3_bytes'], 1000 + 2500 * 417)
+        self.assertEqual(report['reclaimable_bytes'], 1500)
+        self.assertEqual([Path(book['path']).name for book in report['largest_pending']], ["Long", "Short"])
+        self.assertEqual([Path(book['path']).name for book in report['slowest_pending']], ["Long", "Short"])
+        self.assertAlmostEqual(report['largest_pending'][0]['audio_seconds'], 2000 * 1152 / 44100, delta=0.5)
+
+    def test_repeat_walk_is_incremental(self):
+        """Test unchanged directories come from the cache and changed ones are rescanned"""
+        cache = DirectoryTotalsCache(str(self.root / "report.json"))
+        cache.save(walk_library([str(self.root / "audiobooks")], cache))
+
+        cache = DirectoryTotalsCache(str(self.root / "report.json"))
+        cache.load()
+        entries = walk_library([str(self.root / "audiobooks")], cache)
+        self.assertTrue(all(entry['cached'] for entry in entries.values()))
+
+        short = self.author / "Short"
+        (short / "Short.m4b").write_bytes(b"m" * 100)
+        # Make the change visible on filesystems with coarse timestamps
+        os.utime(short, ns=(0, os.stat(short).st_mtime_ns + 1_000_000_000))
+        entries = walk_library([str(self.root / "audiobooks")], cache)
+        self.assertFalse(entries[str(short)]['cached'])
+        self.assertEqual(entries[str(short)]['m4b_bytes'], 100)
+        self.assertEqual(sum(not entry['cached'] for entry in entries.values()), 1)
+
+    def test_cli_json(self):
+        """Test --report --json prints the report as JSON"""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertTrue(asyncio.run(run_cli(self.config, ["main.py", "--report", "--json"])))
+        self.assertEqual(json.loads(output.getvalue())['pending_books'], 2)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            asyncio.run(run_cli(self.config, ["main.py", "--report", str(self.author / "Done")]))
+        self.assertIn("Books converted:   1", output.getvalue())
+        self.assertTrue(Path(self.config.report_cache_file).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for per-class process resource controls
+"""
+
+import asyncio
+import os
+import platform
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from resources import IOPRIO_SYSCALLS, ResourceControl, get_ioprio, ioprio_value, release_cgroup
+from scheduler import Job
+from test_converter import write_config
+
+
+class TestResourceControl(unittest.TestCase):
+    """Test profiles are applied to started processes and verified"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def run_process(self, control, job):
+        async def run():
+            process = await control.spawn(["sleep", "0.2"], job)
+            await process.wait()
+            return process
+        return asyncio.run(run())
+
+    def test_ioprio_encoding(self):
+        """Test class and level are packed like the kernel expects"""
+        self.assertEqual(ioprio_value('best-effort', 7), (2 << 13) | 7)
+        self.assertEqual(ioprio_value('idle', 5), 3 << 13)
+
+    def test_bulk_profile_is_applied(self):
+        """Test nice and I/O priority of a bulk job's process are set and reported"""
+        config = write_config(self.root, f"""scheduler:
+  cgroup_root: "{self.root / 'cgroup'}"
+  classes:
+    bulk:
+      nice: {min(os.getpriority(os.PRIO_PROCESS, 0) + 5, 19)}
+      io_class: best-effort
+      io_priority: 6
+""")
+        control = ResourceControl(config)
+        job = Job(self.root, source='scan')
+        self.run_process(control, job)
+
+        self.assertEqual(job.resources['nice'], config.scheduler_classes['bulk']['resources']['nice'])
+        if platform.machine() in IOPRIO_SYSCALLS:
+            self.assertTrue(job.resources['verified'], job.resources['errors'])
+            self.assertEqual((job.resources['io_class'], job.resources['io_priority']), ('best-effort', 6))
+        self.assertEqual(job.status()['resources'], job.resources)
+
+        # Interactive jobs have no profile and run as they are
+        interactive = Job(self.root)
+        self.run_process(control, interactive)
+        self.assertIsNone(interactive.resources)
+
+    def test_profile_is_inherited_by_children(self):
+        """Test processes the helper starts right away run with its profile too"""
+        nice = min(os.getpriority(os.PRIO_PROCESS, 0) + 5, 19)
+        config = write_config(self.root, f"""scheduler:
+  cgroup_root: "{self.root / 'cgroup'}"
+  classes:
+    bulk:
+      nice: {nice}
+      io_class: best-effort
+      io_priority: 6
+""")
+        control = ResourceControl(config)
+        job = Job(self.root, source='scan')
+
+        async def run():
+            process = await control.spawn(["sh", "-c", "sleep 0.3 & echo $!; wait"], job,
+                                          stdout=asyncio.subprocess.PIPE)
+            child = int(await process.stdout.readline())
+            observed = (os.getpriority(os.PRIO_PROCESS, child), get_ioprio(child))
+            await process.wait()
+            return observed
+        child_nice, child_ioprio = asyncio.run(run())
+
+        self.assertEqual(child_nice, nice)
+        if platform.machine() in IOPRIO_SYSCALLS:
+            self.assertEqual(child_ioprio, ('best-effort', 6))
+
+    def test_missing_cgroup_is_reported(self):
+        """Test a cgroup root that is not a cgroup v2 directory fails verification"""
+        config = write_config(self.root, f"""scheduler:
+  cgroup_root: "{self.root / 'not-a-cgroup'}"
+  classes:
+    bulk:
+      cpu_max: 1.5
+      memory_max_mb: 512
+""")
+        control = ResourceControl(config)
+        job = Job(self.root, source='scan')
+        self.run_process(control, job)
+
+        self.assertFalse(job.resources['verified'])
+        self.assertTrue(any("cgroup" in error for error in job.resources['errors']))
+        self.assertEqual((job.cgroup / "cpu.max").read_text(), "150000 100000")
+        self.assertEqual((job.cgroup / "memory.max").read_text(), str(512 * 1024 * 1024))
+        release_cgroup(job)
+        self.assertIsNone(job.cgroup)
+
+    def test_invalid_profiles(self):
+        """Test out of range values fail validation"""
+        config = write_config(self.root, """scheduler:
+  classes:
+    bulk:
+      nice: 25
+      io_class: lowest
+      io_priority: 9
+      memory_max_mb: 0
+""")
+        (self.root / "audiobooks").mkdir(exist_ok=True)
+        self.assertFalse(config.validate())
+
+
+if __name__ == '__main__':
+    unittest.main()
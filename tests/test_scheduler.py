@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Tests for the conversion scheduler
+"""
+
+import asyncio
+import datetime
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scheduler import ConversionScheduler, Job, in_windows
+from test_converter import write_config
+
+
+class FakeConverter:
+    """Converter that records concurrency per disk"""
+
+    def __init__(self, duration: float = 0.05):
+        self.duration = duration
+        self.active = {}
+        self.peak = {}
+        self.total_peak = 0
+        self.converted = []
+
+    async def convert_audiobook(self, book_path, metadata=None):
+        disk = book_path.parts[-2]
+        self.active[disk] = self.active.get(disk, 0) + 1
+        self.peak[disk] = max(self.peak.get(disk, 0), self.active[disk])
+        self.total_peak = max(self.total_peak, sum(self.active.values()))
+        await asyncio.sleep(self.duration)
+        self.active[disk] -= 1
+        self.converted.append(book_path)
+        return True
+
+
+def fake_device(path):
+    """Device id from the 'diskN' component of a path, scratch is device 0"""
+    for part in Path(path).parts:
+        if part.startswith('disk'):
+            return int(part[4:])
+    return 0
+
+
+class TestScheduler(unittest.TestCase):
+    """Test device-aware scheduling"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def _run(self, config, converter, books, source='webhook'):
+        async def scenario():
+            scheduler = ConversionScheduler(config, converter)
+            runner = asyncio.create_task(scheduler.run())
+            for book in books:
+                scheduler.submit(book, source=source)
+            await asyncio.wait_for(scheduler.drain(poll_interval=0.01), timeout=5)
+            runner.cancel()
+            return scheduler
+
+        with patch('scheduler.device_of', fake_device):
+            return asyncio.run(scenario())
+
+    def test_disks_run_in_parallel(self):
+        """Test per-device limits allow one job per disk at a time"""
+        config = write_config(self.root, "  jobs: 1\nscheduler:\n  per_device_jobs: 1\n  cpu_budget: 8\n")
+        config.scheduler_device_limits = {}
+        converter = FakeConverter()
+        # Scratch on its own device with a generous limit
+        books = [Path(f"/lib/disk{disk}/book{n}") for n in range(3) for disk in (1, 2)]
+        config.temp_dir = "/scratch"
+
+        with patch.object(ConversionScheduler, 'device_limit',
+                          lambda self, device: 10 if device == 0 else 1):
+            self._run(config, converter, books)
+
+        self.assertEqual(len(converter.converted), 6)
+        self.assertEqual(converter.peak, {'disk1': 1, 'disk2': 1})
+        self.assertEqual(converter.total_peak, 2)
+
+    def test_cpu_budget_is_shared(self):
+        """Test the global CPU budget caps concurrent jobs across disks"""
+        config = write_config(self.root, "  jobs: 4\nscheduler:\n  per_device_jobs: 10\n  cpu_budget: 8\n")
+        converter = FakeConverter()
+        books = [Path(f"/lib/disk{disk}/book") for disk in range(1, 5)]
+
+        scheduler = self._run(config, converter, books)
+
+        self.assertEqual(converter.total_peak, 2)
+        self.assertEqual(scheduler.status()['queued'], 0)
+
+
+class TestJobClasses(unittest.TestCase):
+    """Test interactive and bulk job classes"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.config = write_config(self.root, "  jobs: 4\nscheduler:\n  per_device_jobs: 10\n  cpu_budget: 8\n")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_bulk_leaves_reserved_capacity(self):
+        """Test bulk jobs cannot use the interactive reserve"""
+        converter = FakeConverter()
+
+        async def scenario():
+            scheduler = ConversionScheduler(self.config, converter)
+            runner = asyncio.create_task(scheduler.run())
+            for n in range(3):
+                scheduler.submit(Path(f"/lib/disk1/bulk{n}"), source='scan')
+            await asyncio.sleep(0.01)
+            webhook = scheduler.submit(Path("/lib/disk2/new"))
+            await asyncio.sleep(0.01)
+            states = {job['id']: job['state'] for job in scheduler.status()['jobs']}
+            await scheduler.drain(poll_interval=0.01)
+            runner.cancel()
+            return states[webhook.id]
+
+        with patch('scheduler.device_of', fake_device):
+            webhook_state = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+        # The webhook job starts while bulk jobs are still queued
+        self.assertEqual(webhook_state, 'running')
+        self.assertEqual(converter.peak['disk1'], 1)
+        self.assertEqual(len(converter.converted), 4)
+
+    def test_bulk_waits_outside_window(self):
+        """Test bulk jobs are not started outside their window"""
+        converter = FakeConverter()
+
+        async def scenario():
+            scheduler = ConversionScheduler(self.config, converter)
+            runner = asyncio.create_task(scheduler.run())
+            scheduler.submit(Path("/lib/disk1/bulk"), source='watch')
+            scheduler.submit(Path("/lib/disk2/new"))
+            await asyncio.sleep(0.2)
+            runner.cancel()
+            return scheduler.status()
+
+        with patch('scheduler.device_of', fake_device), \
+                patch.object(ConversionScheduler, 'in_window', lambda self, job_class: job_class != 'bulk'):
+            status = asyncio.run(scenario())
+
+        self.assertEqual(converter.converted, [Path("/lib/disk2/new")])
+        self.assertEqual(status['queued'], 1)
+        self.assertEqual(status['jobs'][0]['class'], 'bulk')
+
+    def test_duplicate_submit_returns_active_job(self):
+        """Test a book already queued or running is not queued again for the same action"""
+        config = write_config(self.root, "  jobs: 1\nscheduler:\n  cpu_budget: 8\n")
+        converter = FakeConverter(duration=0.1)
+
+        async def scenario():
+            scheduler = ConversionScheduler(config, converter)
+            first = scheduler.submit(Path("/lib/disk1/book"))
+            queued_again = scheduler.submit(Path("/lib/disk1/book"))
+            retag = scheduler.submit(Path("/lib/disk1/book"), action='retag')
+            runner = asyncio.create_task(scheduler.run())
+            await asyncio.sleep(0.05)
+            running_again = scheduler.submit(Path("/lib/disk1/book"))
+            runner.cancel()
+            return first, queued_again, retag, running_again
+
+        with patch('scheduler.device_of', fake_device):
+            first, queued_again, retag, running_again = asyncio.run(scenario())
+
+        self.assertIs(queued_again, first)
+        self.assertIs(running_again, first)
+        self.assertIsNot(retag, first)
+
+    def test_pause_stops_process_group(self):
+        """Test pausing a bulk job stops its helper processes and resuming continues them"""
+        process = subprocess.Popen(["sleep", "10"], start_new_session=True)
+        try:
+            job = Job(Path("/lib/disk1/bulk"), source='scan')
+            job.processes.add(process)
+            scheduler = ConversionScheduler(self.config, FakeConverter())
+            scheduler._running[job.id] = job
+
+            scheduler._apply_window('bulk', allowed=False)
+            self.assertTrue(job.paused)
+            self.assertEqual(self._process_state(process.pid, 'T'), 'T')
+
+            scheduler._apply_window('bulk', allowed=True)
+            self.assertFalse(job.paused)
+            self.assertEqual(self._process_state(process.pid, 'S'), 'S')
+        finally:
+            process.kill()
+            process.wait()
+
+    def _process_state(self, pid, expected=None):
+        """Process state letter from /proc, waiting briefly for the expected one"""
+        for _ in range(100):
+            with open(f"/proc/{pid}/stat") as f:
+                state = f.read().rsplit(')', 1)[1].split()[0]
+            if expected is None or state == expected:
+                break
+            time.sleep(0.01)
+        return state
+
+    def test_windows_wrap_midnight(self):
+        """Test overnight windows"""
+        windows = ["22:00-06:00"]
+        self.assertTrue(in_windows(windows, datetime.datetime(2024, 1, 1, 23, 30)))
+        self.assertTrue(in_windows(windows, datetime.datetime(2024, 1, 1, 5, 59)))
+        self.assertFalse(in_windows(windows, datetime.datetime(2024, 1, 1, 12, 0)))
+        self.assertTrue(in_windows([], datetime.datetime(2024, 1, 1, 12, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
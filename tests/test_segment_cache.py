@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the encoded segment cache
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from segment_cache import SegmentCache
+
+
+class TestSegmentCache(unittest.TestCase):
+    """Test segment cache behaviour"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_key_includes_encoder_settings(self):
+        """Test that different settings produce different keys"""
+        source = self.root / "a.mp3"
+        source.write_bytes(b"audio")
+        cache = SegmentCache(str(self.root / "cache"), 1024)
+
+        self.assertNotEqual(cache.key(source, {'audio_codec': 'aac'}),
+                            cache.key(source, {'audio_codec': 'libfdk_aac'}))
+
+    def test_key_covers_unsampled_audio(self):
+        """Test files of one size differing only between fingerprint samples get different keys"""
+        first = self.root / "first.mp3"
+        second = self.root / "second.mp3"
+        data = bytearray(1024 * 1024)
+        first.write_bytes(bytes(data))
+        data[100 * 1024] = 1
+        second.write_bytes(bytes(data))
+        cache = SegmentCache(str(self.root / "cache"), 1024)
+
+        encoder = {'audio_codec': 'aac'}
+        self.assertNotEqual(cache.key(first, encoder), cache.key(second, encoder))
+
+        # Tags still do not change the key
+        tagged = self.root / "tagged.mp3"
+        tagged.write_bytes(b"ID3\x03\x00\x00\x00\x00\x00\x0a" + bytes(10) + bytes(data))
+        self.assertEqual(cache.key(tagged, encoder), cache.key(second, encoder))
+
+    def test_store_and_fetch(self):
+        """Test a stored segment is returned on a later fetch"""
+        cache = SegmentCache(str(self.root / "cache"), 1024)
+        segment = self.root / "seg.m4b"
+        segment.write_bytes(b"encoded")
+        dest = self.root / "out.m4b"
+
+        self.assertFalse(cache.fetch("ab" * 20, dest))
+        cache.store("ab" * 20, segment)
+        self.assertTrue(cache.fetch("ab" * 20, dest))
+        self.assertEqual(dest.read_bytes(), b"encoded")
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first"""
+        cache = SegmentCache(str(self.root / "cache"), 250)
+        keys = ["aa" * 20, "bb" * 20, "cc" * 20]
+        for index, key in enumerate(keys):
+            segment = self.root / f"seg{index}.m4b"
+            segment.write_bytes(bytes(100))
+            cache.store(key, segment)
+            os.utime(cache._entry_path(key), (index, index))
+            if index == 1:
+                # Touch the first entry so the second becomes the oldest
+                os.utime(cache._entry_path(keys[0]), (5, 5))
+
+        self.assertTrue(cache._entry_path(keys[0]).exists())
+        self.assertFalse(cache._entry_path(keys[1]).exists())
+        self.assertTrue(cache._entry_path(keys[2]).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
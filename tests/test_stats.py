@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for conversion statistics, the throughput model and --plan
+"""
+
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from main import plan_books
+from scheduler import ConversionScheduler
+from stats import DEFAULT_REALTIME_FACTOR, StatsStore, conversion_settings, plan
+from test_converter import write_config
+from test_mp4info import mp3_frames
+
+SETTINGS = {'audio_codec': 'aac', 'pipeline': 'segments', 'jobs': 4}
+
+
+class TestThroughputModel(unittest.TestCase):
+    """Test the per-host model built from recorded conversions"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = str(Path(self.temp_dir.name) / "stats.db")
+        self.store = StatsStore(self.db, host="host-a")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_realtime_factor_per_setting(self):
+        """Test rates are ratios of sums over each setting's conversions"""
+        self.store.record(SETTINGS, input_seconds=3600, input_bytes=1000, output_bytes=500,
+                          wall_seconds=60, cpu_seconds=200)
+        self.store.record(SETTINGS, input_seconds=1800, input_bytes=500, output_bytes=250,
+                          wall_seconds=30, cpu_seconds=100)
+        self.store.record({**SETTINGS, 'jobs': 1}, input_seconds=600, input_bytes=100, output_bytes=50,
+                          wall_seconds=60, cpu_seconds=55)
+
+        model = self.store.model()
+        rate = model.rate(SETTINGS)
+        self.assertAlmostEqual(rate['realtime_factor'], 60.0)
+        self.assertAlmostEqual(rate['output_ratio'], 0.5)
+        self.assertEqual(rate['conversions'], 2)
+        self.assertAlmostEqual(model.rate({**SETTINGS, 'jobs': 1})['realtime_factor'], 10.0)
+
+        estimate = model.estimate(SETTINGS, input_bytes=2000, input_seconds=7200)
+        self.assertAlmostEqual(estimate['wall_seconds'], 120.0)
+        self.assertEqual(estimate['output_bytes'], 1000)
+        self.assertEqual(estimate['scratch_bytes'], 2000)
+        self.assertTrue(estimate['measured'])
+
+    def test_model_is_per_host(self):
+        """Test another host's conversions do not count"""
+        StatsStore(self.db, host="host-b").record(SETTINGS, 3600, 1000, 500, 10, 10)
+        estimate = self.store.model().estimate(SETTINGS, input_bytes=0, input_seconds=3600)
+        self.assertFalse(estimate['measured'])
+        self.assertAlmostEqual(estimate['wall_seconds'], 3600 / DEFAULT_REALTIME_FACTOR)
+
+    def test_plan_makespan_and_scratch(self):
+        """Test books are packed onto slots and the largest overlap for scratch"""
+        estimates = [{'wall_seconds': s, 'output_bytes': s, 'scratch_bytes': s * 2, 'measured': True}
+                     for s in (40, 30, 20, 10)]
+        result = plan(estimates, slots=2)
+        self.assertEqual(result['wall_seconds'], 50)
+        self.assertEqual(result['output_bytes'], 100)
+        self.assertEqual(result['peak_scratch_bytes'], 140)
+
+
+class TestSchedulerEstimates(unittest.TestCase):
+    """Test the scheduler orders and times jobs with the model"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.config = write_config(self.root, "  jobs: 4\nscheduler:\n  cpu_budget: 4\n")
+        StatsStore(self.config.database_file).record(
+            conversion_settings(self.config, 4), input_seconds=1000, input_bytes=1000, output_bytes=1000,
+            wall_seconds=1, cpu_seconds=1)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_bulk_shortest_first_with_eta(self):
+        """Test bulk jobs run shortest first and ETAs accumulate per slot"""
+        scheduler = ConversionScheduler(self.config, converter=None)
+        sizes = {'Long': 3000, 'Short': 1000, 'Middle': 2000}
+        for name, size in sizes.items():
+            scheduler.submit(self.root / name, {'book_files': [{'path': f'/x/{name}.mp3', 'size': size}]},
+                             source='bulk')
+
+        before = time.time()
+        status = scheduler.status()
+        names = [Path(job['book_path']).name for job in status['jobs']]
+        self.assertEqual(names, ['Short', 'Middle', 'Long'])
+        self.assertEqual([job['estimated_seconds'] for job in status['jobs']], [1.0, 2.0, 3.0])
+        self.assertAlmostEqual(status['queue_eta'] - before, 6.0, delta=0.5)
+
+    def test_unsized_jobs_are_measured(self):
+        """Test jobs without sizes are sized from their directory"""
+        book = self.root / "Book"
+        book.mkdir()
+        (book / "01.mp3").write_bytes(bytes(5000))
+        scheduler = ConversionScheduler(self.config, converter=None)
+        job = scheduler.submit(book, source='scan')
+        self.assertIsNone(job.estimate)
+
+        self.assertFalse(scheduler._measure_pending())
+        self.assertEqual(job.input_bytes, 5000)
+        self.assertAlmostEqual(job.estimate, 5.0)
+
+
+class TestPlan(unittest.TestCase):
+    """Test the --plan estimate"""
+
+    def test_plan_library(self):
+        """Test a library walk with default rates"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            config = write_config(root, ("  jobs: 2\nscheduler:\n  cpu_budget: 4\n  reserved_interactive_cpu: 0\n"
+                                         "  classes:\n    bulk:\n      max_jobs: 2\n"))
+            for name in ("One", "Two"):
+                book = root / "audiobooks" / "Author" / name
+                book.mkdir(parents=True)
+                (book / "01.mp3").write_bytes(mp3_frames(1000))
+            (root / "audiobooks" / "Author" / "Done").mkdir()
+            (root / "audiobooks" / "Author" / "Done" / "Done.m4b").write_bytes(b"")
+
+            result = plan_books(config, '--scan')
+
+        self.assertEqual(result['books'], 2)
+        self.assertEqual(result['slots'], 2)
+        self.assertAlmostEqual(result['input_seconds'], 2 * 1000 * 1152 / 44100, delta=0.5)
+        self.assertAlmostEqual(result['wall_seconds'], result['input_seconds'] / 2 / DEFAULT_REALTIME_FACTOR)
+        self.assertFalse(result['measured'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for job tracing
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+    """Test span recording and export"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = SimpleNamespace(tracing_enabled=True, tracing_dir=self.temp_dir.name,
+                                      tracing_otlp=True, tracing_otlp_endpoint=None)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_disabled_tracing_is_a_no_op(self):
+        """Test spans outside a job trace record nothing"""
+        self.assertIs(tracing.span("anything"), tracing.span("other"))
+        self.config.tracing_enabled = False
+
+        async def job():
+            async with tracing.job_trace(self.config, "Book") as trace:
+                self.assertIsNone(trace)
+                with tracing.span("work"):
+                    pass
+
+        asyncio.run(job())
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [])
+
+    def test_nested_spans_and_phases(self):
+        """Test parents, phases and both export formats"""
+        async def job():
+            async with tracing.job_trace(self.config, "Author: Book") as trace:
+                await phases()
+            return trace
+
+        async def phases():
+            with tracing.span("convert"):
+                with tracing.span("stability"):
+                    await asyncio.sleep(0)
+                with tracing.span("m4b_tool"):
+                    trace = tracing.current_trace()
+                    trace.set_phase("m4b-tool", "encode")
+                    trace.set_phase("m4b-tool", "encode")
+                    trace.set_phase("m4b-tool", "tag")
+                    trace.end_phase("m4b-tool")
+
+        trace = asyncio.run(job())
+
+        spans = {span['name']: span for span in trace.spans}
+        self.assertEqual(len(trace.spans), 5)
+        self.assertIsNone(spans['convert']['parent_id'])
+        self.assertEqual(spans['stability']['parent_id'], spans['convert']['span_id'])
+        self.assertEqual(spans['encode']['parent_id'], spans['m4b_tool']['span_id'])
+        self.assertEqual(spans['tag']['parent_id'], spans['m4b_tool']['span_id'])
+
+        chrome_file = next(Path(self.temp_dir.name).glob("*.trace.json"))
+        events = json.loads(chrome_file.read_text())['traceEvents']
+        self.assertEqual(len([e for e in events if e['ph'] == 'X']), 5)
+
+        otlp_file = next(Path(self.temp_dir.name).glob("*.otlp.json"))
+        otlp = json.loads(otlp_file.read_text())
+        self.assertEqual(len(otlp['resourceSpans'][0]['scopeSpans'][0]['spans']), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
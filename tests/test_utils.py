@@ -3,6 +3,9 @@
 Tests for utility functions
 """
 
+import gzip
+import json
+import logging
 import sys
 import tempfile
 import unittest
@@ -11,7 +14,8 @@ from pathlib import Path
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from utils import sanitize_filename, format_duration, format_size, get_directory_size
+from utils import sanitize_filename, format_duration, format_size, get_directory_size, natural_sort_key
+from utils import setup_logging, stop_logging
 
 
 class TestUtils(unittest.TestCase):
@@ -71,6 +75,12 @@ class TestUtils(unittest.TestCase):
                 result = format_size(size_bytes)
                 self.assertEqual(result, expected)
     
+    def test_natural_sort_key(self):
+        """Test numbers in names sort by value"""
+        paths = [Path("CD10/1.mp3"), Path("CD2/10.mp3"), Path("CD2/2.mp3"), Path("Intro.mp3")]
+        self.assertEqual(sorted(paths, key=natural_sort_key),
+                         [Path("CD2/2.mp3"), Path("CD2/10.mp3"), Path("CD10/1.mp3"), Path("Intro.mp3")])
+    
     def test_get_directory_size(self):
         """Test directory size calculation"""
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -104,5 +114,61 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(size, 0)
 
 
+
+class TestLogging(unittest.TestCase):
+    """Test the queue-based logging pipeline"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+    
+    def tearDown(self):
+        """Restore default logging"""
+        stop_logging()
+        logging.getLogger().handlers.clear()
+        self.temp_dir.cleanup()
+    
+    def test_files_and_webhook_split(self):
+        """Test records reach the main, JSON and webhook logs"""
+        log_file = self.root / "main.log"
+        json_file = self.root / "main.jsonl"
+        webhook_file = self.root / "webhook.log"
+        setup_logging("INFO", str(log_file), webhook_log_file=str(webhook_file), json_file=str(json_file))
+        
+        logging.getLogger('converter').info("converting")
+        logging.getLogger('webhook').info("received")
+        logging.getLogger('webhook.requests').info("raw dump")
+        stop_logging()
+        
+        main_log = log_file.read_text()
+        self.assertIn("converting", main_log)
+        self.assertIn("received", main_log)
+        self.assertNotIn("raw dump", main_log)
+        
+        webhook_log = webhook_file.read_text()
+        self.assertNotIn("converting", webhook_log)
+        self.assertIn("received", webhook_log)
+        self.assertIn("raw dump", webhook_log)
+        
+        entries = [json.loads(line) for line in json_file.read_text().splitlines()]
+        self.assertEqual(entries[0]['logger'], 'converter')
+        self.assertEqual(entries[0]['message'], 'converting')
+    
+    def test_rotation_compresses(self):
+        """Test rotated files are gzipped"""
+        log_file = self.root / "main.log"
+        setup_logging("INFO", str(log_file), max_bytes=200, backup_count=2)
+        
+        for index in range(20):
+            logging.getLogger('converter').info(f"line {index} " + "x" * 50)
+        stop_logging()
+        
+        rotated = self.root / "main.log.1.gz"
+        self.assertTrue(rotated.exists())
+        self.assertIn(b"line", gzip.decompress(rotated.read_bytes()))
+        self.assertFalse((self.root / "main.log.3.gz").exists())
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2) 
\ No newline at end of file
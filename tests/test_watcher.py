@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for watch-folder ingestion
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scheduler import ConversionScheduler
+from test_converter import write_config
+from watcher import BookWatcher, DirectoryPoller, directory_state
+
+
+class FakeScheduler:
+    """Scheduler that records submissions"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, book_path, metadata=None, source='webhook'):
+        self.submitted.append((book_path, source))
+
+
+class TestDirectoryPoller(unittest.TestCase):
+    """Test incremental polling"""
+
+    def setUp(self):
+        """Set up a library tree"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / "Author" / "Book").mkdir(parents=True)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def test_only_changed_directories_are_reported(self):
+        """Test the first pass reports everything and later passes only changes"""
+        poller = DirectoryPoller(self.root)
+        self.assertEqual(len(poller.scan()), 3)
+        self.assertEqual(poller.scan(), [])
+
+        book = self.root / "Author" / "Book"
+        (book / "01.mp3").write_bytes(b"x")
+        os.utime(book, ns=(0, 1))
+        self.assertEqual(poller.scan(), [book])
+
+    def test_directory_state(self):
+        """Test books with an M4B are not pending"""
+        book = self.root / "Author" / "Book"
+        self.assertEqual(directory_state(book), ())
+        (book / "01.MP3").write_bytes(b"x")
+        self.assertEqual(len(directory_state(book)), 1)
+        (book / "Book.m4b").write_bytes(b"x")
+        self.assertIsNone(directory_state(book))
+
+
+class TestBookWatcher(unittest.TestCase):
+    """Test debouncing and submission"""
+
+    def setUp(self):
+        """Set up a watcher in poll mode"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        (root / "audiobooks").mkdir()
+        self.book = root / "audiobooks" / "Author" / "Book"
+        self.book.mkdir(parents=True)
+        self.config = write_config(root, "watch:\n  mode: poll\n  debounce_seconds: 0\n")
+        self.scheduler = FakeScheduler()
+        self.watcher = BookWatcher(self.config, self.scheduler)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+
+    def _settle(self):
+        for path in self.watcher._settle():
+            self.watcher._submit(path)
+
+    def test_polled_book_is_submitted_once_stable(self):
+        """Test polled directories need one unchanged check before submission"""
+        (self.book / "01.mp3").write_bytes(b"x")
+        self.watcher._poll()
+
+        self._settle()
+        self.assertEqual(self.scheduler.submitted, [])
+
+        # Growing file restarts the wait
+        (self.book / "01.mp3").write_bytes(b"xx")
+        self._settle()
+        self.assertEqual(self.scheduler.submitted, [])
+
+        self._settle()
+        self.assertEqual(self.scheduler.submitted, [(self.book, 'watch')])
+
+    def test_event_touch_submits_when_quiet(self):
+        """Test event-driven directories are submitted once quiet"""
+        (self.book / "01.mp3").write_bytes(b"x")
+        self.watcher.touch(self.book)
+        self.watcher.touch(self.book.parent)
+        self._settle()
+        self.assertEqual(self.scheduler.submitted, [(self.book, 'watch')])
+
+    def test_queued_book_is_not_queued_again(self):
+        """Test the scheduler drops a resubmitted book that is still queued"""
+        scheduler = ConversionScheduler(self.config, None)
+        self.watcher.scheduler = scheduler
+        (self.book / "01.mp3").write_bytes(b"x")
+        for _ in range(2):
+            self.watcher.touch(self.book)
+            self._settle()
+        self.assertEqual(scheduler.status()['queued'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Tests for the webhook server
+"""
+
+import asyncio
+import http.client
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from main import ReadarrM4BServer, WebhookHandler
+from ratelimit import TokenBucketLimiter
+from test_converter import write_config
+
+
+def import_payload(n: int = 0) -> dict:
+    """Readarr Import payload for one book"""
+    return {
+        'eventType': 'Download',
+        'author': {'name': 'Author', 'path': '/library/Author'},
+        'book': {'id': n, 'title': f'Book {n}'},
+        'bookFiles': [{'path': f'/library/Author/Book {n}/01.mp3', 'size': 10}],
+    }
+
+
+class WebhookServerTestCase(unittest.TestCase):
+    """Start a webhook server whose scheduler never runs jobs"""
+
+    extra_config = ""
+
+    def setUp(self):
+        """Start the server"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        (root / "audiobooks").mkdir()
+        config = write_config(root, f"webhook:\n  json_file: \"{root / 'webhook.json'}\"\n{self.extra_config}")
+        self.server = ReadarrM4BServer(('127.0.0.1', 0), WebhookHandler, config)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def request(self, path: str, data: bytes = None, content_type: str = 'application/json'):
+        """Send a request and return (status, headers, parsed body)"""
+        request = urllib.request.Request(self.base + path, data=data)
+        if data is not None:
+            request.add_header('Content-Type', content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, response.headers, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, json.loads(e.read())
+
+    def post(self, payload, path: str = '/'):
+        """POST a JSON payload"""
+        return self.request(path, json.dumps(payload).encode())
+
+
+class TestBackpressure(WebhookServerTestCase):
+    """Test queue depth limits, rate limits and /health"""
+
+    extra_config = "  max_queue_depth: 2\n  rate_limit_per_minute: 0\n"
+
+    def test_full_queue_returns_429(self):
+        """Test requests beyond the maximum queue depth are refused"""
+        self.assertEqual(self.post(import_payload(1))[0], 202)
+        self.assertEqual(self.post(import_payload(2))[0], 202)
+
+        status, headers, body = self.post(import_payload(3))
+        self.assertEqual(status, 429)
+        self.assertEqual(headers['Retry-After'], '60')
+        self.assertEqual(body['queued'], 2)
+
+    def test_health_reports_saturation(self):
+        """Test /health reports a full queue without failing the check"""
+        status, _, body = self.request('/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['status'], 'ok')
+
+        self.post(import_payload(1))
+        self.post(import_payload(2))
+        status, _, body = self.request('/health')
+        self.assertEqual(status, 200)
+        self.assertEqual((body['status'], body['saturated']), ('saturated', True))
+        self.assertEqual(body['saturation'], 1.0)
+
+    def test_health_fails_without_event_loop(self):
+        """Test /health returns 503 once the loop running the jobs has stopped"""
+        self.server._event_loop = asyncio.new_event_loop()
+        try:
+            status, _, body = self.request('/health')
+        finally:
+            self.server._event_loop.close()
+        self.assertEqual(status, 503)
+        self.assertEqual(body['status'], 'unhealthy')
+
+
+class TestRateLimit(WebhookServerTestCase):
+    """Test the per-client rate limit"""
+
+    extra_config = "  rate_limit_per_minute: 1\n  rate_limit_burst: 2\n"
+
+    def test_burst_then_429(self):
+        """Test a client is limited after its burst"""
+        self.assertEqual(self.post(import_payload(1))[0], 202)
+        self.assertEqual(self.post(import_payload(2))[0], 202)
+        status, headers, _ = self.post(import_payload(3))
+        self.assertEqual(status, 429)
+        self.assertGreater(int(headers['Retry-After']), 50)
+
+    def test_limiter_refills(self):
+        """Test tokens refill at the configured rate"""
+        limiter = TokenBucketLimiter(rate_per_minute=60, burst=1)
+        self.assertEqual(limiter.acquire('a'), 0)
+        self.assertAlmostEqual(limiter.acquire('a'), 1.0, delta=0.1)
+        self.assertEqual(limiter.acquire('b'), 0)
+
+    def test_idle_buckets_are_pruned(self):
+        """Test refilled buckets are dropped even if no request is ever refused"""
+        limiter = TokenBucketLimiter(rate_per_minute=6000, burst=1)
+        for n in range(100):
+            limiter.acquire(f"client{n}")
+        time.sleep(0.05)
+        limiter.acquire('late')
+        self.assertEqual(list(limiter._buckets), ['late'])
+
+
+class TestBulkEnqueue(WebhookServerTestCase):
+    """Test the bulk endpoint"""
+
+    extra_config = "  max_queue_depth: 0\n  rate_limit_per_minute: 0\n"
+
+    def setUp(self):
+        """Create book directories"""
+        super().setUp()
+        self.books = []
+        for name in ("One", "Two", "Three"):
+            book = Path(self.temp_dir.name) / "audiobooks" / "Author" / name
+            book.mkdir(parents=True)
+            self.books.append(str(book))
+
+    def test_mixed_items(self):
+        """Test per-item results for paths, payloads and invalid items"""
+        converted = Path(self.books[2]) / "Book.m4b"
+        converted.write_bytes(b"m4b")
+        self.server.converter.index.record(Path(self.books[2]), converted, None)
+
+        items = [self.books[0], {'path': self.books[0]}, {'path': self.books[1]}, self.books[2],
+                 "/does/not/exist", import_payload(5), 42]
+        status, _, body = self.post(items, '/bulk')
+
+        self.assertEqual(status, 202)
+        statuses = [result['status'] for result in body['results']]
+        self.assertEqual(statuses, ['queued', 'duplicate', 'queued', 'duplicate', 'invalid', 'queued', 'invalid'])
+        self.assertEqual(body['results'][3]['reason'], 'converted')
+        self.assertEqual(self.server.scheduler.queue_depth(), 3)
+        self.assertEqual(self.server.scheduler.status()['jobs'][0]['class'], 'bulk')
+
+        # A second batch sees the queued books
+        _, _, body = self.post([self.books[0]], '/bulk')
+        self.assertEqual(body['results'][0], {'status': 'duplicate', 'reason': 'queued'})
+
+    def test_ndjson(self):
+        """Test streamed NDJSON with an invalid line"""
+        data = f'"{self.books[0]}"\n{{not json\n\n{json.dumps(import_payload(1))}\n'.encode()
+        status, _, body = self.request('/bulk', data, 'application/x-ndjson')
+        self.assertEqual(status, 202)
+        self.assertEqual(body['counts'], {'queued': 2, 'invalid': 1})
+
+    def test_chunked_body(self):
+        """Test a chunked NDJSON body is decoded and a body without length is refused"""
+        lines = [f'"{self.books[0]}"\n', f'"{self.books[1]}"\n{json.dumps(import_payload(1))}', '\n']
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=10)
+        connection.request('POST', '/bulk', body=(line.encode() for line in lines),
+                           headers={'Content-Type': 'application/x-ndjson'}, encode_chunked=True)
+        response = connection.getresponse()
+        self.assertEqual(response.status, 202)
+        self.assertEqual(json.loads(response.read())['counts'], {'queued': 3})
+        connection.close()
+
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=10)
+        connection.putrequest('POST', '/bulk')
+        connection.putheader('Content-Type', 'application/json')
+        connection.endheaders()
+        response = connection.getresponse()
+        self.assertEqual(response.status, 411)
+        connection.close()
+
+    def test_ten_thousand_items(self):
+        """Test a large batch is queued in well under a second"""
+        items = [import_payload(n) for n in range(10000)]
+        data = json.dumps(items).encode()
+        handle_bulk = WebhookHandler._handle_bulk
+        elapsed = []
+
+        # Time the handler itself, without the HTTP round trip
+        def timed(handler):
+            start = time.monotonic()
+            handle_bulk(handler)
+            elapsed.append(time.monotonic() - start)
+
+        with patch.object(WebhookHandler, '_handle_bulk', timed):
+            status, _, body = self.request('/bulk', data)
+
+        self.assertEqual(status, 202)
+        self.assertEqual(body['counts'], {'queued': 10000})
+        self.assertLess(elapsed[0], 1.0)
+
+
+class TestBulkQueueLimit(WebhookServerTestCase):
+    """Test the bulk endpoint respects its own maximum queue depth"""
+
+    extra_config = "  max_queue_depth: 1\n  max_bulk_queue_depth: 2\n  rate_limit_per_minute: 0\n"
+
+    def test_overflow_is_rejected(self):
+        """Test items beyond the queue capacity are rejected with Retry-After"""
+        status, headers, body = self.post([import_payload(n) for n in range(3)], '/bulk')
+        self.assertEqual(status, 202)
+        self.assertEqual(body['counts'], {'queued': 2, 'rejected': 1})
+        self.assertIn('Retry-After', headers)
+
+        status, _, _ = self.post([import_payload(9)], '/bulk')
+        self.assertEqual(status, 429)
+
+    def test_bulk_items_leave_webhooks_alone(self):
+        """Test queued bulk items neither use nor are limited by the webhook depth"""
+        self.assertEqual(self.post([import_payload(n) for n in range(2)], '/bulk')[0], 202)
+        self.assertEqual(self.post(import_payload(5))[0], 202)
+        self.assertEqual(self.post(import_payload(6))[0], 429)
+
+
+if __name__ == '__main__':
+    unittest.main()